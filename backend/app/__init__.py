@@ -1,30 +1,122 @@
 """
 Flask application factory and configuration.
 """
-from flask import Flask
+import atexit
+import time
+from flask import Flask, Response, g, request
 from flask_cors import CORS
 from config.settings import Config
 
-def create_app():
-    """Create and configure the Flask application."""
+def create_app(role=None):
+    """
+    Create and configure the Flask application.
+    
+    Args:
+        role: 'full' (default from APP_ROLE) or 'playlist', which serves only the
+            Spotify/mood/health endpoints and never imports TensorFlow
+    """
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.config['APP_ROLE'] = (role or Config.APP_ROLE).lower()
+    
+    Config.validate_config()
     
     # Enable CORS for React frontend with credentials support
     CORS(app, 
          origins=['http://localhost:3000', 'http://127.0.0.1:3000'], 
          supports_credentials=True,
          allow_headers=['Content-Type', 'Authorization'],
+         expose_headers=['Server-Timing', 'Retry-After'],
          methods=['GET', 'POST', 'OPTIONS'])
     
     # Register blueprints/routes
-    from app.routes import api_bp
+    from app.routes import api_bp, emotion_detector, inference_pool
+    from app.services.inference_pool import is_inference_worker
+    from app.services.metrics import HTTP_REQUEST_SECONDS, HTTP_REQUESTS, REGISTRY
     app.register_blueprint(api_bp, url_prefix='/api')
     
+    serves_inference = app.config['APP_ROLE'] != 'playlist'
+    
+    # Spawned inference workers re-import run.py; they load their own model
+    # and must not warm up or start a nested pool here.
+    if serves_inference and not is_inference_worker():
+        if inference_pool is not None:
+            # A pool started in a preloading gunicorn master would sit idle: forked
+            # workers can't use it. gunicorn.conf.py's post_fork starts one per worker.
+            if Config.INFERENCE_POOL_POST_FORK:
+                app.extensions['inference_pool'] = inference_pool
+            else:
+                inference_pool.start()
+            atexit.register(inference_pool.shutdown)
+        else:
+            # Load the emotion model before serving traffic. With gunicorn preload_app
+            # this runs once in the master and workers share the weights after fork.
+            warmup_mode = app.config['EMOTION_WARMUP']
+            if warmup_mode == 'sync':
+                emotion_detector.warmup()
+            elif warmup_mode == 'background':
+                emotion_detector.start_background_warmup()
+    
+    def model_ready():
+        """Whether emotion inference can be served without loading the model."""
+        if inference_pool is not None:
+            return inference_pool.ready
+        return emotion_detector.ready
+    
     @app.route('/health')
     def health_check():
-        """Health check endpoint."""
-        return {'status': 'healthy', 'service': 'mood-music-backend'}, 200
+        """Health check endpoint. Reports 503 until the emotion model is warm (unless warmup is off)."""
+        if not serves_inference:
+            return {
+                'status': 'healthy',
+                'service': 'mood-music-backend',
+                'role': 'playlist'
+            }, 200
+        
+        if not model_ready():
+            if inference_pool is None and app.config['EMOTION_WARMUP'] == 'off':
+                # Nothing warms the model before a detection does; failing here
+                # would keep a gated instance out of rotation for good
+                return {
+                    'status': 'healthy',
+                    'service': 'mood-music-backend',
+                    'emotion_model_ready': False,
+                    'warmup': 'lazy'
+                }, 200
+            
+            return {
+                'status': 'warming_up',
+                'service': 'mood-music-backend',
+                'emotion_model_ready': False,
+                'warmup_error': emotion_detector.warmup_error
+            }, 503
+        
+        return {
+            'status': 'healthy',
+            'service': 'mood-music-backend',
+            'emotion_model_ready': True
+        }, 200
+    
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+    
+    @app.after_request
+    def record_request_metrics(response):
+        """Record latency and status per endpoint (route names, so label values stay bounded)."""
+        started = g.pop('request_started', None)
+        if Config.METRICS_ENABLED and started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+            HTTP_REQUESTS.inc(endpoint, str(response.status_code))
+        return response
+    
+    @app.route('/metrics')
+    def metrics():
+        """Latency histograms and counters of this process in the Prometheus text format."""
+        if not Config.METRICS_ENABLED:
+            return {'error': 'Metrics disabled'}, 404
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
     
     @app.route('/')
     def root():
@@ -35,10 +127,15 @@ def create_app():
             'status': 'running',
             'endpoints': [
                 '/api/detect-mood',
+                '/api/detect-mood/batch',
+                '/api/detect-mood/stream (WebSocket)',
                 '/api/get-playlist/<mood>',
+                '/api/recommend',
+                '/api/detect-and-recommend',
                 '/api/spotify/auth',
                 '/api/spotify/callback',
-                '/health'
+                '/health',
+                '/metrics'
             ]
         }
     
@@ -0,0 +1,420 @@
+"""
+ASGI serving mode: the Flask app with non-blocking Spotify routes.
+
+Under a thread-per-request server, every /get-playlist request holds a
+thread for its Spotify round trips. Here the routes that wait on Spotify
+(/api/get-playlist/<mood> and /api/detect-and-recommend) run as
+coroutines on the event loop, with searches on a pooled async HTTP client
+and inference in a thread pool. Every other route is the unchanged Flask
+view, run in that thread pool. The coroutine views run inside a Flask
+request context and go through the app's before/after-request hooks, so
+sessions, CORS headers, the role check and metrics behave as in create_app().
+
+The WebSocket mood stream (flask-sock needs a WSGI server) is served
+natively, with the same latest-frame-wins behavior.
+
+Usage (from backend/): uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import contextvars
+import io
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from flask import jsonify, request
+from werkzeug.exceptions import HTTPException
+
+from app import create_app
+from app.routes import (
+    VALID_MOODS, _add_timing, _analyze_stream_frame, _detect_upload, _inference_busy, _invalid_mood,
+    _likely_moods, _not_authenticated, _playlist_failed, _recommendation_response, _spotify_token,
+    spotify_service
+)
+from app.services.inference_pool import InferencePoolFull
+from app.services.mood_tracker import MoodTracker
+from app.services.spotify_scheduler import BACKGROUND
+from app.services.spotify_async import AsyncSpotifyService
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = '/api/detect-mood/stream'
+
+# Threads for inference, blocking lookups and the routes served by the Flask app
+executor = ThreadPoolExecutor(max_workers=Config.ASGI_THREADS, thread_name_prefix='asgi-worker')
+
+
+def run_blocking(fn, *args):
+    """Run fn in the thread pool (with the caller's Flask context); returns an awaitable."""
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(executor, partial(context.run, fn, *args))
+
+
+# Playlist searches on the event loop, sharing the sync service's caches and rate limiter
+async_spotify = AsyncSpotifyService(spotify_service, run_blocking=run_blocking)
+
+
+async def get_playlist(mood):
+    """Async /api/get-playlist/<mood> (see routes.get_playlist)."""
+    try:
+        if mood.lower() not in VALID_MOODS:
+            return _invalid_mood()
+        
+        # The token store reads SQLite and may refresh the token over HTTP
+        token = await run_blocking(_spotify_token)
+        if token is None:
+            return _not_authenticated()
+        
+        playlist_data = await async_spotify.get_mood_playlist(
+            mood.lower(),
+            token['access_token'],
+            token['expires_at'],
+            market=(request.args.get('market') or '').upper() or None
+        )
+        
+        if playlist_data['error']:
+            return _playlist_failed(playlist_data)
+        
+        logger.info(f"Retrieved playlist for mood: {mood}")
+        return jsonify(playlist_data), 200
+        
+    except Exception as e:
+        logger.error(f"Error in get_playlist: {str(e)}")
+        return jsonify({
+            'error': 'Playlist retrieval failed',
+            'message': 'Unable to get playlist recommendations'
+        }), 500
+
+
+async def detect_and_recommend():
+    """
+    Async /api/detect-and-recommend (see routes.detect_and_recommend).
+    
+    The likely moods' playlists are fetched on the event loop at background
+    priority while inference runs in the thread pool.
+    """
+    started = time.perf_counter()
+    timings = []
+    prefetched = {}
+    
+    try:
+        token = await run_blocking(_spotify_token)
+        if token is None:
+            return _not_authenticated()
+        
+        if 'image' not in request.files or request.files['image'].filename == '':
+            return jsonify({
+                'error': 'No image provided',
+                'message': 'Please upload an image file'
+            }), 400
+        
+        image_data = request.files['image'].read()
+        access_token = token['access_token']
+        expires_at = token['expires_at']
+        stage_started = _add_timing(timings, 'upload', started)
+        
+        prefetch_deadline = time.monotonic() + Config.SPOTIFY_SEARCH_DEADLINE
+        prefetched = {
+            mood: asyncio.ensure_future(
+                async_spotify.get_mood_playlist(mood, access_token, expires_at, priority=BACKGROUND)
+            )
+            for mood in _likely_moods(Config.DETECT_PREFETCH_MOODS)
+        }
+        stage_started = _add_timing(timings, 'prefetch-start', stage_started, ','.join(prefetched))
+        
+        result = await run_blocking(_detect_upload, image_data)
+        mood = 'neutral' if result['error'] else result['mood']
+        stage_started = _add_timing(timings, 'detect', stage_started, 'cached' if result.get('cached') else None)
+        
+        playlist_data = None
+        prefetch_outcome = 'prefetch-miss'
+        if mood in prefetched:
+            try:
+                playlist_data = await asyncio.wait_for(
+                    asyncio.shield(prefetched[mood]), max(0, prefetch_deadline - time.monotonic())
+                )
+                prefetch_outcome = 'prefetch-hit'
+            except asyncio.TimeoutError:
+                prefetch_outcome = 'prefetch-timeout'
+        if playlist_data is None:
+            playlist_data = await async_spotify.get_mood_playlist(mood, access_token, expires_at)
+        _add_timing(timings, 'playlist', stage_started, prefetch_outcome)
+        
+        return _recommendation_response(result, playlist_data, prefetch_outcome == 'prefetch-hit', timings, started)
+        
+    except InferencePoolFull as e:
+        return _inference_busy(e)
+    except Exception as e:
+        logger.error(f"Error in detect_and_recommend: {str(e)}")
+        return jsonify({
+            'error': 'Processing failed',
+            'message': 'Unable to detect mood and get playlist',
+            'mood': 'neutral'  # Fallback to neutral
+        }), 500
+    finally:
+        # Unused prefetches are speculative; don't let them spend the rate limit
+        for task in prefetched.values():
+            task.cancel()
+
+
+# Flask endpoints served by the coroutines above
+ASYNC_VIEWS = {
+    'api.get_playlist': get_playlist,
+    'api.detect_and_recommend': detect_and_recommend
+}
+
+
+class AsgiApp:
+    """ASGI application wrapping a Flask app created by create_app()."""
+    
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        elif scope['type'] == 'websocket':
+            await self._websocket(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+    
+    async def _http(self, scope, receive, send):
+        body = await _read_body(receive)
+        if body is None:
+            return
+        
+        environ = _wsgi_environ(scope, body)
+        view = self._async_view(environ)
+        if view is not None:
+            status, headers, body = await self._dispatch(view, environ)
+        else:
+            status, headers, body = await run_blocking(self._run_wsgi, environ)
+        
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+    
+    def _async_view(self, environ):
+        """The coroutine view for this request, or None to use the Flask view."""
+        if environ['REQUEST_METHOD'] not in ('GET', 'POST'):
+            return None
+        try:
+            endpoint, _ = self.flask_app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return None
+        return ASYNC_VIEWS.get(endpoint)
+    
+    async def _dispatch(self, view, environ):
+        """
+        Run a coroutine view as Flask's full_dispatch_request() would.
+        
+        Returns:
+            Tuple of (status code, headers, body)
+        """
+        app = self.flask_app
+        ctx = app.request_context(environ)
+        error = None
+        try:
+            ctx.push()
+            try:
+                response = app.preprocess_request()
+                if response is None:
+                    response = await view(**request.view_args)
+            except Exception as e:
+                response = app.handle_user_exception(e)
+            response = app.finalize_request(response)
+        except Exception as e:
+            error = e
+            response = app.handle_exception(e)
+        finally:
+            ctx.pop(error)
+        
+        app_iter, status, headers = response.get_wsgi_response(environ)
+        return int(status.split(' ', 1)[0]), headers, _collect(app_iter)
+    
+    def _run_wsgi(self, environ):
+        """Call the Flask app (in a pool thread); returns (status code, headers, body)."""
+        started = []
+        
+        def start_response(status, headers, exc_info=None):
+            started[:] = [int(status.split(' ', 1)[0]), headers]
+        
+        body = _collect(self.flask_app(environ, start_response))
+        return started[0], started[1], body
+    
+    async def _websocket(self, scope, receive, send):
+        """Serve the mood stream; other WebSocket paths are refused."""
+        message = await receive()
+        if message['type'] != 'websocket.connect':
+            return
+        
+        if scope['path'] != STREAM_PATH or self.flask_app.config.get('APP_ROLE') == 'playlist':
+            await send({'type': 'websocket.close', 'code': 1008})
+            return
+        
+        await send({'type': 'websocket.accept'})
+        await MoodStream(receive, send).run()
+    
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_spotify.aclose()
+                executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+class MoodStream:
+    """
+    One WebSocket mood stream (see routes.detect_mood_stream).
+    
+    A reader task keeps only the newest unanalyzed frame; the stream
+    analyzes it in the thread pool and sends the result, so a slow model
+    lowers the update rate instead of building up latency.
+    """
+    
+    def __init__(self, receive, send):
+        self.receive = receive
+        self.send = send
+        self.tracker = MoodTracker.from_config()
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self._latest = None
+        self._closed = False
+        self._ready = asyncio.Event()
+    
+    async def run(self):
+        logger.info("Mood stream opened")
+        reader = asyncio.ensure_future(self._read())
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                if self._closed:
+                    break
+                
+                frame, self._latest = self._latest, None
+                start = time.perf_counter()
+                result = await run_blocking(_analyze_stream_frame, self.tracker, frame)
+                
+                result['frame'] = self.frames_received
+                result['frames_dropped'] = self.frames_dropped
+                result['latency_ms'] = (time.perf_counter() - start) * 1000
+                
+                try:
+                    await self.send({'type': 'websocket.send', 'text': json.dumps(result)})
+                except Exception:
+                    break
+        finally:
+            reader.cancel()
+        
+        logger.info(f"Mood stream closed after {self.frames_received} frames ({self.frames_dropped} dropped, "
+                    f"{self.tracker.frames_skipped} skipped as unchanged)")
+    
+    async def _read(self):
+        """Receive frames until the client disconnects."""
+        try:
+            while True:
+                message = await self.receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                
+                self.frames_received += 1
+                frame = message.get('bytes')
+                if frame is None:
+                    # Text messages are treated as keep-alives
+                    continue
+                if len(frame) > Config.STREAM_MAX_FRAME_BYTES:
+                    await self.send({'type': 'websocket.close', 'code': 1009})
+                    break
+                
+                if self._latest is not None:
+                    self.frames_dropped += 1
+                self._latest = frame
+                self._ready.set()
+        finally:
+            self._closed = True
+            self._ready.set()
+
+
+async def _read_body(receive):
+    """Read the whole request body; None if the client disconnected first."""
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+def _collect(app_iter):
+    """Join a WSGI response body, closing the iterable."""
+    try:
+        return b''.join(app_iter)
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+
+
+def _wsgi_environ(scope, body):
+    """WSGI environ for an ASGI HTTP request scope and its body."""
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf8').decode('latin1'),
+        'PATH_INFO': path.encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('latin1'),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    
+    server = scope.get('server') or ('localhost', 80)
+    environ['SERVER_NAME'] = server[0]
+    environ['SERVER_PORT'] = str(server[1] or 80)
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+    
+    for name, value in scope['headers']:
+        name = name.decode('latin1')
+        if name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        elif name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        value = value.decode('latin1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    
+    return environ
+
+
+def create_asgi_app(role=None):
+    """
+    Create the ASGI application.
+    
+    Args:
+        role: As for create_app()
+    """
+    return AsgiApp(create_app(role))
@@ -1,13 +1,27 @@
 """
 API routes for the mood music player backend.
 """
-from flask import Blueprint, request, jsonify, session, redirect, url_for
+from flask import Blueprint, request, jsonify, session, redirect, url_for, current_app
+from flask_sock import Sock, ConnectionClosed
 from app.services.emotion_detector import EmotionDetector
+from app.services.spotify_scheduler import BACKGROUND
 from app.services.spotify_service import SpotifyService
+from app.services.inference_pool import InferencePool, InferencePoolFull
+from app.services.image_decoder import decode_image
+from app.services.metrics import stage_timer
+from app.services.mood_tracker import MoodTracker, MoodTrackerRegistry
+from app.services.result_cache import ResultCache
+from app.services.token_store import TokenStore
+from config.settings import Config
 import logging
 import io
-from PIL import Image
-import numpy as np
+import json
+import threading
+import time
+import uuid
+import zipfile
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,16 +30,66 @@ logger = logging.getLogger(__name__)
 # Create blueprint
 api_bp = Blueprint('api', __name__)
 
+# WebSocket support, routes are registered on api_bp
+sock = Sock()
+
 # Initialize services
 emotion_detector = EmotionDetector()
 spotify_service = SpotifyService()
 
+# Spotify tokens stay server-side; the session cookie only carries 'spotify_sid'
+token_store = TokenStore.from_config(spotify_service.refresh_access_token)
+
+# Detection results keyed by upload content
+result_cache = ResultCache.from_config() if Config.RESULT_CACHE_ENABLED else None
+
+# Temporal smoothing state for live (continuous capture) HTTP sessions; per
+# process, so it needs sticky routing across gunicorn workers (see MoodTrackerRegistry)
+mood_trackers = MoodTrackerRegistry(idle_ttl=Config.MOOD_TRACKER_TTL)
+
+# Optional multi-process inference backend (started by create_app)
+inference_pool = InferencePool.from_config() if Config.INFERENCE_BACKEND == 'process' else None
+
+# Playlist prefetches that overlap inference in /detect-and-recommend, guided
+# by the moods detected most recently
+prefetch_executor = ThreadPoolExecutor(
+    max_workers=Config.DETECT_PREFETCH_WORKERS,
+    thread_name_prefix='playlist-prefetch'
+)
+recent_moods = deque(maxlen=Config.DETECT_PREFETCH_HISTORY)
+recent_moods_lock = threading.Lock()
+
+# Moods accepted by /get-playlist
+VALID_MOODS = ['happy', 'sad', 'neutral', 'angry', 'surprise', 'fear']
+
+# Endpoints that need the emotion model (unavailable in the playlist-only role)
+INFERENCE_ENDPOINTS = {
+    'api.detect_mood',
+    'api.detect_mood_batch',
+    'api.detect_mood_stream',
+    'api.detect_and_recommend',
+    'api.inference_stats'
+}
+
+@api_bp.before_request
+def require_inference_role():
+    """Reject inference requests on processes started in the playlist-only role."""
+    if request.endpoint in INFERENCE_ENDPOINTS and current_app.config.get('APP_ROLE') == 'playlist':
+        return jsonify({
+            'error': 'Inference unavailable',
+            'message': 'This server only serves playlist endpoints',
+            'mood': 'neutral'
+        }), 503
+
 @api_bp.route('/detect-mood', methods=['POST'])
 def detect_mood():
     """
     Analyze uploaded image for emotion detection.
     
-    Expected: multipart/form-data with 'image' field
+    Expected: multipart/form-data with 'image' field, and optionally
+    'live=true' for frames from a continuous capture, which are smoothed
+    over the session and skipped when unchanged (state is per worker process;
+    /detect-mood/stream smooths per connection)
     Returns: JSON with detected mood and confidence scores
     """
     try:
@@ -44,12 +108,24 @@ def detect_mood():
                 'message': 'Please select a valid image file'
             }), 400
         
-        # Convert image to numpy array
-        image = Image.open(io.BytesIO(image_file.read()))
-        image_array = np.array(image)
+        with stage_timer('upload_read'):
+            image_data = image_file.read()
+        live = request.values.get('live', 'false').lower() == 'true'
         
-        # Detect emotion
-        result = emotion_detector.detect_emotion(image_array)
+        if live:
+            # Live sessions get temporal smoothing and skip near-identical frames
+            image_array = decode_image(image_data)
+            tracker = mood_trackers.get(_mood_session_id())
+            if not tracker.should_analyze(image_array):
+                return jsonify(tracker.current()), 200
+            result = tracker.update(_run_detection(image_array))
+        else:
+            # Detect emotion (repeat uploads are answered from the result cache)
+            result = _detect_upload(image_data)
+            if result.get('cached'):
+                # Only successful detections are cached; they still count as recent moods
+                _remember_mood(result['mood'])
+                return jsonify(result), 200
         
         if result['error']:
             return jsonify({
@@ -59,9 +135,12 @@ def detect_mood():
             }), 200
         
         logger.info(f"Detected mood: {result['mood']} (confidence: {result['confidence']:.2f})")
+        _remember_mood(result['mood'])
         
         return jsonify(result), 200
         
+    except InferencePoolFull as e:
+        return _inference_busy(e)
     except Exception as e:
         logger.error(f"Error in detect_mood: {str(e)}")
         return jsonify({
@@ -70,6 +149,437 @@ def detect_mood():
             'mood': 'neutral'  # Fallback to neutral
         }), 500
 
+@sock.route('/detect-mood/stream', bp=api_bp)
+def detect_mood_stream(ws):
+    """
+    Continuous mood detection over a WebSocket.
+    
+    Expected: binary messages, each an encoded image frame (JPEG/PNG)
+    Sends: one JSON message per analyzed frame with the detected mood
+    
+    Frames that arrive while inference is running are not queued: only the
+    most recent one is analyzed next (latest-frame-wins), so a slow model
+    lowers the update rate instead of building up latency. Moods are smoothed
+    over the connection and unchanged frames skip inference. A frame larger
+    than STREAM_MAX_FRAME_BYTES closes the stream (code 1009).
+    """
+    frames_received = 0
+    frames_dropped = 0
+    tracker = MoodTracker.from_config()
+    
+    logger.info("Mood stream opened")
+    
+    while True:
+        frame = ws.receive()
+        frames_received += 1
+        
+        # Skip ahead to the newest frame that arrived in the meantime
+        while True:
+            newer_frame = ws.receive(timeout=0)
+            if newer_frame is None:
+                break
+            frame = newer_frame
+            frames_received += 1
+            frames_dropped += 1
+        
+        if not isinstance(frame, (bytes, bytearray)):
+            # Text messages are treated as keep-alives
+            continue
+        
+        if len(frame) > Config.STREAM_MAX_FRAME_BYTES:
+            # The server options cap messages too; never decode an oversized frame regardless
+            ws.close(reason=1009, message='Frame too large')
+            break
+        
+        start = time.perf_counter()
+        result = _analyze_stream_frame(tracker, frame)
+        
+        result['frame'] = frames_received
+        result['frames_dropped'] = frames_dropped
+        result['latency_ms'] = (time.perf_counter() - start) * 1000
+        
+        try:
+            ws.send(json.dumps(result))
+        except ConnectionClosed:
+            break
+    
+    logger.info(f"Mood stream closed after {frames_received} frames ({frames_dropped} dropped, "
+                f"{tracker.frames_skipped} skipped as unchanged)")
+
+def _analyze_stream_frame(tracker, frame):
+    """Mood result for one stream frame (smoothed, or the last one if the frame is unchanged)."""
+    try:
+        image_array = decode_image(frame)
+        if tracker.should_analyze(image_array):
+            return tracker.update(_run_detection(image_array))
+        return tracker.current()
+    except InferencePoolFull:
+        return {
+            'error': 'Server busy',
+            'message': 'Emotion detection is at capacity, frame skipped',
+            'mood': 'neutral'
+        }
+    except Exception as e:
+        logger.warning(f"Mood stream frame failed: {str(e)}")
+        return {
+            'error': 'Processing failed',
+            'message': 'Unable to process frame',
+            'mood': 'neutral'
+        }
+
+@api_bp.route('/detect-and-recommend', methods=['POST'])
+def detect_and_recommend():
+    """
+    Detect mood and return its playlist in one request.
+    
+    Playlists for the most likely moods (this session's last mood, then
+    the most frequent recent detections) are fetched while inference runs;
+    if the detected mood was prefetched, its playlist is ready (or nearly
+    so) when inference finishes. Prefetches are speculative, so they run at
+    background priority and are waited on until the search deadline at most.
+    
+    Expected: multipart/form-data with 'image' field
+    Returns: JSON with the detection result and the playlist; per-stage
+    latencies are reported in the Server-Timing header
+    """
+    started = time.perf_counter()
+    timings = []
+    prefetched = {}
+    
+    try:
+        token = _spotify_token()
+        if token is None:
+            return _not_authenticated()
+        
+        if 'image' not in request.files or request.files['image'].filename == '':
+            return jsonify({
+                'error': 'No image provided',
+                'message': 'Please upload an image file'
+            }), 400
+        
+        image_data = request.files['image'].read()
+        access_token = token['access_token']
+        expires_at = token['expires_at']
+        stage_started = _add_timing(timings, 'upload', started)
+        
+        # Start the playlist fetches, then run inference alongside them
+        prefetch_deadline = time.monotonic() + Config.SPOTIFY_SEARCH_DEADLINE
+        prefetched = {
+            mood: prefetch_executor.submit(
+                spotify_service.get_mood_playlist, mood, access_token, expires_at, priority=BACKGROUND
+            )
+            for mood in _likely_moods(Config.DETECT_PREFETCH_MOODS)
+        }
+        stage_started = _add_timing(timings, 'prefetch-start', stage_started, ','.join(prefetched))
+        
+        result = _detect_upload(image_data)
+        mood = 'neutral' if result['error'] else result['mood']
+        stage_started = _add_timing(timings, 'detect', stage_started, 'cached' if result.get('cached') else None)
+        
+        playlist_data = None
+        prefetch_outcome = 'prefetch-miss'
+        if mood in prefetched:
+            try:
+                playlist_data = prefetched[mood].result(timeout=max(0, prefetch_deadline - time.monotonic()))
+                prefetch_outcome = 'prefetch-hit'
+            except FutureTimeout:
+                prefetch_outcome = 'prefetch-timeout'
+        if playlist_data is None:
+            playlist_data = spotify_service.get_mood_playlist(mood, access_token, expires_at)
+        _add_timing(timings, 'playlist', stage_started, prefetch_outcome)
+        
+        return _recommendation_response(result, playlist_data, prefetch_outcome == 'prefetch-hit', timings, started)
+        
+    except InferencePoolFull as e:
+        return _inference_busy(e)
+    except Exception as e:
+        logger.error(f"Error in detect_and_recommend: {str(e)}")
+        return jsonify({
+            'error': 'Processing failed',
+            'message': 'Unable to detect mood and get playlist',
+            'mood': 'neutral'  # Fallback to neutral
+        }), 500
+    finally:
+        # Drop the prefetches nobody will use that haven't started yet
+        for future in prefetched.values():
+            future.cancel()
+
+def _recommendation_response(result, playlist_data, prefetch_hit, timings, started):
+    """Response of /detect-and-recommend, remembering the mood if detection succeeded."""
+    mood = 'neutral' if result['error'] else result['mood']
+    if not result['error']:
+        _remember_mood(mood)
+        session['last_mood'] = mood
+    
+    response = {
+        'mood': mood,
+        'detection': result,
+        'playlist': playlist_data,
+        'prefetched': prefetch_hit,
+        'error': bool(playlist_data['error'])
+    }
+    status = 400 if playlist_data['error'] else 200
+    headers = {}
+    if playlist_data.get('rate_limited'):
+        status = 429
+        headers['Retry-After'] = str(playlist_data['retry_after'])
+    
+    _add_timing(timings, 'total', started)
+    headers['Server-Timing'] = ', '.join(timings)
+    logger.info(f"Detect-and-recommend: {mood} (prefetch {'hit' if prefetch_hit else 'miss'})")
+    return jsonify(response), status, headers
+
+@api_bp.route('/detect-mood/batch', methods=['POST'])
+def detect_mood_batch():
+    """
+    Analyze several images in one request.
+    
+    Expected: multipart/form-data with repeated 'images' fields, or a single
+    'archive' field containing a zip of images
+    Returns: JSON with per-image results and the aggregated mood
+    """
+    try:
+        uploads = _collect_batch_uploads()
+        
+        if isinstance(uploads, tuple):
+            # Validation error response
+            return uploads
+        
+        # Decode every upload, keeping track of the ones that fail
+        results = [None] * len(uploads)
+        decoded_indices = []
+        images = []
+        content_keys = [None] * len(uploads)
+        for index, (name, data) in enumerate(uploads):
+            if result_cache is not None:
+                content_keys[index] = result_cache.content_key(data)
+                cached = result_cache.get(content_keys[index])
+                if cached is not None:
+                    results[index] = {'filename': name, **cached, 'cached': True}
+                    continue
+            
+            try:
+                images.append(decode_image(data))
+                decoded_indices.append(index)
+            except Exception as e:
+                logger.warning(f"Could not decode batch image {name}: {str(e)}")
+                results[index] = {
+                    'filename': name,
+                    'mood': 'neutral',
+                    'error': True,
+                    'message': 'Unable to decode image'
+                }
+        
+        # Analyze all decoded images together
+        for index, result in zip(decoded_indices, _run_batch_detection(images)):
+            if result_cache is not None:
+                result_cache.put(result, content_keys[index])
+            results[index] = {'filename': uploads[index][0], **result}
+        
+        aggregate = emotion_detector.aggregate_results(results)
+        
+        logger.info(f"Batch detected mood: {aggregate['mood']} over {len(uploads)} images")
+        
+        return jsonify({
+            'count': len(uploads),
+            'results': results,
+            'aggregate': aggregate
+        }), 200
+        
+    except InferencePoolFull as e:
+        return _inference_busy(e)
+    except Exception as e:
+        logger.error(f"Error in detect_mood_batch: {str(e)}")
+        return jsonify({
+            'error': 'Processing failed',
+            'message': 'Unable to process images',
+            'mood': 'neutral'  # Fallback to neutral
+        }), 500
+
+def _collect_batch_uploads():
+    """
+    Read the images of a batch request as (filename, bytes) pairs.
+    
+    Returns: List of uploads, or a (response, status) tuple on invalid input
+    """
+    uploads = []
+    
+    if 'archive' in request.files:
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(request.files['archive'].read()))
+        except zipfile.BadZipFile:
+            return jsonify({
+                'error': 'Invalid archive',
+                'message': 'The archive must be a zip file of images'
+            }), 400
+        
+        with archive:
+            members = [info for info in archive.infolist() if not info.is_dir()]
+            if len(members) > Config.MAX_BATCH_IMAGES:
+                return _batch_too_large(len(members))
+            
+            for info in members:
+                if info.file_size > Config.MAX_BATCH_IMAGE_BYTES:
+                    return _batch_image_too_large(info.filename)
+                uploads.append((info.filename, archive.read(info)))
+    else:
+        files = [f for f in request.files.getlist('images') if f.filename != '']
+        if len(files) > Config.MAX_BATCH_IMAGES:
+            return _batch_too_large(len(files))
+        
+        for image_file in files:
+            data = image_file.read()
+            if len(data) > Config.MAX_BATCH_IMAGE_BYTES:
+                return _batch_image_too_large(image_file.filename)
+            uploads.append((image_file.filename, data))
+    
+    if not uploads:
+        return jsonify({
+            'error': 'No images provided',
+            'message': "Please upload files in the 'images' field or a zip in 'archive'"
+        }), 400
+    
+    return uploads
+
+def _batch_too_large(count):
+    """Error response for a batch with too many images."""
+    return jsonify({
+        'error': 'Too many images',
+        'message': f'Batch contains {count} images, maximum is {Config.MAX_BATCH_IMAGES}'
+    }), 413
+
+def _batch_image_too_large(filename):
+    """Error response for an oversized image in a batch."""
+    return jsonify({
+        'error': 'Image too large',
+        'message': f'{filename} exceeds {Config.MAX_BATCH_IMAGE_BYTES} bytes'
+    }), 413
+
+def _remember_mood(mood):
+    """Record a detected mood for prefetch prediction."""
+    with recent_moods_lock:
+        recent_moods.append(mood)
+
+def _likely_moods(count):
+    """This session's last mood, then the most frequent recent detections."""
+    moods = []
+    if session.get('last_mood'):
+        moods.append(session['last_mood'])
+    with recent_moods_lock:
+        counts = Counter(recent_moods)
+    for mood, _ in counts.most_common() + [('neutral', 0)]:
+        if mood not in moods:
+            moods.append(mood)
+    return moods[:count]
+
+def _add_timing(timings, name, since, description=None):
+    """Append a Server-Timing entry for the stage that began at `since`; returns now."""
+    now = time.perf_counter()
+    entry = f'{name};dur={(now - since) * 1000:.1f}'
+    if description:
+        entry += f';desc="{description}"'
+    timings.append(entry)
+    return now
+
+def _spotify_token():
+    """This session's Spotify access token ({'access_token', 'expires_at'}), or None."""
+    sid = session.get('spotify_sid')
+    return token_store.get_token(sid) if sid else None
+
+def _mood_session_id():
+    """Get (or assign) the id that keys this browser session's mood tracker."""
+    if 'mood_session_id' not in session:
+        session['mood_session_id'] = uuid.uuid4().hex
+    return session['mood_session_id']
+
+def _detect_upload(image_data):
+    """
+    Detect emotion in uploaded image bytes, using the result cache.
+    
+    Resubmitted images are answered from the content hash without decoding
+    or inference; re-encoded copies of a known image match on the
+    perceptual hash. Cache hits are marked 'cached'.
+    """
+    content_key = None
+    if result_cache is not None:
+        content_key = result_cache.content_key(image_data)
+        cached = result_cache.get(content_key)
+        if cached is not None:
+            return {**cached, 'cached': True}
+    
+    # Decode (downscaled, orientation-corrected) image to numpy array
+    image_array = decode_image(image_data)
+    
+    perceptual_key = None
+    if result_cache is not None:
+        perceptual_key = result_cache.perceptual_key(image_array)
+        cached = result_cache.get(perceptual_key)
+        if cached is not None:
+            result_cache.put(cached, content_key)
+            return {**cached, 'cached': True}
+    
+    result = _run_detection(image_array)
+    if result_cache is not None:
+        result_cache.put(result, content_key, perceptual_key)
+    return result
+
+def _run_detection(image_array):
+    """Detect emotion on the configured inference backend."""
+    if inference_pool is not None:
+        return inference_pool.detect_emotion(image_array)
+    return emotion_detector.detect_emotion(image_array)
+
+def _run_batch_detection(images):
+    """Detect emotion for several images on the configured inference backend."""
+    if inference_pool is not None:
+        return inference_pool.detect_emotions(images)
+    return emotion_detector.detect_emotions(images)
+
+def _inference_busy(error):
+    """Back-pressure response when the inference queue is full."""
+    logger.warning(f"Rejecting request: {str(error)}")
+    return jsonify({
+        'error': 'Server busy',
+        'message': 'Emotion detection is at capacity, please retry shortly',
+        'mood': 'neutral'  # Fallback to neutral
+    }), 503, {'Retry-After': '1'}
+
+def _not_authenticated():
+    """Error response for Spotify endpoints called without a Spotify session."""
+    return jsonify({
+        'error': 'Not authenticated',
+        'message': 'Please authenticate with Spotify first',
+        'auth_url': '/api/spotify/auth'
+    }), 401
+
+def _invalid_mood():
+    """Error response for an unknown mood."""
+    return jsonify({
+        'error': 'Invalid mood',
+        'message': f'Mood must be one of: {", ".join(VALID_MOODS)}',
+        'valid_moods': VALID_MOODS
+    }), 400
+
+def _playlist_failed(playlist_data):
+    """Error response for a failed playlist; 429 when Spotify's rate limit was reached."""
+    if playlist_data.get('rate_limited'):
+        return jsonify(playlist_data), 429, {'Retry-After': str(playlist_data['retry_after'])}
+    return jsonify(playlist_data), 400
+
+@api_bp.route('/inference/stats', methods=['GET'])
+def inference_stats():
+    """
+    Get emotion inference statistics.
+    
+    Returns: JSON with model readiness, micro-batch occupancy, pool state
+    and result cache counters
+    """
+    stats = emotion_detector.get_stats()
+    stats['backend'] = Config.INFERENCE_BACKEND
+    stats['pool'] = inference_pool.get_stats() if inference_pool is not None else None
+    stats['result_cache'] = result_cache.get_stats() if result_cache is not None else None
+    return jsonify(stats), 200
+
 @api_bp.route('/get-playlist/<mood>', methods=['GET'])
 def get_playlist(mood):
     """
@@ -78,34 +588,31 @@ def get_playlist(mood):
     Args:
         mood (str): The mood to get playlist for
     
+    Query params:
+        market (optional): ISO country code to restrict tracks to
+    
     Returns: JSON with playlist information
     """
     try:
         # Validate mood
-        valid_moods = ['happy', 'sad', 'neutral', 'angry', 'surprise', 'fear']
-        if mood.lower() not in valid_moods:
-            return jsonify({
-                'error': 'Invalid mood',
-                'message': f'Mood must be one of: {", ".join(valid_moods)}',
-                'valid_moods': valid_moods
-            }), 400
+        if mood.lower() not in VALID_MOODS:
+            return _invalid_mood()
         
         # Check if user is authenticated with Spotify
-        if 'spotify_token' not in session:
-            return jsonify({
-                'error': 'Not authenticated',
-                'message': 'Please authenticate with Spotify first',
-                'auth_url': '/api/spotify/auth'
-            }), 401
+        token = _spotify_token()
+        if token is None:
+            return _not_authenticated()
         
         # Get playlist for mood
         playlist_data = spotify_service.get_mood_playlist(
             mood.lower(), 
-            session['spotify_token']
+            token['access_token'],
+            token['expires_at'],
+            market=(request.args.get('market') or '').upper() or None
         )
         
         if playlist_data['error']:
-            return jsonify(playlist_data), 400
+            return _playlist_failed(playlist_data)
         
         logger.info(f"Retrieved playlist for mood: {mood}")
         return jsonify(playlist_data), 200
@@ -117,6 +624,95 @@ def get_playlist(mood):
             'message': 'Unable to get playlist recommendations'
         }), 500
 
+@api_bp.route('/recommend', methods=['POST'])
+def recommend():
+    """
+    Recommend tracks for a continuous emotion distribution.
+    
+    Rather than picking tracks for the single dominant mood, the per-mood
+    audio-feature targets are blended by the emotion scores and candidate
+    tracks are ranked against the blend.
+    
+    Expected: JSON {"emotions": {"happy": 0.6, "neutral": 0.4, ...}, "limit": 20},
+    or multipart/form-data with an 'image' field (and optional 'limit') to
+    detect and recommend in one request
+    Returns: JSON with the blended target and ranked tracks, plus the
+    detection result when an image was sent
+    """
+    try:
+        token = _spotify_token()
+        if token is None:
+            return _not_authenticated()
+        
+        detection = None
+        if 'image' in request.files:
+            if current_app.config.get('APP_ROLE') == 'playlist':
+                return jsonify({
+                    'error': 'Inference unavailable',
+                    'message': 'This server only serves playlist endpoints, send emotion scores instead'
+                }), 503
+            
+            detection = _detect_upload(request.files['image'].read())
+            # Failed detections fall back to neutral, as in /detect-mood
+            emotions = {'neutral': 1.0} if detection['error'] else detection['emotions']
+            limit = request.form.get('limit', 20)
+        else:
+            body = request.get_json(silent=True) or {}
+            emotions = body.get('emotions')
+            limit = body.get('limit', 20)
+            
+            valid_moods = spotify_service.mood_queries
+            if (not isinstance(emotions, dict)
+                    or not any(mood in valid_moods for mood in emotions)
+                    or not all(isinstance(score, (int, float)) and score >= 0 for score in emotions.values())):
+                return jsonify({
+                    'error': 'Invalid emotions',
+                    'message': f'Provide non-negative scores for any of: {", ".join(valid_moods)}',
+                    'valid_moods': list(valid_moods)
+                }), 400
+            emotions = {mood: float(score) for mood, score in emotions.items() if mood in valid_moods}
+        
+        try:
+            limit = min(50, max(1, int(limit)))
+        except (TypeError, ValueError):
+            limit = 20
+        
+        playlist_data = spotify_service.get_blended_playlist(
+            emotions,
+            token['access_token'],
+            token['expires_at'],
+            limit=limit
+        )
+        
+        if detection is not None:
+            playlist_data['detection'] = detection
+        
+        if playlist_data['error']:
+            return _playlist_failed(playlist_data)
+        
+        return jsonify(playlist_data), 200
+        
+    except InferencePoolFull as e:
+        return _inference_busy(e)
+    except Exception as e:
+        logger.error(f"Error in recommend: {str(e)}")
+        return jsonify({
+            'error': 'Recommendation failed',
+            'message': 'Unable to get track recommendations'
+        }), 500
+
+@api_bp.route('/spotify/stats', methods=['GET'])
+def spotify_stats():
+    """
+    Get Spotify client statistics.
+    
+    Returns: JSON with search cache counters, rate limiter queue depth and
+    throttle counts, cached client count and token store counters
+    """
+    stats = spotify_service.get_stats()
+    stats['token_store'] = token_store.get_stats()
+    return jsonify(stats), 200
+
 @api_bp.route('/spotify/auth', methods=['GET'])
 def spotify_auth():
     """
@@ -161,9 +757,13 @@ def spotify_callback():
         if token_info['error']:
             return jsonify(token_info), 400
         
-        # Store token in session
-        session['spotify_token'] = token_info['access_token']
-        session['token_expires'] = token_info['expires_at']
+        # Keep the tokens server-side, the session only gets an opaque id
+        old_sid = session.get('spotify_sid')
+        if old_sid:
+            token_store.delete(old_sid)
+        session['spotify_sid'] = token_store.create(token_info)
+        session.pop('spotify_token', None)
+        session.pop('token_expires', None)
         
         logger.info("Spotify authentication successful")
         return jsonify({
@@ -233,7 +833,7 @@ def session_status():
     Returns: JSON with session information
     """
     return jsonify({
-        'authenticated': 'spotify_token' in session,
-        'has_token': 'spotify_token' in session,
+        'authenticated': token_store.has_session(session.get('spotify_sid')),
+        'has_token': token_store.has_session(session.get('spotify_sid')),
         'session_keys': list(session.keys()) if session else []
     }), 200
\ No newline at end of file
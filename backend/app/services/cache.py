@@ -0,0 +1,124 @@
+"""
+Bounded in-process caches.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with a TTL, capped by total size in bytes.
+    
+    Entry sizes come from `size_of`, so the memory budget holds regardless of
+    how large individual values are. Least recently used entries are evicted
+    until a new entry fits.
+    """
+    
+    def __init__(self, max_bytes: int, ttl: Optional[float] = None,
+                 size_of: Callable[[Any], int] = None):
+        """
+        Initialize the cache.
+        
+        Args:
+            max_bytes: Total size budget for all entries
+            ttl: Seconds an entry stays valid (None for no expiry)
+            size_of: Function estimating an entry's size in bytes
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._size_of = size_of or (lambda value: len(value))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Get a value, refreshing its recency. Expired entries count as misses."""
+        with self._lock:
+            entry = self._entries.get(key)
+            
+            if entry is None:
+                self.misses += 1
+                return default
+            
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key: Any, value: Any) -> bool:
+        """
+        Store a value, evicting older entries to stay within the byte budget.
+        
+        Returns:
+            False if the value alone is larger than the whole budget
+        """
+        size = self._size_of(value)
+        if size > self.max_bytes:
+            return False
+        
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            
+            while self._entries and self._bytes + size > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+            
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            return True
+    
+    def delete(self, key: Any):
+        """Remove an entry if present."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+    
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss/eviction counters and memory usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+    
+    def _remove(self, key: Any):
+        """Drop an entry and release its bytes (lock must be held)."""
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
@@ -3,25 +3,236 @@ Emotion detection service using DeepFace and OpenCV.
 """
 import cv2
 import numpy as np
-from deepface import DeepFace
 import logging
-from typing import Dict, Any
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Any, Callable, List, Optional
 import os
+from app.services.emotion_runtime import EMOTION_RUNTIMES, load_emotion_model
+from app.services.face_detector import HaarFaceDetector
+from app.services.metrics import DETECTIONS, count, stage_timer
+from config.settings import Config
 
 logger = logging.getLogger(__name__)
 
+def _deepface():
+    """
+    Import DeepFace on first use.
+    
+    DeepFace pulls in TensorFlow, which takes seconds and hundreds of MB, so
+    processes that never run inference (e.g. the playlist-only role) never pay for it.
+    """
+    from deepface import DeepFace
+    return DeepFace
+
+# Output order of DeepFace's emotion model
+EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+# Input size of the emotion CNN (48x48 grayscale)
+EMOTION_INPUT_SIZE = 48
+
+# Ways to combine the faces in a frame into one mood
+GROUP_AGGREGATIONS = ('mean', 'confidence', 'largest')
+
+
+class EmotionBatcher:
+    """
+    Micro-batching queue in front of the emotion classifier.
+    
+    Concurrent requests submit preprocessed 48x48 face tensors, one or a group
+    (every face in a frame). A single worker thread collects them for up to
+    `max_wait_ms` or `max_batch_size` faces, runs one forward pass over the
+    stacked batch and hands each caller back its rows. A group is never split
+    across forward passes unless it is larger than `max_batch_size`.
+    """
+    
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray],
+                 max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        """
+        Initialize the batcher.
+        
+        Args:
+            predict_fn: Function mapping an (N, 48, 48, 1) batch to (N, 7) scores
+            max_batch_size: Maximum number of faces per forward pass
+            max_wait_ms: How long the first face in a batch may wait for company
+        """
+        self._predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = float(max_wait_ms)
+        
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        
+        # Occupancy statistics
+        self._batches = 0
+        self._items = 0
+        self._batch_sizes = [0] * (self.max_batch_size + 1)
+        self._last_batch_ms = 0.0
+    
+    def submit(self, face_tensor: np.ndarray, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Queue one face tensor and block until its scores are available.
+        
+        Args:
+            face_tensor: Preprocessed (48, 48, 1) face tensor
+            timeout: Seconds to wait for the result
+            
+        Returns:
+            Raw emotion scores for the face, in EMOTION_LABELS order
+        """
+        return self.submit_many(face_tensor[np.newaxis], timeout=timeout)[0]
+    
+    def submit_many(self, face_tensors: np.ndarray, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Queue a group of face tensors and block until all their scores are available.
+        
+        Args:
+            face_tensors: Preprocessed (N, 48, 48, 1) face tensors
+            timeout: Seconds to wait for each forward pass the group needs
+            
+        Returns:
+            (N, 7) raw emotion scores, in input order
+        """
+        self._ensure_worker()
+        futures = []
+        for start in range(0, len(face_tensors), self.max_batch_size):
+            future = Future()
+            self._queue.put((face_tensors[start:start + self.max_batch_size], future))
+            futures.append(future)
+        return np.concatenate([future.result(timeout=timeout) for future in futures])
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batch occupancy statistics for throughput/latency tuning."""
+        with self._lock:
+            mean_batch_size = self._items / self._batches if self._batches else 0.0
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'batches': self._batches,
+                'items': self._items,
+                'mean_batch_size': mean_batch_size,
+                'mean_occupancy': mean_batch_size / self.max_batch_size,
+                'batch_size_histogram': {
+                    size: count for size, count in enumerate(self._batch_sizes) if count
+                },
+                'last_batch_ms': self._last_batch_ms,
+                'queue_depth': self._queue.qsize()
+            }
+    
+    def _ensure_worker(self):
+        """Start the worker thread lazily (and again in forked children)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='emotion-batcher', daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        """Worker loop: gather a batch, run it, repeat."""
+        # A group that didn't fit in the previous batch starts the next one
+        carried = None
+        while True:
+            batch = [carried if carried is not None else self._queue.get()]
+            carried = None
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait_ms / 1000.0
+            
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if size + len(item[0]) > self.max_batch_size:
+                    carried = item
+                    break
+                batch.append(item)
+                size += len(item[0])
+            
+            self._run_batch(batch)
+    
+    def _run_batch(self, batch: List):
+        """Run one forward pass and fan the results out to the callers."""
+        start = time.perf_counter()
+        size = sum(len(tensors) for tensors, _ in batch)
+        
+        try:
+            scores = self._predict_fn(np.concatenate([tensors for tensors, _ in batch]))
+            offset = 0
+            for tensors, future in batch:
+                future.set_result(scores[offset:offset + len(tensors)])
+                offset += len(tensors)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._batches += 1
+            self._items += size
+            self._batch_sizes[size] += 1
+            self._last_batch_ms = elapsed_ms
+        
+        logger.debug(f"Emotion batch: {size}/{self.max_batch_size} faces in {elapsed_ms:.1f}ms")
+
+
 class EmotionDetector:
     """
     Emotion detection using pre-trained models.
     
-    Uses DeepFace library which provides multiple emotion detection models.
+    Runs DeepFace's emotion CNN in TensorFlow, or an exported copy of it in
+    ONNX Runtime or TFLite (see emotion_runtime). Every face in a frame is
+    classified in the same forward pass and the frame's mood aggregates them.
     Falls back to OpenCV face detection if needed.
     """
     
-    def __init__(self):
-        """Initialize the emotion detector."""
-        self.models = ['VGG-Face', 'Facenet', 'OpenFace', 'DeepFace']
-        self.current_model = 'VGG-Face'
+    def __init__(self, batching: Optional[bool] = None, runtime: Optional[str] = None,
+                 group_aggregation: Optional[str] = None, max_faces: Optional[int] = None):
+        """
+        Initialize the emotion detector.
+        
+        Args:
+            batching: Enable micro-batching (defaults to Config.EMOTION_BATCHING)
+            runtime: Emotion classifier runtime (defaults to Config.EMOTION_RUNTIME)
+            group_aggregation: How a frame's faces combine into its mood, one of
+                GROUP_AGGREGATIONS (defaults to Config.GROUP_MOOD_AGGREGATION)
+            max_faces: Most faces classified per frame, largest first
+                (defaults to Config.MAX_FACES_PER_FRAME)
+        """
+        self.models = list(EMOTION_RUNTIMES)
+        self.current_model = (runtime or Config.EMOTION_RUNTIME).lower()
+        self.group_aggregation = (group_aggregation or Config.GROUP_MOOD_AGGREGATION).lower()
+        if self.group_aggregation not in GROUP_AGGREGATIONS:
+            raise ValueError(f"Unknown group mood aggregation '{self.group_aggregation}' "
+                             f"(expected one of {', '.join(GROUP_AGGREGATIONS)})")
+        self.max_faces = max(1, Config.MAX_FACES_PER_FRAME if max_faces is None else max_faces)
+        self.detector_backend = Config.FACE_DETECTOR_BACKEND
+        self._emotion_model = None
+        
+        # Haar cascade used by the fallback path, loaded once per thread
+        self.face_detector = HaarFaceDetector.from_config()
+        
+        # Micro-batching of concurrent requests into one forward pass
+        self.batcher = None
+        if Config.EMOTION_BATCHING if batching is None else batching:
+            self.batcher = EmotionBatcher(
+                self._predict_batch,
+                max_batch_size=Config.EMOTION_BATCH_SIZE,
+                max_wait_ms=Config.EMOTION_BATCH_WAIT_MS
+            )
+        
+        # Readiness state, flipped by warmup() or the first successful detection
+        self.ready = False
+        self.warmup_error = None
+        self._warmup_lock = threading.Lock()
         
         # Emotion mapping from DeepFace to our simplified categories
         self.emotion_mapping = {
@@ -36,6 +247,52 @@ class EmotionDetector:
         
         logger.info("Emotion detector initialized")
     
+    def warmup(self) -> bool:
+        """
+        Build the emotion model and face detector and run a dummy inference.
+        
+        Calling this before serving (or before gunicorn forks its workers)
+        takes the model loading cost off the first /detect-mood request.
+        
+        Returns:
+            True if the detector is ready to serve requests
+        """
+        with self._warmup_lock:
+            if self.ready:
+                return True
+            
+            try:
+                start = time.perf_counter()
+                
+                self._load_emotion_model()
+                self.face_detector.warmup()
+                if self.detector_backend != 'opencv':
+                    from deepface.detectors import FaceDetector
+                    FaceDetector.build_model(self.detector_backend)
+                
+                # Dummy passes build the model's graph/buffers and detector state
+                dummy_image = np.zeros((224, 224, 3), dtype=np.uint8)
+                self.locate_faces(dummy_image)
+                self._predict_batch(np.zeros(
+                    (1, EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE, 1), dtype=np.float32
+                ))
+                
+                self.ready = True
+                self.warmup_error = None
+                logger.info(f"Emotion detector warmed up in {time.perf_counter() - start:.2f}s")
+                
+            except Exception as e:
+                self.warmup_error = str(e)
+                logger.error(f"Emotion detector warmup failed: {str(e)}")
+            
+            return self.ready
+    
+    def start_background_warmup(self) -> threading.Thread:
+        """Run warmup() in a daemon thread so the server can bind immediately."""
+        thread = threading.Thread(target=self.warmup, name='emotion-warmup', daemon=True)
+        thread.start()
+        return thread
+    
     def detect_emotion(self, image_array: np.ndarray) -> Dict[str, Any]:
         """
         Detect emotion from image array.
@@ -44,90 +301,348 @@ class EmotionDetector:
             image_array: NumPy array representing the image
             
         Returns:
-            Dictionary with mood, confidence, and emotion scores
+            Dictionary with the frame's mood, confidence and emotion scores,
+            all face boxes and a mood per classified face ('face_results')
         """
+        faces = None
+        
         try:
-            # Ensure image is in correct format
-            if len(image_array.shape) == 3 and image_array.shape[2] == 4:
-                # Convert RGBA to RGB
-                image_array = cv2.cvtColor(image_array, cv2.COLOR_RGBA2RGB)
-            elif len(image_array.shape) == 3 and image_array.shape[2] == 3:
-                # Already RGB
-                pass
-            else:
-                # Convert grayscale to RGB if needed
-                image_array = cv2.cvtColor(image_array, cv2.COLOR_GRAY2RGB)
+            with stage_timer('color_convert'):
+                image_array = self._to_rgb(image_array)
             
-            # Use DeepFace to analyze emotions
-            result = DeepFace.analyze(
-                img_path=image_array,
-                actions=['emotion'],
-                enforce_detection=False,
-                silent=True
-            )
+            # Locate faces once, then classify all crops together (batched with other requests)
+            with stage_timer('face_detect'):
+                faces = self.locate_faces(image_array)
             
-            # Extract emotion data
-            if isinstance(result, list):
-                emotion_data = result[0]['emotion']
-            else:
-                emotion_data = result['emotion']
-            
-            # Map emotions to our categories and find dominant emotion
-            mapped_emotions = {}
-            for emotion, confidence in emotion_data.items():
-                mapped_category = self.emotion_mapping.get(emotion.lower(), 'neutral')
-                if mapped_category in mapped_emotions:
-                    mapped_emotions[mapped_category] += confidence
+            with stage_timer('classify'):
+                face_tensors = self._preprocess_faces(image_array, faces)
+                if self.batcher is not None:
+                    emotion_scores = self.batcher.submit_many(face_tensors)
                 else:
-                    mapped_emotions[mapped_category] = confidence
+                    emotion_scores = self._predict_batch(face_tensors)
+            
+            result = self._build_group_result(emotion_scores, faces)
+            count(DETECTIONS, 'model')
             
-            # Find the mood with highest confidence
-            dominant_mood = max(mapped_emotions.items(), key=lambda x: x[1])
-            mood = dominant_mood[0]
-            confidence = float(dominant_mood[1] / 100.0)  # Convert to Python float
+            self.ready = True
+            logger.info(f"Emotion detection successful: {result['mood']} ({result['confidence']:.2f})")
             
-            # Normalize all emotions to decimals and convert to Python float
-            normalized_emotions = {k: float(v / 100.0) for k, v in mapped_emotions.items()}
+            return result
             
-            logger.info(f"Emotion detection successful: {mood} ({confidence:.2f})")
+        except Exception as e:
+            logger.warning(f"Emotion classification failed: {str(e)}")
+            with stage_timer('fallback'):
+                return self._fallback_detection(image_array, faces)
+    
+    def detect_emotions(self, images: List[np.ndarray]) -> List[Dict[str, Any]]:
+        """
+        Detect emotion for several images with a single forward pass.
+        
+        Faces are located per image, then the crops of every face in every
+        image are stacked and classified together. Images whose face
+        extraction fails use the fallback path.
+        
+        Args:
+            images: List of NumPy arrays representing the images
             
+        Returns:
+            List of result dictionaries, in input order
+        """
+        images = list(images)
+        results = [None] * len(images)
+        faces_per_image = [None] * len(images)
+        tensors = []
+        # (image index, first row, end row) of each image's faces in the stacked batch
+        spans = []
+        rows = 0
+        
+        for index, image_array in enumerate(images):
+            try:
+                image_array = self._to_rgb(image_array)
+                images[index] = image_array
+                faces_per_image[index] = self.locate_faces(image_array)
+                face_tensors = self._preprocess_faces(image_array, faces_per_image[index])
+                tensors.append(face_tensors)
+                spans.append((index, rows, rows + len(face_tensors)))
+                rows += len(face_tensors)
+            except Exception as e:
+                logger.warning(f"Face localization failed for image {index}: {str(e)}")
+                results[index] = self._fallback_detection(image_array, faces_per_image[index])
+        
+        if tensors:
+            try:
+                scores = self._predict_stacked(np.concatenate(tensors))
+                for index, start, end in spans:
+                    results[index] = self._build_group_result(scores[start:end], faces_per_image[index])
+                    count(DETECTIONS, 'model')
+                self.ready = True
+            except Exception as e:
+                logger.warning(f"Batched emotion detection failed: {str(e)}")
+                for index, _, _ in spans:
+                    results[index] = self._fallback_detection(images[index], faces_per_image[index])
+        
+        logger.info(f"Batch emotion detection finished for {len(images)} images")
+        return results
+    
+    def aggregate_results(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Combine several detection results into one overall mood.
+        
+        Args:
+            results: Results from detect_emotion/detect_emotions
+            
+        Returns:
+            Dictionary with the mean emotion scores and their dominant mood
+        """
+        successful = [result for result in results if not result['error']]
+        
+        if not successful:
             return {
-                'mood': mood,
-                'confidence': confidence,
-                'emotions': normalized_emotions,
-                'error': False,
-                'message': 'Detection successful'
+                'mood': 'neutral',
+                'confidence': 0.3,
+                'emotions': {'neutral': 1.0},
+                'images_used': 0,
+                'error': True,
+                'message': 'No emotion detected in any image'
             }
+        
+        totals = {}
+        for result in successful:
+            for emotion, score in result['emotions'].items():
+                totals[emotion] = totals.get(emotion, 0.0) + score
+        
+        mean_emotions = {emotion: total / len(successful) for emotion, total in totals.items()}
+        mood, confidence = max(mean_emotions.items(), key=lambda x: x[1])
+        
+        return {
+            'mood': mood,
+            'confidence': float(confidence),
+            'emotions': mean_emotions,
+            'images_used': len(successful),
+            'error': False,
+            'message': 'Aggregation successful'
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get inference statistics (batch occupancy) for monitoring."""
+        return {
+            'ready': self.ready,
+            'model': self._emotion_model.get_info() if self._emotion_model is not None else {
+                'runtime': self.current_model
+            },
+            'batching': self.batcher.get_stats() if self.batcher is not None else None
+        }
+    
+    def _to_rgb(self, image_array: np.ndarray) -> np.ndarray:
+        """Convert RGBA or grayscale input to a 3-channel RGB array."""
+        if len(image_array.shape) == 3 and image_array.shape[2] == 4:
+            # Convert RGBA to RGB
+            return cv2.cvtColor(image_array, cv2.COLOR_RGBA2RGB)
+        elif len(image_array.shape) == 3 and image_array.shape[2] == 3:
+            # Already RGB
+            return image_array
+        else:
+            # Convert grayscale to RGB if needed
+            return cv2.cvtColor(image_array, cv2.COLOR_GRAY2RGB)
+    
+    def locate_faces(self, image_array: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Run the face-localization stage once for a frame.
+        
+        The default 'opencv' backend uses the pre-loaded Haar cascade and crops
+        faces straight from the frame. Other DeepFace detector backends return
+        their aligned face crops.
+        
+        Args:
+            image_array: RGB image
             
-        except Exception as e:
-            logger.warning(f"DeepFace detection failed: {str(e)}")
-            return self._fallback_detection(image_array)
+        Returns:
+            List of {'box': (x, y, w, h), 'crop': face image}, largest face first
+        """
+        faces = []
+        
+        if self.detector_backend == 'opencv':
+            for (x, y, w, h) in self.face_detector.detect(image_array):
+                faces.append({'box': (x, y, w, h), 'crop': image_array[y:y + h, x:x + w]})
+        else:
+            height, width = image_array.shape[:2]
+            for face in _deepface().extract_faces(
+                img_path=image_array,
+                target_size=(224, 224),
+                detector_backend=self.detector_backend,
+                enforce_detection=False,
+                align=True
+            ):
+                area = face['facial_area']
+                box = (int(area['x']), int(area['y']), int(area['w']), int(area['h']))
+                # With enforce_detection=False a miss is reported as the whole frame
+                if box == (0, 0, width, height):
+                    continue
+                faces.append({'box': box, 'crop': face['face']})
+        
+        faces.sort(key=lambda face: face['box'][2] * face['box'][3], reverse=True)
+        return faces
     
-    def _fallback_detection(self, image_array: np.ndarray) -> Dict[str, Any]:
+    def _preprocess_faces(self, image_array: np.ndarray, faces: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Stack the crops to classify: the `max_faces` largest faces, or the whole
+        frame when no face was found (matching DeepFace's enforce_detection=False
+        behaviour).
+        
+        Returns:
+            (N, 48, 48, 1) float32 tensors, in the order of `faces`
+        """
+        crops = [face['crop'] for face in faces[:self.max_faces]] or [image_array]
+        return np.stack([self._preprocess_face(crop) for crop in crops])
+    
+    def _box_to_dict(self, box) -> Dict[str, int]:
+        """Convert an (x, y, w, h) box to a JSON-friendly dictionary."""
+        x, y, w, h = box
+        return {'x': int(x), 'y': int(y), 'w': int(w), 'h': int(h)}
+    
+    def _preprocess_face(self, face: np.ndarray) -> np.ndarray:
+        """
+        Convert a face crop to the (48, 48, 1) grayscale tensor the model expects.
+        
+        Args:
+            face: RGB face crop, uint8 or float in [0, 1]
+            
+        Returns:
+            float32 tensor scaled to [0, 1]
+        """
+        if np.issubdtype(face.dtype, np.integer):
+            face = face.astype(np.float32) / 255.0
+        else:
+            face = face.astype(np.float32)
+        
+        if len(face.shape) == 3:
+            face = cv2.cvtColor(face, cv2.COLOR_RGB2GRAY)
+        
+        face = cv2.resize(face, (EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE))
+        return face[:, :, np.newaxis]
+    
+    def _load_emotion_model(self):
+        """Load the emotion CNN in the current runtime."""
+        if self._emotion_model is None:
+            self._emotion_model = load_emotion_model(self.current_model)
+        return self._emotion_model
+    
+    def _predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Run the emotion CNN over a stacked batch of face tensors.
+        
+        Args:
+            batch: (N, 48, 48, 1) float32 array
+            
+        Returns:
+            (N, 7) array of class probabilities in EMOTION_LABELS order
+        """
+        return self._load_emotion_model().predict(batch)
+    
+    def _predict_stacked(self, batch: np.ndarray) -> np.ndarray:
+        """Run a pre-stacked batch in chunks of at most EMOTION_BATCH_SIZE faces."""
+        chunk_size = max(1, Config.EMOTION_BATCH_SIZE)
+        return np.concatenate([
+            self._predict_batch(batch[start:start + chunk_size])
+            for start in range(0, len(batch), chunk_size)
+        ])
+    
+    def _build_group_result(self, emotion_scores: np.ndarray, faces: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Build a frame's result from the scores of its classified faces.
+        
+        Args:
+            emotion_scores: (N, 7) scores, one row per face in `faces` order
+                (a single row for the whole frame when no face was found)
+            faces: Output of the localization stage
+            
+        Returns:
+            The aggregated result, with every face box in 'faces' and the
+            classified faces' box, mood, confidence and emotions in 'face_results'
+        """
+        face_results = []
+        for face, face_scores in zip(faces, emotion_scores):
+            face_result = self._build_result(face_scores)
+            face_results.append({
+                'box': self._box_to_dict(face['box']),
+                'mood': face_result['mood'],
+                'confidence': face_result['confidence'],
+                'emotions': face_result['emotions']
+            })
+        
+        result = self._build_result(self._aggregate_faces(emotion_scores))
+        result['faces'] = [self._box_to_dict(face['box']) for face in faces]
+        result['face_results'] = face_results
+        result['aggregation'] = self.group_aggregation
+        return result
+    
+    def _aggregate_faces(self, emotion_scores: np.ndarray) -> np.ndarray:
+        """
+        Combine per-face scores (largest face first) into one score vector.
+        
+        'mean' averages the faces' probability vectors, 'confidence' weights
+        each face by its top probability so uncertain faces count less, and
+        'largest' keeps the largest face's scores.
+        """
+        probabilities = np.asarray(emotion_scores, dtype=np.float64)
+        totals = probabilities.sum(axis=1, keepdims=True)
+        probabilities = probabilities / np.where(totals > 0, totals, 1.0)
+        
+        if self.group_aggregation == 'largest' or len(probabilities) == 1:
+            return probabilities[0]
+        if self.group_aggregation == 'confidence':
+            return np.average(probabilities, axis=0, weights=probabilities.max(axis=1))
+        return probabilities.mean(axis=0)
+    
+    def _build_result(self, emotion_scores: np.ndarray) -> Dict[str, Any]:
+        """
+        Map raw model scores to our mood categories.
+        
+        Args:
+            emotion_scores: Scores in EMOTION_LABELS order
+            
+        Returns:
+            Dictionary with mood, confidence, and emotion scores
+        """
+        total = float(np.sum(emotion_scores)) or 1.0
+        
+        # Map emotions to our categories and find dominant emotion
+        mapped_emotions = {}
+        for emotion, score in zip(EMOTION_LABELS, emotion_scores):
+            mapped_category = self.emotion_mapping.get(emotion, 'neutral')
+            mapped_emotions[mapped_category] = mapped_emotions.get(mapped_category, 0.0) + float(score) / total
+        
+        # Find the mood with highest confidence
+        mood, confidence = max(mapped_emotions.items(), key=lambda x: x[1])
+        
+        return {
+            'mood': mood,
+            'confidence': float(confidence),
+            'emotions': mapped_emotions,
+            'error': False,
+            'message': 'Detection successful'
+        }
+    
+    def _fallback_detection(self, image_array: np.ndarray,
+                            faces: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """
         Fallback emotion detection using face detection only.
         
         Args:
             image_array: NumPy array representing the image
+            faces: Output of the localization stage, if it already ran
             
         Returns:
             Dictionary with neutral mood as fallback
         """
         try:
-            # Convert to grayscale for face detection
-            if len(image_array.shape) == 3:
-                gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
-            else:
-                gray = image_array
-            
-            # Load OpenCV face cascade
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            
-            # Detect faces
-            faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+            # Reuse the boxes from the localization stage when available
+            if faces is None:
+                faces = [{'box': box} for box in self.face_detector.detect(image_array)]
             
             if len(faces) > 0:
                 logger.info("Face detected, returning neutral mood as fallback")
+                count(DETECTIONS, 'fallback')
                 return {
                     'mood': 'neutral',
                     'confidence': 0.5,
@@ -139,21 +654,26 @@ class EmotionDetector:
                         'surprise': 0.125,
                         'fear': 0.0
                     },
+                    'faces': [self._box_to_dict(face['box']) for face in faces],
+                    'fallback': True,
                     'error': False,
                     'message': 'Face detected, emotion analysis unavailable - using neutral'
                 }
             else:
                 logger.warning("No face detected in image")
+                count(DETECTIONS, 'no_face')
                 return {
                     'mood': 'neutral',
                     'confidence': 0.3,
                     'emotions': {'neutral': 1.0},
+                    'faces': [],
                     'error': True,
                     'message': 'No face detected in image'
                 }
                 
         except Exception as e:
             logger.error(f"Fallback detection failed: {str(e)}")
+            count(DETECTIONS, 'failed')
             return {
                 'mood': 'neutral',
                 'confidence': 0.3,
@@ -168,16 +688,21 @@ class EmotionDetector:
     
     def set_model(self, model_name: str) -> bool:
         """
-        Set the emotion detection model.
+        Switch the emotion classifier runtime.
+        
+        The model is loaded in the new runtime on the next inference (or by
+        warmup()); in-flight inferences finish on the old one.
         
         Args:
-            model_name: Name of the model to use
+            model_name: One of self.models ('tensorflow', 'onnx', 'tflite')
             
         Returns:
             True if model was set successfully
         """
         if model_name in self.models:
-            self.current_model = model_name
+            if model_name != self.current_model:
+                self.current_model = model_name
+                self._emotion_model = None
             logger.info(f"Emotion detection model set to: {model_name}")
             return True
         else:
@@ -0,0 +1,226 @@
+"""
+Runtimes for the emotion classifier: TensorFlow, ONNX Runtime and TFLite.
+
+The 48x48 emotion CNN is tiny; loading it through DeepFace pulls in all of
+TensorFlow. The ONNX and int8 TFLite runtimes run an exported copy of the
+same model (see benchmarks/convert_emotion_model.py) without importing
+TensorFlow or DeepFace at all. Runtime packages are imported when a model
+is loaded, never at import time.
+"""
+import abc
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+EMOTION_RUNTIMES = ('tensorflow', 'onnx', 'tflite')
+
+# Files looked up when EMOTION_MODEL_PATH is a directory
+DEFAULT_MODEL_FILES = {
+    'onnx': 'emotion.onnx',
+    'tflite': 'emotion_int8.tflite'
+}
+
+
+def _tflite_interpreter_class():
+    """
+    The lightest TFLite interpreter available.
+    
+    ai-edge-litert and tflite-runtime are small standalone packages; full
+    TensorFlow is only used when neither is installed.
+    """
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+def resolve_model_path(runtime: str, model_path: Optional[str] = None) -> Optional[str]:
+    """
+    Find the model file for a runtime.
+    
+    Args:
+        runtime: One of EMOTION_RUNTIMES
+        model_path: A model file, or a directory holding DEFAULT_MODEL_FILES
+            (defaults to Config.EMOTION_MODEL_PATH)
+            
+    Returns:
+        Path of the model file (None for the TensorFlow runtime, which gets
+        its weights from DeepFace)
+    """
+    if runtime == 'tensorflow':
+        return None
+    model_path = Config.EMOTION_MODEL_PATH if model_path is None else model_path
+    if os.path.isdir(model_path):
+        return os.path.join(model_path, DEFAULT_MODEL_FILES[runtime])
+    return model_path
+
+
+class EmotionModel(abc.ABC):
+    """
+    An emotion classifier loaded in one runtime.
+    
+    predict() maps an (N, 48, 48, 1) float32 batch of faces scaled to [0, 1]
+    to (N, 7) class probabilities in EMOTION_LABELS order.
+    """
+    
+    runtime = None
+    
+    def __init__(self, path: Optional[str] = None, threads: int = 0):
+        """
+        Initialize the model.
+        
+        Args:
+            path: Model file (unused by the TensorFlow runtime)
+            threads: Intra-op threads for inference (0 for the runtime's default)
+        """
+        self.path = path
+        self.threads = threads
+    
+    @abc.abstractmethod
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Class probabilities, (N, 7), for an (N, 48, 48, 1) batch."""
+    
+    def get_info(self) -> Dict[str, Any]:
+        """Describe the loaded model for monitoring."""
+        return {
+            'runtime': self.runtime,
+            'path': self.path,
+            'threads': self.threads
+        }
+
+
+class TensorFlowEmotionModel(EmotionModel):
+    """DeepFace's Keras emotion CNN, run in TensorFlow."""
+    
+    runtime = 'tensorflow'
+    
+    def __init__(self, path: Optional[str] = None, threads: int = 0):
+        super().__init__(None, threads)
+        from app.services.emotion_detector import _deepface
+        self.model = _deepface().build_model('Emotion')
+    
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # Calling the model directly avoids predict()'s per-call overhead on small batches
+        return np.asarray(self.model(batch, training=False))
+
+
+class OnnxEmotionModel(EmotionModel):
+    """The exported emotion CNN in ONNX Runtime (CPU)."""
+    
+    runtime = 'onnx'
+    
+    def __init__(self, path: Optional[str] = None, threads: int = 0):
+        super().__init__(path, threads)
+        # Imported here so processes that never use this runtime don't load it
+        import onnxruntime
+        
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        # Batches come from one thread at a time; spinning pool threads only burn CPU
+        options.add_session_config_entry('session.intra_op.allow_spinning', '0')
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+    
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # InferenceSession.run is safe to call from several threads
+        return self.session.run(None, {self.input_name: batch.astype(np.float32, copy=False)})[0]
+
+
+class TFLiteEmotionModel(EmotionModel):
+    """
+    The int8-quantized emotion CNN in a TFLite interpreter.
+    
+    Inputs are quantized and outputs dequantized here, so the model may take
+    int8 or float tensors. The interpreter is not thread-safe, so inference
+    is serialized, and its input is resized when the batch size changes.
+    """
+    
+    runtime = 'tflite'
+    
+    def __init__(self, path: Optional[str] = None, threads: int = 0):
+        super().__init__(path, threads)
+        self.interpreter = _tflite_interpreter_class()(model_path=path, num_threads=threads or None)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        self._lock = threading.Lock()
+    
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        batch = self._quantize(batch, self._input)
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input['index'], list(batch.shape))
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self.interpreter.set_tensor(self._input['index'], batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output['index'])
+        return self._dequantize(output, self._output)
+    
+    @staticmethod
+    def _quantize(values: np.ndarray, details: Dict[str, Any]) -> np.ndarray:
+        scale, zero_point = details['quantization']
+        if not scale:
+            return values.astype(details['dtype'], copy=False)
+        info = np.iinfo(details['dtype'])
+        return np.clip(np.round(values / scale + zero_point), info.min, info.max).astype(details['dtype'])
+    
+    @staticmethod
+    def _dequantize(values: np.ndarray, details: Dict[str, Any]) -> np.ndarray:
+        scale, zero_point = details['quantization']
+        if not scale:
+            return values.astype(np.float32, copy=False)
+        return (values.astype(np.float32) - zero_point) * scale
+
+
+MODEL_CLASSES = {
+    'tensorflow': TensorFlowEmotionModel,
+    'onnx': OnnxEmotionModel,
+    'tflite': TFLiteEmotionModel
+}
+
+
+def load_emotion_model(runtime: Optional[str] = None, model_path: Optional[str] = None,
+                       threads: Optional[int] = None) -> EmotionModel:
+    """
+    Load the emotion classifier in the configured runtime.
+    
+    Args:
+        runtime: One of EMOTION_RUNTIMES (defaults to Config.EMOTION_RUNTIME)
+        model_path: Model file or directory (defaults to Config.EMOTION_MODEL_PATH)
+        threads: Intra-op threads (defaults to Config.EMOTION_RUNTIME_THREADS)
+        
+    Returns:
+        The loaded model
+        
+    Raises:
+        ValueError: for an unknown runtime
+        FileNotFoundError: when the runtime's model file is missing
+    """
+    runtime = (runtime or Config.EMOTION_RUNTIME).lower()
+    if runtime not in MODEL_CLASSES:
+        raise ValueError(f"Unknown emotion runtime '{runtime}' (expected one of {', '.join(EMOTION_RUNTIMES)})")
+    
+    path = resolve_model_path(runtime, model_path)
+    if path is not None and not os.path.isfile(path):
+        raise FileNotFoundError(
+            f"No {runtime} emotion model at {path} (create it with benchmarks/convert_emotion_model.py)"
+        )
+    
+    threads = Config.EMOTION_RUNTIME_THREADS if threads is None else threads
+    model = MODEL_CLASSES[runtime](path, threads)
+    logger.info(f"Emotion model loaded: {runtime}" + (f" from {path}" if path else ''))
+    return model
@@ -0,0 +1,111 @@
+"""
+Face detection stage using OpenCV Haar cascades.
+"""
+import cv2
+import numpy as np
+import logging
+import threading
+from typing import List, Tuple, Optional
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+FaceBox = Tuple[int, int, int, int]
+
+
+class HaarFaceDetector:
+    """
+    Pre-loaded Haar cascade face detector.
+    
+    The cascade is loaded once per thread (CascadeClassifier.detectMultiScale
+    is not safe to share across threads) and detection runs on a grayscale
+    copy downscaled to at most `max_dimension` pixels; detectMultiScale then
+    builds its image pyramid from that smaller frame. Boxes are returned in
+    the coordinates of the original image.
+    """
+    
+    def __init__(self, scale_factor: float = 1.1, min_neighbors: int = 4,
+                 min_face_size: int = 30, max_dimension: int = 640,
+                 cascade_path: Optional[str] = None):
+        """
+        Initialize the face detector.
+        
+        Args:
+            scale_factor: Pyramid step between detection scales (larger is faster)
+            min_neighbors: Neighbouring detections required to keep a face
+            min_face_size: Smallest face to detect, in original image pixels
+            max_dimension: Longest side of the frame detection runs on (0 disables downscaling)
+            cascade_path: Cascade XML file (defaults to OpenCV's frontal face model)
+        """
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_face_size = min_face_size
+        self.max_dimension = max_dimension
+        self.cascade_path = cascade_path or cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        self._local = threading.local()
+    
+    @classmethod
+    def from_config(cls) -> 'HaarFaceDetector':
+        """Create a detector from the FACE_* settings."""
+        return cls(
+            scale_factor=Config.FACE_SCALE_FACTOR,
+            min_neighbors=Config.FACE_MIN_NEIGHBORS,
+            min_face_size=Config.FACE_MIN_SIZE,
+            max_dimension=Config.FACE_DETECT_MAX_DIMENSION
+        )
+    
+    def warmup(self):
+        """Load the cascade for the calling thread ahead of the first detection."""
+        self._get_cascade()
+    
+    def detect(self, image_array: np.ndarray) -> List[FaceBox]:
+        """
+        Detect faces in an image.
+        
+        Args:
+            image_array: RGB, RGBA or grayscale image
+            
+        Returns:
+            List of (x, y, width, height) boxes in original image coordinates
+        """
+        gray = self._to_gray(image_array)
+        
+        height, width = gray.shape[:2]
+        scale = 1.0
+        if self.max_dimension and max(height, width) > self.max_dimension:
+            scale = self.max_dimension / float(max(height, width))
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        
+        min_size = max(1, int(round(self.min_face_size * scale)))
+        faces = self._get_cascade().detectMultiScale(
+            gray,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=(min_size, min_size)
+        )
+        
+        return [
+            (int(x / scale), int(y / scale), int(w / scale), int(h / scale))
+            for (x, y, w, h) in faces
+        ]
+    
+    def _get_cascade(self) -> cv2.CascadeClassifier:
+        """Get this thread's cascade, loading it on first use."""
+        cascade = getattr(self._local, 'cascade', None)
+        
+        if cascade is None:
+            cascade = cv2.CascadeClassifier(self.cascade_path)
+            if cascade.empty():
+                raise RuntimeError(f'Unable to load face cascade: {self.cascade_path}')
+            self._local.cascade = cascade
+            logger.debug(f"Loaded face cascade for thread {threading.current_thread().name}")
+        
+        return cascade
+    
+    def _to_gray(self, image_array: np.ndarray) -> np.ndarray:
+        """Convert an RGB/RGBA image to grayscale."""
+        if len(image_array.shape) == 3 and image_array.shape[2] == 4:
+            return cv2.cvtColor(image_array, cv2.COLOR_RGBA2GRAY)
+        elif len(image_array.shape) == 3:
+            return cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
+        return image_array
@@ -0,0 +1,332 @@
+"""
+Process-pool inference backend for emotion detection.
+
+Each worker process owns its own loaded emotion model, so concurrent requests
+are spread across CPU cores instead of contending on the GIL and a single
+TensorFlow session. Decoded frames are handed to workers through shared
+memory; only the segment name, shape and dtype are pickled.
+"""
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeout
+from multiprocessing import shared_memory
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+WORKER_NAME_PREFIX = 'inference-worker'
+
+
+class InferencePoolFull(Exception):
+    """Raised when the inference queue is full and cannot accept more frames."""
+
+
+def is_inference_worker() -> bool:
+    """
+    Check whether the current process is (or is being spawned as) a pool worker.
+    
+    Spawned children re-import the parent's main module before running their
+    target, so create_app() uses this to avoid starting a nested pool.
+    """
+    return multiprocessing.current_process().name.startswith(WORKER_NAME_PREFIX)
+
+
+def _worker_main(job_queue, result_queue):
+    """
+    Worker process loop: load the model once, then analyze frames from shared memory.
+    
+    Args:
+        job_queue: Queue of (job_id, shm_name, shape, dtype) tuples, None to stop
+        result_queue: Queue receiving (job_id, result) tuples
+    """
+    logging.basicConfig(level=logging.INFO)
+    
+    # Imported here so the parent process never needs the ML stack for the pool itself
+    from app.services.emotion_detector import EmotionDetector
+    
+    # Requests already arrive one at a time, so in-process micro-batching would only add latency
+    detector = EmotionDetector(batching=False)
+    detector.warmup()
+    result_queue.put(('ready', os.getpid()))
+    
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+        
+        job_id, shm_name, shape, dtype = job
+        try:
+            shm = shared_memory.SharedMemory(name=shm_name)
+        except FileNotFoundError:
+            # The request timed out and released the frame before we got to it
+            continue
+        
+        try:
+            image_array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+            result = detector.detect_emotion(image_array)
+        except Exception as e:
+            result = {
+                'mood': 'neutral',
+                'confidence': 0.3,
+                'emotions': {'neutral': 1.0},
+                'error': True,
+                'message': f'Detection failed: {str(e)}'
+            }
+        finally:
+            # Views into the segment must be gone before it can be closed
+            image_array = None
+            shm.close()
+        
+        result_queue.put((job_id, result))
+
+
+class InferencePool:
+    """
+    Pool of worker processes running EmotionDetector.
+    
+    Request threads call detect_emotion(), which copies the frame into a
+    shared-memory segment, queues a small job descriptor and waits for the
+    worker's result. The number of in-flight frames is bounded by
+    `queue_depth`; beyond that, requests are rejected or block depending on
+    `backpressure`.
+    """
+    
+    def __init__(self, workers: int = 2, queue_depth: int = 32,
+                 backpressure: str = 'reject', timeout: float = 30.0):
+        """
+        Initialize the pool (workers are started by start()).
+        
+        Args:
+            workers: Number of worker processes
+            queue_depth: Maximum frames queued or in progress across all workers
+            backpressure: 'reject' to fail fast when full, 'block' to wait for a slot
+            timeout: Seconds to wait for a slot (when blocking) and for a result
+        """
+        self.workers = max(1, int(workers))
+        self.queue_depth = max(1, int(queue_depth))
+        self.backpressure = backpressure
+        self.timeout = timeout
+        
+        self._context = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.queue_depth)
+        self._job_ids = itertools.count()
+        self._pending = {}
+        self._processes = []
+        self._ready_pids = set()
+        self._pid = None
+        
+        self._completed = 0
+        self._rejected = 0
+        self._timed_out = 0
+    
+    @classmethod
+    def from_config(cls) -> 'InferencePool':
+        """Create a pool from the INFERENCE_* settings."""
+        return cls(
+            workers=Config.INFERENCE_WORKERS,
+            queue_depth=Config.INFERENCE_QUEUE_DEPTH,
+            backpressure=Config.INFERENCE_BACKPRESSURE,
+            timeout=Config.INFERENCE_TIMEOUT
+        )
+    
+    @property
+    def ready(self) -> bool:
+        """True once at least one of this process's workers has loaded its model."""
+        # A forked child inherits the parent's worker pids but not its workers
+        return self._pid == os.getpid() and bool(self._ready_pids)
+    
+    def start(self):
+        """Start the worker processes and the result collector (once per process)."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            
+            # Fresh state, also when a forked child inherits a started pool
+            self._pid = os.getpid()
+            self._jobs = self._context.Queue()
+            self._results = self._context.Queue()
+            self._processes = []
+            self._ready_pids = set()
+            
+            for index in range(self.workers):
+                self._processes.append(self._spawn_worker(index))
+            
+            collector = threading.Thread(target=self._collect_results, name='inference-collector', daemon=True)
+            collector.start()
+        
+        logger.info(f"Inference pool started with {self.workers} worker processes")
+    
+    def shutdown(self):
+        """Stop all worker processes."""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            
+            for _ in self._processes:
+                self._jobs.put(None)
+            for process in self._processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            
+            self._processes = []
+            self._pid = None
+        
+        logger.info("Inference pool stopped")
+    
+    def submit(self, image_array: np.ndarray) -> Future:
+        """
+        Queue a frame for analysis.
+        
+        Args:
+            image_array: Decoded image as a NumPy array
+            
+        Returns:
+            Future resolving to the detection result dictionary
+            
+        Raises:
+            InferencePoolFull: If no queue slot is available
+        """
+        self.start()
+        self._restart_dead_workers()
+        
+        if self.backpressure == 'block':
+            acquired = self._slots.acquire(timeout=self.timeout)
+        else:
+            acquired = self._slots.acquire(blocking=False)
+        
+        if not acquired:
+            with self._lock:
+                self._rejected += 1
+            raise InferencePoolFull(f'Inference queue is full ({self.queue_depth} frames in flight)')
+        
+        try:
+            image_array = np.ascontiguousarray(image_array)
+            shm = shared_memory.SharedMemory(create=True, size=max(1, image_array.nbytes))
+            shared_view = np.ndarray(image_array.shape, dtype=image_array.dtype, buffer=shm.buf)
+            shared_view[...] = image_array
+            del shared_view
+        except Exception:
+            self._slots.release()
+            raise
+        
+        job_id = next(self._job_ids)
+        future = Future()
+        with self._lock:
+            self._pending[job_id] = (future, shm)
+        future.add_done_callback(lambda _: self._finish(job_id))
+        
+        self._jobs.put((job_id, shm.name, image_array.shape, image_array.dtype.str))
+        return future
+    
+    def detect_emotion(self, image_array: np.ndarray) -> Dict[str, Any]:
+        """
+        Analyze one frame in a worker process and wait for the result.
+        
+        Raises:
+            InferencePoolFull: If the frame could not be queued
+            TimeoutError: If no result arrived within the configured timeout
+        """
+        return self._wait(self.submit(image_array))
+    
+    def detect_emotions(self, images: List[np.ndarray]) -> List[Dict[str, Any]]:
+        """Analyze several frames in parallel across the workers."""
+        futures = []
+        try:
+            for image_array in images:
+                futures.append(self.submit(image_array))
+        except InferencePoolFull:
+            for future in futures:
+                future.cancel()
+            raise
+        
+        return [self._wait(future) for future in futures]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool statistics for monitoring."""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'alive_workers': sum(1 for process in self._processes if process.is_alive()),
+                'ready_workers': len(self._ready_pids),
+                'queue_depth': self.queue_depth,
+                'in_flight': len(self._pending),
+                'backpressure': self.backpressure,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'timed_out': self._timed_out
+            }
+    
+    def _wait(self, future: Future) -> Dict[str, Any]:
+        """Wait for a result, releasing the frame if it takes too long."""
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                self._timed_out += 1
+            raise TimeoutError(f'No inference result within {self.timeout}s')
+    
+    def _spawn_worker(self, index: int):
+        """Start one worker process."""
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self._jobs, self._results),
+            name=f'{WORKER_NAME_PREFIX}-{index}',
+            daemon=True
+        )
+        process.start()
+        return process
+    
+    def _restart_dead_workers(self):
+        """Replace worker processes that have exited unexpectedly."""
+        with self._lock:
+            for index, process in enumerate(self._processes):
+                if not process.is_alive():
+                    logger.warning(f"Inference worker {process.pid} exited (code {process.exitcode}), restarting")
+                    self._ready_pids.discard(process.pid)
+                    self._processes[index] = self._spawn_worker(index)
+    
+    def _finish(self, job_id: int):
+        """Release the shared memory and queue slot of a finished or abandoned job."""
+        with self._lock:
+            entry = self._pending.pop(job_id, None)
+        
+        if entry is None:
+            return
+        
+        _, shm = entry
+        shm.close()
+        shm.unlink()
+        self._slots.release()
+    
+    def _collect_results(self):
+        """Collector thread: resolve futures as workers report results."""
+        results = self._results
+        
+        while True:
+            job_id, result = results.get()
+            
+            if job_id == 'ready':
+                with self._lock:
+                    self._ready_pids.add(result)
+                continue
+            
+            with self._lock:
+                entry = self._pending.get(job_id)
+                self._completed += 1
+            
+            if entry is not None:
+                try:
+                    entry[0].set_result(result)
+                except InvalidStateError:
+                    # Cancelled after a timeout
+                    pass
@@ -0,0 +1,225 @@
+"""
+In-process latency histograms and counters with Prometheus text exposition.
+"""
+import bisect
+import threading
+import time
+from typing import List, Sequence, Tuple
+
+from config.settings import Config
+
+# Latency buckets in seconds, from sub-millisecond stages to slow Spotify calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+    
+    type_name = 'counter'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # An unlabelled counter is reported (as 0) before its first increment
+        self._values = {} if self.labelnames else {(): 0.0}
+        self._lock = threading.Lock()
+    
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        """Add to the series for these label values (in labelnames order)."""
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+    
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+                for labels, value in values]
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with optional labels.
+    
+    Observing is a bisect and three additions under a lock, cheap enough
+    for per-request stages; cumulative bucket counts are only built when
+    the metrics are rendered.
+    """
+    
+    type_name = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, *labelvalues: str):
+        """Record one value for the series with these label values."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), then sum
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+    
+    def time(self, *labelvalues: str) -> '_Timer':
+        """Context manager observing the duration of its with-block."""
+        return _Timer(self, labelvalues)
+    
+    def collect(self) -> List[str]:
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+        
+        lines = []
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(values[-1])}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+class _Timer:
+    """with-block timer for Histogram.time() (a plain class is cheaper than a generator)."""
+    
+    __slots__ = ('histogram', 'labelvalues', 'start')
+    
+    def __init__(self, histogram: Histogram, labelvalues: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labelvalues)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Named metrics of this process, rendered in the Prometheus text format.
+    
+    Metrics are per process: with several gunicorn workers (or inference
+    pool processes) each one reports its own numbers.
+    """
+    
+    def __init__(self, prefix: str = 'moodmusic_'):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Get or create a counter."""
+        return self._register(Counter, name, documentation, labelnames)
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram."""
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+    
+    def _register(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        full_name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = cls(full_name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f'Metric {full_name} is already registered differently')
+            return metric
+
+
+class _NoopTimer:
+    """Stand-in for Histogram.time() when metrics are disabled."""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+# Process-wide registry used by the app
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'stage_seconds', 'Time spent in each hot-path stage of a request', ('stage',)
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_seconds', 'Request latency by endpoint', ('endpoint',)
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    'http_requests_total', 'Requests by endpoint and status code', ('endpoint', 'status')
+)
+DETECTIONS = REGISTRY.counter(
+    'detections_total', 'Emotion detections by outcome (model, fallback, no_face, failed)', ('outcome',)
+)
+SPOTIFY_REQUESTS = REGISTRY.counter(
+    'spotify_requests_total', 'Spotify API requests sent'
+)
+SPOTIFY_ERRORS = REGISTRY.counter(
+    'spotify_errors_total', 'Failed Spotify API requests by HTTP status (network for connection errors)',
+    ('status',)
+)
+
+
+def stage_timer(stage: str):
+    """Context manager recording a hot-path stage into STAGE_SECONDS."""
+    if not Config.METRICS_ENABLED:
+        return _NOOP_TIMER
+    return STAGE_SECONDS.time(stage)
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record a stage duration measured by the caller."""
+    if Config.METRICS_ENABLED:
+        STAGE_SECONDS.observe(seconds, stage)
+
+
+def count(counter: Counter, *labelvalues: str):
+    """Increment a counter unless metrics are disabled."""
+    if Config.METRICS_ENABLED:
+        counter.inc(*labelvalues)
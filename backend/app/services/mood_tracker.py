@@ -0,0 +1,253 @@
+"""
+Temporal mood smoothing for live camera sessions.
+"""
+import cv2
+import numpy as np
+import logging
+import threading
+import time
+from typing import Dict, Any, Optional
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Side length of the grayscale thumbnail used to compare consecutive frames
+THUMBNAIL_SIZE = 16
+
+
+class MoodTracker:
+    """
+    Per-session tracker that stabilizes moods across frames.
+    
+    Keeps an exponentially weighted moving average of the mapped emotion
+    vector and only switches the reported mood when another mood has stayed
+    ahead (above the confidence threshold and by a margin) for several
+    analyzed frames. Frames that barely differ from the last analyzed one
+    can be skipped entirely.
+    """
+    
+    def __init__(self, alpha: float = 0.4, confidence_threshold: float = 0.6,
+                 switch_margin: float = 0.1, switch_frames: int = 2,
+                 skip_threshold: float = 3.0, max_skipped_frames: int = 10):
+        """
+        Initialize the tracker.
+        
+        Args:
+            alpha: EWMA weight of the newest frame (1.0 disables smoothing)
+            confidence_threshold: Smoothed score a new mood needs before switching
+            switch_margin: How far the new mood must lead the current one
+            switch_frames: Consecutive analyzed frames the new mood must lead for
+            skip_threshold: Mean absolute thumbnail difference (0-255) below which
+                a frame counts as unchanged; 0 disables skipping
+            max_skipped_frames: Force an analysis after this many skipped frames
+        """
+        self.alpha = alpha
+        self.confidence_threshold = confidence_threshold
+        self.switch_margin = switch_margin
+        self.switch_frames = max(1, switch_frames)
+        self.skip_threshold = skip_threshold
+        self.max_skipped_frames = max_skipped_frames
+        
+        self._lock = threading.Lock()
+        self._smoothed = {}
+        self._mood = None
+        self._candidate = None
+        self._candidate_frames = 0
+        self._last_result = None
+        self._last_thumbnail = None
+        self._skipped_in_a_row = 0
+        
+        self.frames_analyzed = 0
+        self.frames_skipped = 0
+        self.last_seen = time.monotonic()
+    
+    @classmethod
+    def from_config(cls) -> 'MoodTracker':
+        """Create a tracker from the MOOD_* / FRAME_SKIP_* settings."""
+        return cls(
+            alpha=Config.MOOD_SMOOTHING_ALPHA,
+            confidence_threshold=Config.EMOTION_CONFIDENCE_THRESHOLD,
+            switch_margin=Config.MOOD_SWITCH_MARGIN,
+            switch_frames=Config.MOOD_SWITCH_FRAMES,
+            skip_threshold=Config.FRAME_SKIP_THRESHOLD,
+            max_skipped_frames=Config.FRAME_SKIP_MAX
+        )
+    
+    def should_analyze(self, image_array: np.ndarray) -> bool:
+        """
+        Decide whether a frame needs inference.
+        
+        Args:
+            image_array: Decoded RGB/RGBA/grayscale frame
+            
+        Returns:
+            False if the frame is near-identical to the last analyzed frame
+        """
+        thumbnail = self._thumbnail(image_array)
+        
+        with self._lock:
+            self.last_seen = time.monotonic()
+            
+            if (self.skip_threshold > 0
+                    and self._last_result is not None
+                    and self._last_thumbnail is not None
+                    and self._skipped_in_a_row < self.max_skipped_frames
+                    and float(np.mean(np.abs(thumbnail - self._last_thumbnail))) < self.skip_threshold):
+                self._skipped_in_a_row += 1
+                self.frames_skipped += 1
+                return False
+            
+            self._last_thumbnail = thumbnail
+            self._skipped_in_a_row = 0
+            return True
+    
+    def update(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fold a new detection result into the session state.
+        
+        Args:
+            result: Result from EmotionDetector.detect_emotion
+            
+        Returns:
+            Smoothed result with the stable mood
+        """
+        with self._lock:
+            self.last_seen = time.monotonic()
+            
+            if result.get('error'):
+                # Failed frames don't move the average; keep reporting the stable mood
+                if self._mood is None:
+                    return result
+                smoothed = self._smoothed_result(result)
+                smoothed['error'] = False
+                smoothed['message'] = f"Keeping stable mood: {result.get('message', 'detection failed')}"
+                return smoothed
+            
+            self.frames_analyzed += 1
+            self._apply_ewma(result['emotions'])
+            mood_changed = self._apply_hysteresis(result['mood'])
+            
+            smoothed = self._smoothed_result(result)
+            smoothed['mood_changed'] = mood_changed
+            self._last_result = smoothed
+            return smoothed
+    
+    def current(self) -> Optional[Dict[str, Any]]:
+        """Get the latest smoothed result, marked as coming from a skipped frame."""
+        with self._lock:
+            if self._last_result is None:
+                return None
+            return {**self._last_result, 'skipped': True, 'mood_changed': False}
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-session frame counters."""
+        with self._lock:
+            return {
+                'mood': self._mood,
+                'frames_analyzed': self.frames_analyzed,
+                'frames_skipped': self.frames_skipped
+            }
+    
+    def _apply_ewma(self, emotions: Dict[str, float]):
+        """Blend a new emotion vector into the moving average."""
+        if not self._smoothed:
+            self._smoothed = dict(emotions)
+            return
+        
+        for emotion in set(self._smoothed) | set(emotions):
+            previous = self._smoothed.get(emotion, 0.0)
+            self._smoothed[emotion] = (1 - self.alpha) * previous + self.alpha * emotions.get(emotion, 0.0)
+    
+    def _apply_hysteresis(self, raw_mood: str) -> bool:
+        """Switch the stable mood only after the leader has been ahead long enough."""
+        if self._mood is None:
+            self._mood = raw_mood
+            return True
+        
+        leader = max(self._smoothed.items(), key=lambda x: x[1])[0]
+        leader_score = self._smoothed[leader]
+        current_score = self._smoothed.get(self._mood, 0.0)
+        
+        if (leader != self._mood
+                and leader_score >= self.confidence_threshold
+                and leader_score - current_score >= self.switch_margin):
+            if leader == self._candidate:
+                self._candidate_frames += 1
+            else:
+                self._candidate = leader
+                self._candidate_frames = 1
+            
+            if self._candidate_frames >= self.switch_frames:
+                logger.info(f"Stable mood switched: {self._mood} -> {leader}")
+                self._mood = leader
+                self._candidate = None
+                self._candidate_frames = 0
+                return True
+        else:
+            self._candidate = None
+            self._candidate_frames = 0
+        
+        return False
+    
+    def _smoothed_result(self, raw_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a response from the smoothed state."""
+        return {
+            **raw_result,
+            'mood': self._mood,
+            'confidence': float(self._smoothed.get(self._mood, 0.0)),
+            'emotions': {emotion: float(score) for emotion, score in self._smoothed.items()},
+            'raw_mood': raw_result.get('mood'),
+            'skipped': False
+        }
+    
+    def _thumbnail(self, image_array: np.ndarray) -> np.ndarray:
+        """Small grayscale thumbnail for a cheap perceptual diff."""
+        if len(image_array.shape) == 3 and image_array.shape[2] == 4:
+            gray = cv2.cvtColor(image_array, cv2.COLOR_RGBA2GRAY)
+        elif len(image_array.shape) == 3:
+            gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
+        else:
+            gray = image_array
+        return cv2.resize(gray, (THUMBNAIL_SIZE, THUMBNAIL_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+class MoodTrackerRegistry:
+    """
+    Session-id keyed MoodTrackers with idle expiry.
+    
+    Trackers live in the memory of one process. With several gunicorn
+    workers, a session's live frames only share a tracker if they reach the
+    same worker (sticky sessions, or GUNICORN_WORKERS=1); otherwise the
+    smoothing and hysteresis restart on each worker. The WebSocket stream
+    keeps its tracker on the connection and needs neither.
+    """
+    
+    def __init__(self, idle_ttl: float = 600.0):
+        """
+        Initialize the registry.
+        
+        Args:
+            idle_ttl: Seconds after which an unused session's tracker is dropped
+        """
+        self.idle_ttl = idle_ttl
+        self._trackers = {}
+        self._lock = threading.Lock()
+    
+    def get(self, session_id: str) -> MoodTracker:
+        """Get (or create) the tracker for a session."""
+        with self._lock:
+            self._expire()
+            tracker = self._trackers.get(session_id)
+            if tracker is None:
+                tracker = MoodTracker.from_config()
+                self._trackers[session_id] = tracker
+            return tracker
+    
+    def __len__(self) -> int:
+        return len(self._trackers)
+    
+    def _expire(self):
+        """Drop trackers that have been idle longer than the TTL."""
+        cutoff = time.monotonic() - self.idle_ttl
+        for session_id in [sid for sid, tracker in self._trackers.items() if tracker.last_seen < cutoff]:
+            del self._trackers[session_id]
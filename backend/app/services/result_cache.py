@@ -0,0 +1,107 @@
+"""
+Cache of mood detection results keyed by image content.
+"""
+import hashlib
+import json
+import logging
+from typing import Dict, Any, Optional
+
+import cv2
+import numpy as np
+
+from app.services.cache import LRUCache
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry overhead (key, tuple, dict objects) on top of the JSON size
+ENTRY_OVERHEAD_BYTES = 256
+
+
+class ResultCache:
+    """
+    Detection results cached by a hash of the uploaded bytes.
+    
+    Resubmitted uploads are answered from the content hash before any
+    decoding or inference. Optionally, a perceptual hash (dHash) of the
+    decoded image also keys the result, so re-encoded copies of the same
+    still image skip inference too.
+    """
+    
+    def __init__(self, max_bytes: int, ttl: float, perceptual: bool = False):
+        """
+        Initialize the cache.
+        
+        Args:
+            max_bytes: Memory budget for cached results
+            ttl: Seconds a result stays valid
+            perceptual: Also key results by a perceptual hash of the decoded image
+        """
+        self.perceptual = perceptual
+        self._cache = LRUCache(max_bytes, ttl=ttl, size_of=self._result_size)
+    
+    @classmethod
+    def from_config(cls) -> 'ResultCache':
+        """Create a cache from the RESULT_CACHE_* settings."""
+        return cls(
+            max_bytes=Config.RESULT_CACHE_MAX_BYTES,
+            ttl=Config.RESULT_CACHE_TTL,
+            perceptual=Config.RESULT_CACHE_PERCEPTUAL
+        )
+    
+    def content_key(self, data: bytes) -> str:
+        """Fast hash of the raw upload bytes."""
+        return 'c:' + hashlib.blake2b(data, digest_size=16).hexdigest()
+    
+    def perceptual_key(self, image_array: np.ndarray) -> Optional[str]:
+        """
+        64-bit difference hash of the decoded image, or None when disabled.
+        
+        Args:
+            image_array: Decoded RGB/RGBA/grayscale image
+        """
+        if not self.perceptual:
+            return None
+        
+        if len(image_array.shape) == 3 and image_array.shape[2] == 4:
+            gray = cv2.cvtColor(image_array, cv2.COLOR_RGBA2GRAY)
+        elif len(image_array.shape) == 3:
+            gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
+        else:
+            gray = image_array
+        
+        thumbnail = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).flatten()
+        return 'p:' + np.packbits(bits).tobytes().hex()
+    
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Get a cached result (a copy, so callers may modify it)."""
+        if key is None:
+            return None
+        result = self._cache.get(key)
+        return dict(result) if result is not None else None
+    
+    def put(self, result: Dict[str, Any], *keys: Optional[str]):
+        """
+        Cache a result under one or more keys.
+        
+        Only real detections are cached: errors and fallback results may be
+        transient (e.g. the model failing under load).
+        """
+        if result.get('error') or result.get('fallback'):
+            return
+        
+        for key in keys:
+            if key is not None:
+                self._cache.set(key, result)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss/eviction counters and memory usage."""
+        stats = self._cache.get_stats()
+        stats['perceptual'] = self.perceptual
+        return stats
+    
+    @staticmethod
+    def _result_size(result: Dict[str, Any]) -> int:
+        """Estimate the memory held by a cached result."""
+        return len(json.dumps(result)) + ENTRY_OVERHEAD_BYTES
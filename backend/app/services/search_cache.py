@@ -0,0 +1,298 @@
+"""
+Shared cache of Spotify track searches.
+"""
+import json
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.cache import LRUCache
+from config.settings import Config
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry overhead (key, tuple, dict objects) on top of the JSON size
+ENTRY_OVERHEAD_BYTES = 256
+
+
+class MemorySearchBackend:
+    """In-process storage for cached searches (per worker process)."""
+    
+    def __init__(self, max_bytes: int, ttl: float):
+        """
+        Initialize the backend.
+        
+        Args:
+            max_bytes: Memory budget for cached searches
+            ttl: Seconds an entry is kept at all (fresh + stale window)
+        """
+        self._cache = LRUCache(max_bytes, ttl=ttl, size_of=self._entry_size)
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._cache.get(key)
+    
+    def set(self, key: str, entry: Dict[str, Any], ttl: float):
+        self._cache.set(key, entry)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self._cache.get_stats()
+        stats['backend'] = 'memory'
+        return stats
+    
+    @staticmethod
+    def _entry_size(entry: Dict[str, Any]) -> int:
+        """Estimate the memory held by a cached search."""
+        return len(json.dumps(entry)) + ENTRY_OVERHEAD_BYTES
+
+
+class RedisSearchBackend:
+    """
+    Redis (or any Redis-compatible store) storage, shared by all processes.
+    
+    Store errors are logged and treated as misses so an unavailable cache
+    never breaks playlist generation.
+    """
+    
+    def __init__(self, url: str, ttl: float, prefix: str = 'moodmusic:search:'):
+        """
+        Initialize the backend.
+        
+        Args:
+            url: Redis URL, e.g. redis://localhost:6379/0
+            ttl: Seconds an entry is kept at all (fresh + stale window)
+            prefix: Key prefix for cached searches
+        """
+        if redis is None:
+            raise RuntimeError('SEARCH_CACHE_BACKEND=redis requires the redis package')
+        
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.errors = 0
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = self._client.get(self.prefix + key)
+        except redis.RedisError as e:
+            self.errors += 1
+            logger.warning(f"Search cache read failed: {str(e)}")
+            return None
+        return json.loads(raw) if raw is not None else None
+    
+    def set(self, key: str, entry: Dict[str, Any], ttl: float):
+        try:
+            self._client.set(self.prefix + key, json.dumps(entry), ex=max(1, math.ceil(ttl)))
+        except redis.RedisError as e:
+            self.errors += 1
+            logger.warning(f"Search cache write failed: {str(e)}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {'backend': 'redis', 'errors': self.errors}
+
+
+class SearchCache:
+    """
+    Formatted track search results shared across users.
+    
+    Search results don't depend on who asks, so they are cached by
+    (query, market, limit). Entries are fresh for `ttl` seconds; for a
+    further `stale_ttl` seconds they are still served while a background
+    refresh fetches a new copy (stale-while-revalidate). Concurrent misses
+    for the same key share one Spotify request.
+    
+    Cached track lists are shared between requests and must not be mutated.
+    """
+    
+    def __init__(self, backend, ttl: float, stale_ttl: float, refresh_workers: int = 2):
+        """
+        Initialize the cache.
+        
+        Args:
+            backend: MemorySearchBackend or RedisSearchBackend
+            ttl: Seconds a search result is fresh
+            stale_ttl: Seconds past `ttl` a result may be served while it refreshes
+            refresh_workers: Threads for background refreshes
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        
+        self._inflight = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._refresh_executor = ThreadPoolExecutor(
+            max_workers=refresh_workers,
+            thread_name_prefix='search-refresh'
+        )
+        
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+    
+    @classmethod
+    def from_config(cls) -> 'SearchCache':
+        """Create a cache from the SEARCH_CACHE_* settings."""
+        retention = Config.SEARCH_CACHE_TTL + Config.SEARCH_CACHE_STALE_TTL
+        
+        if Config.SEARCH_CACHE_BACKEND == 'redis':
+            backend = RedisSearchBackend(Config.SEARCH_CACHE_REDIS_URL, ttl=retention)
+        else:
+            backend = MemorySearchBackend(Config.SEARCH_CACHE_MAX_BYTES, ttl=retention)
+        
+        return cls(
+            backend,
+            ttl=Config.SEARCH_CACHE_TTL,
+            stale_ttl=Config.SEARCH_CACHE_STALE_TTL,
+            refresh_workers=Config.SEARCH_CACHE_REFRESH_WORKERS
+        )
+    
+    @staticmethod
+    def key(query: str, market: Optional[str], limit: int) -> str:
+        """Cache key for a search."""
+        return f"{market or '-'}:{limit}:{query}"
+    
+    def get(self, query: str, market: Optional[str], limit: int,
+            refresh: Optional[Callable[[], List[Dict]]] = None) -> Optional[List[Dict]]:
+        """
+        Look up a cached search.
+        
+        Args:
+            query: Spotify search query
+            market: Market code (None for any)
+            limit: Result limit
+            refresh: Fetch function used to refresh a stale entry in the background
+            
+        Returns:
+            Cached formatted tracks (possibly stale), or None on a miss
+        """
+        key = self.key(query, market, limit)
+        entry = self.backend.get(key)
+        
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        
+        if time.time() - entry['fetched_at'] < self.ttl:
+            with self._lock:
+                self.hits += 1
+            return entry['tracks']
+        
+        with self._lock:
+            self.stale_hits += 1
+            start_refresh = refresh is not None and key not in self._inflight and key not in self._refreshing
+            if start_refresh:
+                self._refreshing.add(key)
+        if start_refresh:
+            self._refresh_executor.submit(self._refresh, key, refresh)
+        return entry['tracks']
+    
+    def load(self, query: str, market: Optional[str], limit: int,
+             fetch: Callable[[], List[Dict]]) -> List[Dict]:
+        """
+        Fetch a search and cache it. Concurrent loads of one key share a fetch.
+        
+        Args:
+            query: Spotify search query
+            market: Market code (None for any)
+            limit: Result limit
+            fetch: Function returning formatted tracks
+            
+        Returns:
+            Formatted tracks
+        """
+        return self._load(self.key(query, market, limit), fetch, force=False)
+    
+    def store(self, query: str, market: Optional[str], limit: int, tracks: List[Dict]):
+        """
+        Cache a search fetched without load() (e.g. by the async Spotify client).
+        
+        Args:
+            query: Spotify search query
+            market: Market code (None for any)
+            limit: Result limit
+            tracks: Formatted tracks
+        """
+        self._store(self.key(query, market, limit), tracks)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss/refresh counters and backend usage."""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'ttl': self.ttl,
+                'stale_ttl': self.stale_ttl,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                'coalesced': self.coalesced,
+                'refreshes': self.refreshes,
+                'refresh_failures': self.refresh_failures,
+                'store': self.backend.get_stats()
+            }
+    
+    def _load(self, key: str, fetch: Callable[[], List[Dict]], force: bool = True) -> List[Dict]:
+        """
+        Single-flight fetch and store.
+        
+        Unless `force` is set, a fresh entry stored since the caller's miss
+        (by a load that finished in the meantime) is returned instead.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+        
+        if not owner:
+            return future.result()
+        
+        try:
+            entry = None if force else self.backend.get(key)
+            if entry is not None and time.time() - entry['fetched_at'] < self.ttl:
+                with self._lock:
+                    self.coalesced += 1
+                future.set_result(entry['tracks'])
+                return entry['tracks']
+            
+            tracks = fetch()
+            self._store(key, tracks)
+            future.set_result(tracks)
+            return tracks
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+    
+    def _store(self, key: str, tracks: List[Dict]):
+        self.backend.set(key, {'tracks': tracks, 'fetched_at': time.time()}, self.ttl + self.stale_ttl)
+    
+    def _refresh(self, key: str, fetch: Callable[[], List[Dict]]):
+        """Background refresh of a stale entry."""
+        try:
+            self._load(key, fetch)
+            with self._lock:
+                self.refreshes += 1
+        except Exception as e:
+            with self._lock:
+                self.refresh_failures += 1
+            logger.warning(f"Search cache refresh failed for {key}: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
@@ -0,0 +1,272 @@
+"""
+Non-blocking Spotify playlist generation for the ASGI app.
+"""
+import asyncio
+import logging
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from spotipy.exceptions import SpotifyException
+
+from app.services.metrics import stage_timer
+from app.services.spotify_scheduler import BACKGROUND, INTERACTIVE, SpotifyRateLimited
+from app.services.spotify_service import RETRY_STATUS_CODES, SEARCH_LIMIT, SpotifyService
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Server-error retries and backoff, as in SpotifyService's urllib3 policy
+SERVER_ERROR_RETRIES = 3
+RETRY_BACKOFF = 0.3
+
+
+def _run_in_default_executor(fn, *args):
+    return asyncio.get_running_loop().run_in_executor(None, partial(fn, *args))
+
+
+class AsyncSpotifyService:
+    """
+    Async playlist generation on top of a SpotifyService.
+    
+    Searches go out on one pooled httpx.AsyncClient instead of the search
+    thread pool, so a request waiting on Spotify holds no thread. The mood
+    queries, search cache, track pool and rate limiter are the wrapped
+    service's, so both serving modes share caches, quota and stats; stale
+    cache entries are still refreshed on the service's background threads.
+    Track pool and search cache lookups (disk reads, redis round trips) run
+    off the event loop through `run_blocking`.
+    """
+    
+    def __init__(self, service: SpotifyService,
+                 run_blocking: Optional[Callable[..., Awaitable[Any]]] = None):
+        """
+        Initialize the async service.
+        
+        Args:
+            service: Sync service whose configuration and caches to use
+            run_blocking: Function running fn(*args) in a thread and returning an
+                awaitable of its result (defaults to the loop's default executor)
+        """
+        self.service = service
+        self._run_blocking = run_blocking or _run_in_default_executor
+        self._client = None
+        # Searches that outlived their playlist's deadline (kept so they can finish and fill the cache)
+        self._detached = set()
+    
+    def _http(self) -> httpx.AsyncClient:
+        """Get the keep-alive HTTP client (created on first use, inside the event loop)."""
+        if self._client is None:
+            # Like the sync session's non-blocking urllib3 pool: bursts open extra
+            # connections, SPOTIFY_POOL_MAXSIZE of them are kept alive
+            transport = httpx.AsyncHTTPTransport(
+                retries=SERVER_ERROR_RETRIES,
+                limits=httpx.Limits(
+                    max_connections=None,
+                    max_keepalive_connections=Config.SPOTIFY_POOL_MAXSIZE
+                )
+            )
+            self._client = httpx.AsyncClient(
+                base_url=Config.SPOTIFY_API_URL,
+                timeout=Config.SPOTIFY_REQUEST_TIMEOUT,
+                transport=transport
+            )
+        return self._client
+    
+    async def aclose(self):
+        """Close the pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def get_mood_playlist(self, mood: str, access_token: str, expires_at: Optional[float] = None,
+                                market: Optional[str] = None, priority: int = INTERACTIVE) -> Dict[str, Any]:
+        """
+        Get playlist recommendations for a specific mood.
+        
+        Same arguments and result as SpotifyService.get_mood_playlist.
+        
+        Args:
+            mood: The mood to get recommendations for
+            access_token: Spotify access token
+            expires_at: Token expiry (epoch seconds), for refreshing stale cache entries
+            market: ISO country code to restrict tracks to (None for any)
+            priority: Scheduler priority of the searches
+            
+        Returns:
+            Dictionary with playlist data or error
+        """
+        service = self.service
+        try:
+            # Sample from the precomputed pool (market-agnostic) when it's filled,
+            # otherwise search for tracks based on mood
+            pool_mood = mood if mood in service.mood_queries else 'neutral'
+            tracks = None
+            if service.track_pool is not None and market is None:
+                tracks = await self._run_blocking(service.track_pool.sample, pool_mood, 20)
+            
+            source = 'pool'
+            searches_missed = 0
+            if not tracks:
+                source = 'search'
+                tracks, searches_missed = await self._search_tracks_by_mood(
+                    service.mood_queries[pool_mood], access_token, expires_at, market=market, priority=priority
+                )
+            
+            return service._playlist_data(mood, tracks, source, searches_missed)
+            
+        except SpotifyRateLimited as e:
+            return service._rate_limited_error(e)
+        except Exception as e:
+            logger.error(f"Playlist generation failed: {str(e)}")
+            return {
+                'error': True,
+                'message': f'Failed to generate playlist: {str(e)}'
+            }
+    
+    async def _search_tracks_by_mood(self, mood_config: Dict, access_token: str,
+                                     expires_at: Optional[float] = None,
+                                     deadline: Optional[float] = None,
+                                     market: Optional[str] = None,
+                                     priority: int = INTERACTIVE) -> Tuple[List[Dict], int]:
+        """
+        Run a mood's searches concurrently on the event loop.
+        
+        As SpotifyService._search_tracks_by_mood: cached searches are served
+        from the search cache and searches still running at the deadline
+        are left out of the playlist (they finish in the background and are
+        cached for the next request). Cancelling the call cancels the searches.
+        
+        Returns:
+            Tuple of (list of track dictionaries, number of searches that failed or timed out)
+        """
+        if deadline is None:
+            deadline = Config.SPOTIFY_SEARCH_DEADLINE
+        
+        queries = self.service._mood_search_queries(mood_config)
+        # Background calls otherwise wait as long as needed; these are abandoned at the deadline
+        max_wait = deadline if priority == BACKGROUND else None
+        
+        tasks = [
+            asyncio.ensure_future(self._cached_search(query, access_token, expires_at, market, priority, max_wait))
+            for query in queries
+        ]
+        try:
+            done, not_done = await asyncio.wait(tasks, timeout=deadline)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+        
+        for task in not_done:
+            self._detach(task)
+        if not_done:
+            logger.warning(f"{len(not_done)}/{len(queries)} track searches missed the {deadline}s deadline")
+        
+        search_results = [None] * len(queries)
+        searches_missed = len(not_done)
+        rate_limited = None
+        for index, task in enumerate(tasks):
+            if task not in done:
+                continue
+            try:
+                search_results[index] = task.result()
+            except SpotifyRateLimited as e:
+                rate_limited = e
+                searches_missed += 1
+            except Exception as e:
+                logger.warning(f"Track search failed for {queries[index]}: {str(e)}")
+                searches_missed += 1
+        
+        return self.service._merge_search_results(search_results, searches_missed, rate_limited)
+    
+    async def _cached_search(self, query: str, access_token: str, expires_at: Optional[float],
+                             market: Optional[str], priority: int = INTERACTIVE,
+                             max_wait: Optional[float] = None) -> List[Dict]:
+        """One search, answered from the shared search cache when possible."""
+        cache = self.service.search_cache
+        if cache is None:
+            return await self.search(query, access_token, market, priority=priority, max_wait=max_wait)
+        
+        def refresh():
+            client = self.service.get_client(access_token, expires_at)
+            return self.service._search(client, query, market, priority=BACKGROUND)
+        
+        cached = await self._run_blocking(partial(cache.get, query, market, SEARCH_LIMIT, refresh=refresh))
+        if cached is not None:
+            return cached
+        
+        tracks = await self.search(query, access_token, market, priority=priority, max_wait=max_wait)
+        await self._run_blocking(cache.store, query, market, SEARCH_LIMIT, tracks)
+        return tracks
+    
+    async def search(self, query: str, access_token: str, market: Optional[str] = None,
+                     limit: int = SEARCH_LIMIT, offset: int = 0, priority: int = INTERACTIVE,
+                     max_wait: Optional[float] = None) -> List[Dict]:
+        """
+        Run one track search against Spotify.
+        
+        Identical searches in flight at the same time (from any user) share
+        one request.
+        
+        Args:
+            query: Search query
+            access_token: Spotify access token
+            market: ISO country code to restrict tracks to (None for any)
+            limit: Number of results (at most 50)
+            offset: Index of the first result, for paging
+            priority: Scheduler priority (INTERACTIVE or BACKGROUND)
+            max_wait: Seconds to wait for the rate limit (see SpotifyScheduler.call)
+            
+        Returns:
+            Formatted tracks
+        """
+        params = {'q': query, 'type': 'track', 'limit': limit, 'offset': offset}
+        if market:
+            params['market'] = market
+        
+        with stage_timer('spotify_search'):
+            results = await self.service.scheduler.call_async(
+                partial(self._get, 'search', access_token, params),
+                key=('search', query, market, limit, offset),
+                priority=priority,
+                max_wait=max_wait
+            )
+        with stage_timer('format_tracks'):
+            return self.service._format_tracks(results['tracks']['items'])
+    
+    async def _get(self, path: str, access_token: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        GET a Web API endpoint, retrying server errors.
+        
+        Raises:
+            SpotifyException: for error responses, as spotipy does (so the
+                scheduler sees 429s and their Retry-After)
+        """
+        headers = {'Authorization': f'Bearer {access_token}'}
+        for attempt in range(SERVER_ERROR_RETRIES + 1):
+            response = await self._http().get(path, params=params, headers=headers)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == SERVER_ERROR_RETRIES:
+                break
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+        
+        if response.status_code >= 400:
+            try:
+                message = response.json()['error']['message']
+            except (ValueError, KeyError, TypeError):
+                message = response.text or 'error'
+            raise SpotifyException(
+                response.status_code, -1, f'{response.url}:\n {message}',
+                headers=response.headers
+            )
+        return response.json()
+    
+    def _detach(self, task: asyncio.Task):
+        """Let a search run on after its request stopped waiting for it."""
+        self._detached.add(task)
+        task.add_done_callback(self._forget)
+    
+    def _forget(self, task: asyncio.Task):
+        self._detached.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Late track search failed: {str(task.exception())}")
@@ -0,0 +1,370 @@
+"""
+Rate-limit-aware scheduling of Spotify API calls.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from requests.exceptions import RequestException
+from spotipy.exceptions import SpotifyException
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from app.services.metrics import SPOTIFY_ERRORS, SPOTIFY_REQUESTS, count, observe_stage
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Request priorities: interactive requests are served before waiting background ones
+INTERACTIVE = 0
+BACKGROUND = 1
+
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BACKGROUND: 'background'}
+
+# Connection-level failures of the sync (requests) and async (httpx) clients
+NETWORK_ERRORS = (RequestException,) if httpx is None else (RequestException, httpx.TransportError)
+
+# Back-off when a 429 comes without a usable Retry-After header
+DEFAULT_RETRY_AFTER = 1.0
+
+
+def is_rate_limit(error: SpotifyException) -> bool:
+    """
+    Whether Spotify really answered 429.
+    
+    spotipy also reports exhausted urllib3 retries (e.g. a run of 5xx) as a
+    header-less 429 "Max Retries" error; that is an upstream failure, not a
+    rate limit, and must not pause every call.
+    """
+    return error.http_status == 429 and 'Max Retries' not in str(error.msg)
+
+
+class SpotifyRateLimited(Exception):
+    """A Spotify call could not be made (or retried) within its wait budget."""
+    
+    def __init__(self, retry_after: float):
+        super().__init__(f'Spotify rate limit reached, retry in {retry_after:.0f}s')
+        self.retry_after = retry_after
+
+
+class SpotifyScheduler:
+    """
+    Central gate for Spotify calls.
+    
+    Every call takes a token from a bucket refilled at `rate` per second
+    (holding at most `burst`). A 429 pauses all calls for the response's
+    Retry-After, after which the call is retried. When tokens are scarce,
+    waiting interactive calls go before waiting background ones, and
+    identical in-flight calls (same key) share one request.
+    
+    The bucket is per process, so `rate` should be the app's quota divided
+    by the number of worker processes.
+    """
+    
+    def __init__(self, rate: float = 10.0, burst: int = 20, max_wait: float = 3.0,
+                 max_retries: int = 2):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            rate: Calls per second
+            burst: Bucket size (calls that may go out back to back)
+            max_wait: Seconds an interactive call may wait for a token or a
+                Retry-After pause before failing with SpotifyRateLimited
+            max_retries: Retries of a call after 429 responses
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._cond = threading.Condition()
+        
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        # Coalesced async calls (asyncio tasks, so per event loop)
+        self._async_inflight = {}
+        
+        self.calls = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.coalesced = 0
+    
+    @classmethod
+    def from_config(cls) -> 'SpotifyScheduler':
+        """Create a scheduler from the SPOTIFY_RATE_* settings."""
+        return cls(
+            rate=Config.SPOTIFY_RATE_LIMIT,
+            burst=Config.SPOTIFY_RATE_BURST,
+            max_wait=Config.SPOTIFY_RATE_MAX_WAIT,
+            max_retries=Config.SPOTIFY_RATE_MAX_RETRIES
+        )
+    
+    def call(self, fn: Callable[[], Any], key: Optional[Hashable] = None,
+             priority: int = INTERACTIVE, max_wait: Optional[float] = None) -> Any:
+        """
+        Make a Spotify call once the rate limit allows it.
+        
+        Args:
+            fn: Zero-argument callable making exactly one Spotify request
+            key: Identifies the request; concurrent calls with the same key share
+                one result (None for calls that must not be coalesced, e.g. writes)
+            priority: INTERACTIVE or BACKGROUND
+            max_wait: Seconds to wait in total (defaults to max_wait for interactive
+                calls; background calls wait as long as needed)
+                
+        Returns:
+            fn's result
+            
+        Raises:
+            SpotifyRateLimited: if the call can't be made within max_wait
+        """
+        if key is None:
+            return self._call(fn, priority, max_wait)
+        
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+        
+        if not owner:
+            return future.result()
+        
+        try:
+            result = self._call(fn, priority, max_wait)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+    
+    async def call_async(self, fn: Callable[[], Awaitable[Any]], key: Optional[Hashable] = None,
+                         priority: int = INTERACTIVE, max_wait: Optional[float] = None) -> Any:
+        """
+        Async variant of call() for the ASGI app: waits for a token without
+        blocking the event loop. Shares the bucket and 429 pauses with call().
+        
+        Args:
+            fn: Zero-argument coroutine function making exactly one Spotify request
+            key: As for call(); coalesces with other async calls only
+            priority: INTERACTIVE or BACKGROUND
+            max_wait: As for call()
+            
+        Returns:
+            fn's result
+            
+        Raises:
+            SpotifyRateLimited: if the call can't be made within max_wait
+        """
+        if key is None:
+            return await self._call_async(fn, priority, max_wait)
+        
+        task = self._async_inflight.get(key)
+        if task is None:
+            # A task of its own, so a caller that goes away doesn't cancel it for the others
+            task = asyncio.ensure_future(self._call_async(fn, priority, max_wait))
+            self._async_inflight[key] = task
+            task.add_done_callback(lambda done: self._forget_async(key, done))
+        else:
+            with self._inflight_lock:
+                self.coalesced += 1
+        return await asyncio.shield(task)
+    
+    def retry_after(self) -> float:
+        """Seconds until a new interactive call could go out."""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, self._blocked_until - now)
+            shortfall = self._waiting[INTERACTIVE] + 1 - self._tokens
+            if shortfall > 0:
+                wait = max(wait, shortfall / self.rate)
+            return wait
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth, available tokens and throttle counters."""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'tokens': round(self._tokens, 2),
+                'queued': {PRIORITY_NAMES[p]: count for p, count in self._waiting.items()},
+                'paused_for': round(max(0.0, self._blocked_until - now), 2),
+                'calls': self.calls,
+                'throttled': self.throttled,
+                'rejected': self.rejected,
+                'coalesced': self.coalesced
+            }
+    
+    def _call(self, fn: Callable[[], Any], priority: int, max_wait: Optional[float]) -> Any:
+        """Acquire a token and call, retrying after 429s within the wait budget."""
+        if max_wait is None and priority == INTERACTIVE:
+            max_wait = self.max_wait
+        deadline = time.monotonic() + max_wait if max_wait is not None else None
+        
+        attempt = 0
+        while True:
+            queued_at = time.perf_counter()
+            self._acquire(priority, deadline)
+            observe_stage('spotify_queue', time.perf_counter() - queued_at)
+            
+            count(SPOTIFY_REQUESTS)
+            try:
+                return fn()
+            except NETWORK_ERRORS:
+                count(SPOTIFY_ERRORS, 'network')
+                raise
+            except SpotifyException as e:
+                count(SPOTIFY_ERRORS, str(e.http_status))
+                if not is_rate_limit(e):
+                    raise
+                retry_after = self._throttle(e)
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise SpotifyRateLimited(retry_after)
+                if deadline is not None and time.monotonic() + retry_after > deadline:
+                    raise SpotifyRateLimited(retry_after)
+    
+    async def _call_async(self, fn: Callable[[], Awaitable[Any]], priority: int,
+                          max_wait: Optional[float]) -> Any:
+        """_call() for coroutine functions; fn raises SpotifyException like spotipy does."""
+        if max_wait is None and priority == INTERACTIVE:
+            max_wait = self.max_wait
+        deadline = time.monotonic() + max_wait if max_wait is not None else None
+        
+        attempt = 0
+        while True:
+            queued_at = time.perf_counter()
+            await self._acquire_async(priority, deadline)
+            observe_stage('spotify_queue', time.perf_counter() - queued_at)
+            
+            count(SPOTIFY_REQUESTS)
+            try:
+                return await fn()
+            except NETWORK_ERRORS:
+                count(SPOTIFY_ERRORS, 'network')
+                raise
+            except SpotifyException as e:
+                count(SPOTIFY_ERRORS, str(e.http_status))
+                if not is_rate_limit(e):
+                    raise
+                retry_after = self._throttle(e)
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise SpotifyRateLimited(retry_after)
+                if deadline is not None and time.monotonic() + retry_after > deadline:
+                    raise SpotifyRateLimited(retry_after)
+    
+    def _forget_async(self, key: Hashable, task: 'asyncio.Task'):
+        """Done callback of a coalesced async call."""
+        self._async_inflight.pop(key, None)
+        if not task.cancelled():
+            # Mark the error retrieved even if every caller was cancelled
+            task.exception()
+    
+    def _acquire(self, priority: int, deadline: Optional[float]):
+        """Block until a token is available to this priority, or raise at the deadline."""
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    delay = self._take_token(priority, deadline)
+                    if delay is None:
+                        return
+                    self._cond.wait(timeout=delay)
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+    
+    async def _acquire_async(self, priority: int, deadline: Optional[float]):
+        """_acquire() that sleeps on the event loop instead of the condition."""
+        with self._cond:
+            self._waiting[priority] += 1
+        try:
+            while True:
+                with self._cond:
+                    delay = self._take_token(priority, deadline)
+                if delay is None:
+                    return
+                await asyncio.sleep(delay)
+        finally:
+            with self._cond:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+    
+    def _take_token(self, priority: int, deadline: Optional[float]) -> Optional[float]:
+        """
+        Take a token if this priority may have one now (lock must be held).
+        
+        Returns:
+            None once a token was taken, else the seconds to wait before trying again
+            
+        Raises:
+            SpotifyRateLimited: if that wait would pass the deadline
+        """
+        now = time.monotonic()
+        self._refill(now)
+        
+        if now >= self._blocked_until and self._tokens >= 1 and (
+                priority == INTERACTIVE or self._waiting[INTERACTIVE] == 0):
+            self._tokens -= 1
+            self.calls += 1
+            return None
+        
+        if now < self._blocked_until:
+            delay = self._blocked_until - now
+        elif self._tokens < 1:
+            delay = (1 - self._tokens) / self.rate
+        else:
+            # Tokens are there but interactive calls go first
+            delay = 1 / self.rate
+        
+        if deadline is not None:
+            if now + delay > deadline:
+                self.rejected += 1
+                raise SpotifyRateLimited(delay)
+            delay = min(delay, deadline - now)
+        return delay
+    
+    def _throttle(self, error: SpotifyException) -> float:
+        """Pause every call for a 429's Retry-After; returns the pause in seconds."""
+        try:
+            retry_after = float((error.headers or {}).get('Retry-After'))
+        except (TypeError, ValueError):
+            retry_after = DEFAULT_RETRY_AFTER
+        
+        with self._cond:
+            self.throttled += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            # Start refilling from empty once the pause ends, not with a full burst
+            self._tokens = 0.0
+            self._updated = self._blocked_until
+        
+        logger.warning(f"Spotify rate limit hit, pausing calls for {retry_after:.0f}s")
+        return retry_after
+    
+    def _refill(self, now: float):
+        """Add the tokens accrued since the last refill (lock must be held)."""
+        if now <= self._updated:
+            return
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
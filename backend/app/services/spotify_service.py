@@ -3,13 +3,51 @@ Spotify Web API integration service.
 """
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth, SpotifyClientCredentials
+from spotipy.cache_handler import CacheHandler, MemoryCacheHandler
+import requests
+import urllib3
 import os
 import logging
-from typing import Dict, Any, List
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from typing import Dict, Any, List, Optional, Tuple
+import math
 import random
+from app.services.metrics import stage_timer
+from app.services.search_cache import SearchCache
+from app.services.spotify_scheduler import BACKGROUND, INTERACTIVE, SpotifyRateLimited, SpotifyScheduler
+from app.services.track_index import AUDIO_FEATURES, TrackIndex, blend_targets, target_from_mood
+from app.services.track_pool import TrackPool
+from config.settings import Config
 
 logger = logging.getLogger(__name__)
 
+# Server errors worth retrying at the HTTP level; 429s are left to SpotifyScheduler
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+# Tracks requested per search query
+SEARCH_LIMIT = 10
+
+# Track ids per audio-features request (Spotify's maximum)
+AUDIO_FEATURES_BATCH = 100
+
+class _NoTokenCache(CacheHandler):
+    """
+    Token cache that stores nothing.
+    
+    The OAuth manager is shared by all users, so it must never hand one
+    user's cached token to another; tokens live in the user's session.
+    """
+    
+    def get_cached_token(self):
+        return None
+    
+    def save_token_to_cache(self, token_info):
+        pass
+
 class SpotifyService:
     """
     Service for interacting with Spotify Web API.
@@ -26,6 +64,28 @@ class SpotifyService:
         # Spotify OAuth scopes needed
         self.scope = "user-read-private user-read-email playlist-read-private playlist-read-collaborative"
         
+        # One pooled HTTP session (keep-alive) shared by every Spotify call
+        self.session = self._build_session()
+        self._oauth = None
+        self._app_client = None
+        self._app_client_lock = threading.Lock()
+        
+        # Every Spotify API call goes through the rate limiter
+        self.scheduler = SpotifyScheduler.from_config()
+        
+        # Per-token Spotify clients, evicted when the token expires
+        self._clients = OrderedDict()
+        self._clients_lock = threading.Lock()
+        
+        # Threads that run a playlist's searches concurrently
+        self._search_executor = ThreadPoolExecutor(
+            max_workers=Config.SPOTIFY_SEARCH_WORKERS,
+            thread_name_prefix='spotify-search'
+        )
+        
+        # Search results are the same for every user, so they're shared
+        self.search_cache = SearchCache.from_config() if Config.SEARCH_CACHE_ENABLED else None
+        
         # Mood-based playlist queries and audio features
         self.mood_queries = {
             'happy': {
@@ -84,24 +144,152 @@ class SpotifyService:
             }
         }
         
+        # Audio-feature index and each mood's target vector for nearest-neighbour matching
+        self.mood_targets = {
+            mood: target_from_mood(mood_config['audio_features'])
+            for mood, mood_config in self.mood_queries.items()
+        }
+        self.track_index = None
+        if Config.TRACK_INDEX_ENABLED:
+            if Config.TRACK_INDEX_FIXTURE:
+                self.track_index = TrackIndex.from_fixture(Config.TRACK_INDEX_FIXTURE)
+            else:
+                self.track_index = TrackIndex()
+        
+        # Background per-mood track pools, searched with the app's own credentials;
+        # pooled tracks are added to the audio-feature index as pools refresh
+        self.track_pool = None
+        if Config.TRACK_POOL_ENABLED and self.client_id and self.client_secret:
+            self.track_pool = TrackPool.from_config(
+                self._fetch_pool_page,
+                {
+                    mood: self._mood_search_queries(mood_config, max_genres=0, max_keywords=0)
+                    for mood, mood_config in self.mood_queries.items()
+                },
+                on_refresh=self._index_pool_tracks if self.track_index is not None else None
+            )
+        
         logger.info("Spotify service initialized")
     
-    def get_auth_url(self) -> str:
+    def get_client(self, access_token: str, expires_at: Optional[float] = None) -> spotipy.Spotify:
         """
-        Get Spotify OAuth authorization URL.
+        Get the cached Spotify client for an access token.
+        
+        All clients share the pooled HTTP session, so repeated calls reuse
+        open TLS connections. Clients are dropped once their token expires,
+        and the least recently used ones when the cache is full.
         
+        Args:
+            access_token: Spotify access token
+            expires_at: Token expiry (epoch seconds); defaults to one hour from now
+            
         Returns:
-            Authorization URL string
+            Spotify client
         """
-        try:
-            sp_oauth = SpotifyOAuth(
+        now = time.time()
+        
+        with self._clients_lock:
+            # Evict clients whose tokens have expired
+            for token in [t for t, (_, expiry) in self._clients.items() if expiry <= now]:
+                del self._clients[token]
+            
+            entry = self._clients.get(access_token)
+            if entry is not None:
+                self._clients.move_to_end(access_token)
+                return entry[0]
+            
+            client = spotipy.Spotify(
+                auth=access_token,
+                requests_session=self.session,
+                requests_timeout=Config.SPOTIFY_REQUEST_TIMEOUT
+            )
+            client.prefix = Config.SPOTIFY_API_URL
+            
+            self._clients[access_token] = (client, expires_at or now + 3600)
+            while len(self._clients) > Config.SPOTIFY_CLIENT_CACHE_SIZE:
+                self._clients.popitem(last=False)
+            
+            return client
+    
+    def _build_session(self) -> requests.Session:
+        """Create the shared keep-alive HTTP session for Spotify calls."""
+        retry = urllib3.Retry(
+            total=3,
+            connect=None,
+            read=False,
+            # Only idempotent methods are retried on 5xx: a retried POST (creating a
+            # playlist, adding tracks) could apply the write twice
+            allowed_methods=frozenset(['GET', 'PUT', 'DELETE']),
+            status=3,
+            backoff_factor=0.3,
+            status_forcelist=RETRY_STATUS_CODES,
+            # Hand the last 5xx back once retries run out; a RetryError would reach
+            # us from spotipy as a 429 and be mistaken for a rate limit
+            raise_on_status=False,
+            # Otherwise urllib3 sleeps out a 429's Retry-After by itself
+            respect_retry_after_header=False
+        )
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=Config.SPOTIFY_POOL_CONNECTIONS,
+            pool_maxsize=Config.SPOTIFY_POOL_MAXSIZE,
+            max_retries=retry
+        )
+        
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def _get_oauth(self) -> SpotifyOAuth:
+        """Get the shared OAuth manager (created on first use)."""
+        if self._oauth is None:
+            self._oauth = SpotifyOAuth(
                 client_id=self.client_id,
                 client_secret=self.client_secret,
                 redirect_uri=self.redirect_uri,
-                scope=self.scope
+                scope=self.scope,
+                requests_session=self.session,
+                cache_handler=_NoTokenCache()
             )
-            
-            auth_url = sp_oauth.get_authorize_url()
+            self._oauth.OAUTH_TOKEN_URL = Config.SPOTIFY_TOKEN_URL
+        return self._oauth
+    
+    def get_app_client(self) -> spotipy.Spotify:
+        """
+        Get the Spotify client authorized as the app itself (client credentials).
+        
+        Used for background work that isn't tied to a user, such as filling
+        the track pools. The app token is cached in memory and renewed by
+        spotipy when it expires.
+        """
+        with self._app_client_lock:
+            if self._app_client is None:
+                auth_manager = SpotifyClientCredentials(
+                    client_id=self.client_id,
+                    client_secret=self.client_secret,
+                    requests_session=self.session,
+                    requests_timeout=Config.SPOTIFY_REQUEST_TIMEOUT,
+                    cache_handler=MemoryCacheHandler()
+                )
+                auth_manager.OAUTH_TOKEN_URL = Config.SPOTIFY_TOKEN_URL
+                
+                self._app_client = spotipy.Spotify(
+                    auth_manager=auth_manager,
+                    requests_session=self.session,
+                    requests_timeout=Config.SPOTIFY_REQUEST_TIMEOUT
+                )
+                self._app_client.prefix = Config.SPOTIFY_API_URL
+            return self._app_client
+    
+    def get_auth_url(self) -> str:
+        """
+        Get Spotify OAuth authorization URL.
+        
+        Returns:
+            Authorization URL string
+        """
+        try:
+            auth_url = self._get_oauth().get_authorize_url()
             logger.info("Generated Spotify auth URL")
             return auth_url
             
@@ -121,14 +309,7 @@ class SpotifyService:
         """
         try:
             logger.info(f"Attempting to exchange code for token (code length: {len(authorization_code)})")
-            sp_oauth = SpotifyOAuth(
-                client_id=self.client_id,
-                client_secret=self.client_secret,
-                redirect_uri=self.redirect_uri,
-                scope=self.scope
-            )
-            
-            token_info = sp_oauth.get_access_token(authorization_code, as_dict=True, check_cache=False)
+            token_info = self._get_oauth().get_access_token(authorization_code, as_dict=True, check_cache=False)
             
             if token_info:
                 logger.info("Successfully obtained Spotify access token")
@@ -152,100 +333,412 @@ class SpotifyService:
                 'message': f'Token exchange failed: {str(e)}'
             }
     
-    def get_mood_playlist(self, mood: str, access_token: str) -> Dict[str, Any]:
+    def refresh_access_token(self, refresh_token: str) -> Dict[str, Any]:
+        """
+        Get a new access token with a refresh token.
+        
+        Args:
+            refresh_token: Refresh token from get_access_token
+            
+        Returns:
+            Dictionary with token info (refresh_token only if Spotify rotated it) or error
+        """
+        try:
+            token_info = self._get_oauth().refresh_access_token(refresh_token)
+            return {
+                'access_token': token_info['access_token'],
+                'refresh_token': token_info.get('refresh_token'),
+                'expires_at': token_info['expires_at'],
+                'expires_in': token_info['expires_in'],
+                'error': False
+            }
+            
+        except Exception as e:
+            logger.error(f"Token refresh failed: {str(e)}")
+            return {
+                'error': True,
+                'message': f'Token refresh failed: {str(e)}'
+            }
+    
+    def get_mood_playlist(self, mood: str, access_token: str, expires_at: Optional[float] = None,
+                          market: Optional[str] = None, priority: int = INTERACTIVE) -> Dict[str, Any]:
         """
         Get playlist recommendations for a specific mood.
         
         Args:
             mood: The mood to get recommendations for
             access_token: Spotify access token
+            expires_at: Token expiry (epoch seconds), used to evict its cached client
+            market: ISO country code to restrict tracks to (None for any)
+            priority: Scheduler priority of the searches (BACKGROUND for speculative
+                prefetches, which then wait at most the search deadline)
             
         Returns:
             Dictionary with playlist data or error
         """
         try:
-            # Initialize Spotify client with access token
-            sp = spotipy.Spotify(auth=access_token)
+            # Sample from the precomputed pool (market-agnostic) when it's filled,
+            # otherwise search for tracks based on mood
+            pool_mood = mood if mood in self.mood_queries else 'neutral'
+            tracks = None
+            if self.track_pool is not None and market is None:
+                tracks = self.track_pool.sample(pool_mood, 20)
             
-            # Get mood configuration
-            mood_config = self.mood_queries.get(mood, self.mood_queries['neutral'])
+            source = 'pool'
+            searches_missed = 0
+            if not tracks:
+                source = 'search'
+                
+                # Reuse the pooled Spotify client for this token
+                sp = self.get_client(access_token, expires_at)
+                
+                # Get mood configuration
+                mood_config = self.mood_queries[pool_mood]
+                
+                tracks, searches_missed = self._search_tracks_by_mood(
+                    sp, mood_config, market=market, priority=priority
+                )
             
-            # Search for tracks based on mood
-            tracks = self._search_tracks_by_mood(sp, mood_config)
+            return self._playlist_data(mood, tracks, source, searches_missed)
             
-            if not tracks:
-                return {
-                    'error': True,
-                    'message': f'No tracks found for mood: {mood}'
-                }
+        except SpotifyRateLimited as e:
+            return self._rate_limited_error(e)
+        except Exception as e:
+            logger.error(f"Playlist generation failed: {str(e)}")
+            return {
+                'error': True,
+                'message': f'Failed to generate playlist: {str(e)}'
+            }
+    
+    def _playlist_data(self, mood: str, tracks: List[Dict], source: str, searches_missed: int) -> Dict[str, Any]:
+        """
+        Build get_mood_playlist's result from the tracks found.
+        
+        Args:
+            mood: Requested mood
+            tracks: Formatted tracks (empty when nothing was found)
+            source: 'pool' or 'search'
+            searches_missed: Searches that failed or timed out
+            
+        Returns:
+            Dictionary with playlist data or error
+        """
+        if not tracks:
+            return {
+                'error': True,
+                'message': f'No tracks found for mood: {mood}'
+            }
+        
+        # Create playlist data
+        playlist_data = {
+            'mood': mood,
+            'tracks': tracks,
+            'total_tracks': len(tracks),
+            'playlist_name': f"{mood.title()} Vibes",
+            'description': f"AI-generated playlist for {mood} mood",
+            'source': source,
+            'partial': searches_missed > 0,
+            'error': False
+        }
+        
+        # If user has premium, we could create an actual playlist
+        # For now, we return track data for frontend to display
+        
+        logger.info(f"Generated {len(tracks)} track recommendations for mood: {mood}")
+        return playlist_data
+    
+    def get_blended_playlist(self, emotion_scores: Dict[str, float], access_token: str,
+                             expires_at: Optional[float] = None, limit: int = 20) -> Dict[str, Any]:
+        """
+        Get recommendations for a continuous emotion distribution.
+        
+        The per-mood audio-feature targets are mixed by the emotion scores
+        and the indexed tracks are ranked against the blended target. Until
+        the index has tracks, this falls back to the playlist of the dominant mood.
+        
+        Args:
+            emotion_scores: Mood scores, e.g. detect_emotion's 'emotions'
+            access_token: Spotify access token (used by the fallback)
+            expires_at: Token expiry (epoch seconds)
+            limit: Number of tracks
             
-            # Create playlist data
-            playlist_data = {
+        Returns:
+            Dictionary with playlist data, the blended target, or error
+        """
+        try:
+            mood = max(emotion_scores.items(), key=lambda x: x[1])[0]
+            target, weights = blend_targets(self.mood_targets, emotion_scores)
+            target_features = {
+                name: round(float(value), 4)
+                for name, value, weight in zip(AUDIO_FEATURES, target, weights) if weight > 0
+            }
+            
+            if self.track_index is None or len(self.track_index) == 0:
+                playlist_data = self.get_mood_playlist(mood, access_token, expires_at)
+                playlist_data['target'] = target_features
+                return playlist_data
+            
+            tracks = self.rank_tracks(emotion_scores=emotion_scores, limit=limit)
+            
+            logger.info(f"Ranked {len(tracks)} tracks for blended emotions (dominant: {mood})")
+            return {
                 'mood': mood,
+                'emotions': emotion_scores,
+                'target': target_features,
                 'tracks': tracks,
                 'total_tracks': len(tracks),
-                'playlist_name': f"{mood.title()} Vibes",
-                'description': f"AI-generated playlist for {mood} mood",
+                'playlist_name': f"{mood.title()} Blend",
+                'description': "AI-generated playlist for your mood mix",
+                'source': 'index',
+                'partial': False,
                 'error': False
             }
             
-            # If user has premium, we could create an actual playlist
-            # For now, we return track data for frontend to display
-            
-            logger.info(f"Generated {len(tracks)} track recommendations for mood: {mood}")
-            return playlist_data
-            
         except Exception as e:
-            logger.error(f"Playlist generation failed: {str(e)}")
+            logger.error(f"Blended playlist generation failed: {str(e)}")
             return {
                 'error': True,
                 'message': f'Failed to generate playlist: {str(e)}'
             }
     
-    def _search_tracks_by_mood(self, sp: spotipy.Spotify, mood_config: Dict) -> List[Dict]:
+    def _search_tracks_by_mood(self, sp: spotipy.Spotify, mood_config: Dict,
+                               deadline: Optional[float] = None,
+                               market: Optional[str] = None,
+                               priority: int = INTERACTIVE) -> Tuple[List[Dict], int]:
         """
         Search for tracks matching mood configuration.
         
+        Searches are answered from the shared search cache where possible
+        (stale entries are served and refreshed in the background). The
+        remaining searches run concurrently, so widening the fan-out
+        (SPOTIFY_SEARCH_GENRES / SPOTIFY_SEARCH_KEYWORDS) costs about one
+        round trip rather than one per search. Searches still running at the
+        deadline are abandoned and the playlist is built from the rest.
+        
         Args:
             sp: Spotify client
             mood_config: Configuration for the mood
+            deadline: Seconds to wait for the searches (defaults to Config.SPOTIFY_SEARCH_DEADLINE)
+            market: ISO country code to restrict tracks to (None for any)
+            priority: Scheduler priority of the searches
             
         Returns:
-            List of track dictionaries
+            Tuple of (list of track dictionaries, number of searches that failed or timed out)
         """
-        tracks = []
+        if deadline is None:
+            deadline = Config.SPOTIFY_SEARCH_DEADLINE
+        
+        queries = self._mood_search_queries(mood_config)
+        # Background calls otherwise wait as long as needed; these are abandoned at the deadline
+        max_wait = deadline if priority == BACKGROUND else None
         
         try:
-            # Use different search strategies
+            search_results = [None] * len(queries)
+            futures = {}
             
-            # 1. Search by genres
-            for genre in mood_config['genres'][:2]:  # Limit to 2 genres to avoid too many requests
-                query = f'genre:"{genre}"'
-                results = sp.search(q=query, type='track', limit=10)
-                tracks.extend(self._format_tracks(results['tracks']['items']))
+            for index, query in enumerate(queries):
+                fetch = partial(self._search, sp, query, market, priority=priority, max_wait=max_wait)
+                
+                if self.search_cache is None:
+                    futures[index] = self._search_executor.submit(fetch)
+                    continue
+                
+                # Refreshing a stale entry can yield to interactive searches
+                cached = self.search_cache.get(
+                    query, market, SEARCH_LIMIT,
+                    refresh=partial(self._search, sp, query, market, priority=BACKGROUND)
+                )
+                if cached is not None:
+                    search_results[index] = cached
+                else:
+                    futures[index] = self._search_executor.submit(
+                        self.search_cache.load, query, market, SEARCH_LIMIT, fetch
+                    )
             
-            # 2. Search by keywords
-            for keyword in mood_config['keywords'][:2]:  # Limit keywords
-                query = f'"{keyword}"'
-                results = sp.search(q=query, type='track', limit=10)
-                tracks.extend(self._format_tracks(results['tracks']['items']))
+            searches_missed = 0
+            rate_limited = None
+            if futures:
+                done, not_done = wait(futures.values(), timeout=deadline)
+                
+                for future in not_done:
+                    future.cancel()
+                if not_done:
+                    logger.warning(f"{len(not_done)}/{len(queries)} track searches missed the {deadline}s deadline")
+                searches_missed = len(not_done)
+                
+                for index, future in futures.items():
+                    if future not in done:
+                        continue
+                    try:
+                        search_results[index] = future.result()
+                    except SpotifyRateLimited as e:
+                        rate_limited = e
+                        searches_missed += 1
+                    except Exception as e:
+                        logger.warning(f"Track search failed for {queries[index]}: {str(e)}")
+                        searches_missed += 1
             
-            # Remove duplicates and shuffle
+        except Exception as e:
+            logger.error(f"Track search failed: {str(e)}")
+            return [], len(queries)
+        
+        return self._merge_search_results(search_results, searches_missed, rate_limited)
+    
+    def _merge_search_results(self, search_results: List[Optional[List[Dict]]], searches_missed: int,
+                              rate_limited: Optional[SpotifyRateLimited] = None) -> Tuple[List[Dict], int]:
+        """
+        Combine the results of a mood's searches into its tracks.
+        
+        Args:
+            search_results: Formatted tracks per query, in query order (None for missed searches)
+            searches_missed: Searches that failed or timed out
+            rate_limited: Rate limit error one of the searches failed with
+            
+        Returns:
+            Tuple of (up to 20 shuffled unique tracks, searches_missed)
+            
+        Raises:
+            SpotifyRateLimited: if nothing was found because searches were rate limited
+        """
+        # Remove duplicates (in query order, so results don't depend on completion order) and shuffle
+        with stage_timer('dedupe'):
             unique_tracks = []
             track_ids = set()
             
-            for track in tracks:
-                if track['id'] not in track_ids:
-                    unique_tracks.append(track)
-                    track_ids.add(track['id'])
+            for tracks in search_results:
+                for track in tracks or []:
+                    if track['id'] not in track_ids:
+                        unique_tracks.append(track)
+                        track_ids.add(track['id'])
             
             # Shuffle and limit to 20 tracks
             random.shuffle(unique_tracks)
-            return unique_tracks[:20]
+        
+        if not unique_tracks and searches_missed:
+            # Searches that timed out while the scheduler held them back count as rate limited too
+            retry_after = self.scheduler.retry_after()
+            if rate_limited is None and retry_after > 0:
+                rate_limited = SpotifyRateLimited(retry_after)
+            if rate_limited is not None:
+                raise rate_limited
+        return unique_tracks[:20], searches_missed
+    
+    def _search(self, sp: spotipy.Spotify, query: str, market: Optional[str] = None,
+                limit: int = SEARCH_LIMIT, offset: int = 0, priority: int = INTERACTIVE,
+                max_wait: Optional[float] = None) -> List[Dict]:
+        """
+        Run one track search against Spotify.
+        
+        Identical searches in flight at the same time (from any user) share
+        one request.
+        
+        Args:
+            sp: Spotify client
+            query: Search query
+            market: ISO country code to restrict tracks to (None for any)
+            limit: Number of results (at most 50)
+            offset: Index of the first result, for paging
+            priority: Scheduler priority (INTERACTIVE or BACKGROUND)
+            max_wait: Seconds to wait for the rate limit (see SpotifyScheduler.call)
             
-        except Exception as e:
-            logger.error(f"Track search failed: {str(e)}")
-            return []
+        Returns:
+            Formatted tracks
+        """
+        with stage_timer('spotify_search'):
+            results = self.scheduler.call(
+                partial(sp.search, q=query, type='track', limit=limit, offset=offset, market=market),
+                key=('search', query, market, limit, offset),
+                priority=priority,
+                max_wait=max_wait
+            )
+        with stage_timer('format_tracks'):
+            return self._format_tracks(results['tracks']['items'])
+    
+    def _fetch_pool_page(self, query: str, offset: int, limit: int) -> List[Dict]:
+        """Fetch one page of a track pool query with the app client."""
+        return self._search(self.get_app_client(), query, limit=limit, offset=offset, priority=BACKGROUND)
+    
+    def index_audio_features(self, tracks: List[Dict]) -> int:
+        """
+        Fetch audio features for tracks missing from the index and add them.
+        
+        Args:
+            tracks: Formatted tracks
+            
+        Returns:
+            Number of tracks newly indexed
+        """
+        missing = [track for track in tracks if track['id'] not in self.track_index]
+        indexed = 0
+        
+        for start in range(0, len(missing), AUDIO_FEATURES_BATCH):
+            batch = missing[start:start + AUDIO_FEATURES_BATCH]
+            features = self.scheduler.call(
+                partial(self.get_app_client().audio_features, [track['id'] for track in batch]),
+                priority=BACKGROUND
+            )
+            indexed += self.track_index.bulk_load(features or [], batch)
+        
+        return indexed
+    
+    def _index_pool_tracks(self, mood: str, tracks: List[Dict]):
+        """Track pool callback: index the audio features of a refreshed pool."""
+        indexed = self.index_audio_features(tracks)
+        if indexed:
+            logger.info(f"Indexed audio features for {indexed} {mood} tracks ({len(self.track_index)} total)")
+    
+    def rank_tracks(self, mood: Optional[str] = None, emotion_scores: Optional[Dict[str, float]] = None,
+                    limit: int = 20, candidate_ids: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Rank indexed tracks by audio-feature distance to a mood target.
+        
+        The target comes from the mood's audio_features in mood_queries or,
+        when emotion scores are given, from blending every mood's target by
+        those scores.
+        
+        Args:
+            mood: Mood whose target to use
+            emotion_scores: Continuous mood scores (e.g. detect_emotion's 'emotions')
+            limit: Number of tracks to return
+            candidate_ids: Only rank these tracks
+            
+        Returns:
+            Formatted tracks with a 'feature_distance' (0 is a perfect match), nearest first
+        """
+        if emotion_scores:
+            target, weights = blend_targets(self.mood_targets, emotion_scores)
+        else:
+            target, weights = self.mood_targets.get(mood, self.mood_targets['neutral'])
+        
+        ranked = []
+        for track_id, distance in self.track_index.query(target, weights, k=limit, candidate_ids=candidate_ids):
+            track = self.track_index.get_track(track_id) or {'id': track_id}
+            track['feature_distance'] = distance
+            ranked.append(track)
+        return ranked
+    
+    def _mood_search_queries(self, mood_config: Dict, max_genres: Optional[int] = None,
+                             max_keywords: Optional[int] = None) -> List[str]:
+        """
+        Build the search queries for a mood.
+        
+        Args:
+            mood_config: Configuration for the mood
+            max_genres: Genres to search, 0 for all (defaults to Config.SPOTIFY_SEARCH_GENRES)
+            max_keywords: Keywords to search, 0 for all (defaults to Config.SPOTIFY_SEARCH_KEYWORDS)
+            
+        Returns:
+            Genre queries followed by keyword queries
+        """
+        if max_genres is None:
+            max_genres = Config.SPOTIFY_SEARCH_GENRES
+        if max_keywords is None:
+            max_keywords = Config.SPOTIFY_SEARCH_KEYWORDS
+        
+        genres = mood_config['genres'][:max_genres or None]
+        keywords = mood_config['keywords'][:max_keywords or None]
+        
+        return [f'genre:"{genre}"' for genre in genres] + [f'"{keyword}"' for keyword in keywords]
     
     def _format_tracks(self, spotify_tracks: List[Dict]) -> List[Dict]:
         """
@@ -304,16 +797,17 @@ class SpotifyService:
             playlist_name = f"AI Mood: {mood.title()}"
             playlist_description = f"AI-generated playlist for {mood} mood - Created by Mood Music Player"
             
-            playlist = sp.user_playlist_create(
+            playlist = self.scheduler.call(partial(
+                sp.user_playlist_create,
                 user=user_id,
                 name=playlist_name,
                 description=playlist_description,
                 public=False
-            )
+            ))
             
             # Add tracks to playlist
             if track_uris:
-                sp.playlist_add_items(playlist['id'], track_uris)
+                self.scheduler.call(partial(sp.playlist_add_items, playlist['id'], track_uris))
             
             logger.info(f"Created Spotify playlist: {playlist_name}")
             
@@ -324,6 +818,8 @@ class SpotifyService:
                 'error': False
             }
             
+        except SpotifyRateLimited as e:
+            return self._rate_limited_error(e)
         except Exception as e:
             logger.error(f"Playlist creation failed: {str(e)}")
             return {
@@ -331,19 +827,44 @@ class SpotifyService:
                 'message': f'Failed to create playlist: {str(e)}'
             }
     
-    def get_user_profile(self, access_token: str) -> Dict[str, Any]:
+    def _rate_limited_error(self, error: SpotifyRateLimited) -> Dict[str, Any]:
+        """Error result for a call the rate limiter gave up on."""
+        retry_after = max(error.retry_after, self.scheduler.retry_after())
+        logger.warning(f"Spotify request rate limited, retry in {retry_after:.1f}s")
+        return {
+            'error': True,
+            'rate_limited': True,
+            'retry_after': math.ceil(retry_after),
+            'message': 'Spotify rate limit reached, please try again shortly'
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get search cache, track pool, rate limiter and client statistics."""
+        with self._clients_lock:
+            clients = len(self._clients)
+        
+        return {
+            'cached_clients': clients,
+            'scheduler': self.scheduler.get_stats(),
+            'search_cache': self.search_cache.get_stats() if self.search_cache is not None else None,
+            'track_pool': self.track_pool.get_stats() if self.track_pool is not None else None,
+            'indexed_tracks': len(self.track_index) if self.track_index is not None else None
+        }
+    
+    def get_user_profile(self, access_token: str, expires_at: Optional[float] = None) -> Dict[str, Any]:
         """
         Get current user's Spotify profile.
         
         Args:
             access_token: Spotify access token
+            expires_at: Token expiry (epoch seconds), used to evict its cached client
             
         Returns:
             User profile data or error
         """
         try:
-            sp = spotipy.Spotify(auth=access_token)
-            user = sp.current_user()
+            sp = self.get_client(access_token, expires_at)
+            user = self.scheduler.call(sp.current_user, key=('current_user', access_token))
             
             return {
                 'user_id': user['id'],
@@ -355,6 +876,8 @@ class SpotifyService:
                 'error': False
             }
             
+        except SpotifyRateLimited as e:
+            return self._rate_limited_error(e)
         except Exception as e:
             logger.error(f"Failed to get user profile: {str(e)}")
             return {
@@ -0,0 +1,371 @@
+"""
+Server-side Spotify token store with proactive refresh.
+"""
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+
+class TokenStore:
+    """
+    Spotify tokens keyed by an opaque session id.
+    
+    The browser session only carries the id; access and refresh tokens stay
+    on the server. Tokens of sessions used within `active_window` are
+    refreshed in the background shortly before they expire; others are
+    refreshed synchronously by the next request that finds them expired.
+    Concurrent refreshes of one session share a single call to the token
+    endpoint.
+    
+    With `db_path` set, tokens are persisted in SQLite so they survive
+    restarts and are shared by all worker processes; the in-memory copy is
+    a cache in front of it. Without it, tokens live in one process only.
+    The database file is created on first use, not when the store is built.
+    """
+    
+    def __init__(self, refresh_fn: Callable[[str], Dict[str, Any]], refresh_margin: float = 300,
+                 active_window: float = 3600, idle_ttl: float = 30 * 86400,
+                 db_path: Optional[str] = None):
+        """
+        Initialize the store.
+        
+        Args:
+            refresh_fn: refresh_fn(refresh_token) returning a token dict
+                (access_token, expires_at, optional refresh_token, error)
+            refresh_margin: Refresh tokens this many seconds before they expire
+            active_window: Keep refreshing (and caching) sessions used this recently
+            idle_ttl: Forget sessions unused for this many seconds
+            db_path: SQLite file for persistence (None keeps tokens in memory only)
+        """
+        self.refresh_fn = refresh_fn
+        self.refresh_margin = refresh_margin
+        self.active_window = active_window
+        self.idle_ttl = idle_ttl
+        self.db_path = db_path
+        
+        self._tokens = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self._db_ready = False
+        self._db_init_lock = threading.Lock()
+        
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.coalesced = 0
+    
+    @classmethod
+    def from_config(cls, refresh_fn: Callable[[str], Dict[str, Any]]) -> 'TokenStore':
+        """Create a store from the TOKEN_* settings."""
+        return cls(
+            refresh_fn,
+            refresh_margin=Config.TOKEN_REFRESH_MARGIN,
+            active_window=Config.TOKEN_ACTIVE_WINDOW,
+            idle_ttl=Config.TOKEN_IDLE_TTL,
+            db_path=Config.TOKEN_STORE_PATH or None
+        )
+    
+    def start(self):
+        """Start the background refresher (once per process)."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Fresh state, also when a forked child inherits a started store
+            self._pid = os.getpid()
+            self._inflight = {}
+            self._wake = threading.Event()
+        
+        refresher = threading.Thread(target=self._run, name='token-refresher', daemon=True)
+        refresher.start()
+    
+    def create(self, token_info: Dict[str, Any]) -> str:
+        """
+        Store a newly obtained token.
+        
+        Args:
+            token_info: Result of SpotifyService.get_access_token
+            
+        Returns:
+            New session id
+        """
+        self.start()
+        
+        sid = secrets.token_urlsafe(32)
+        entry = {
+            'access_token': token_info['access_token'],
+            'refresh_token': token_info['refresh_token'],
+            'expires_at': float(token_info['expires_at']),
+            'last_used': time.time()
+        }
+        with self._lock:
+            self._tokens[sid] = entry
+        self._save(sid, entry)
+        return sid
+    
+    def get_token(self, sid: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a usable access token for a session.
+        
+        Args:
+            sid: Session id from create()
+            
+        Returns:
+            {'access_token', 'expires_at'}, or None if the session is unknown or
+            its token expired and could not be refreshed
+        """
+        self.start()
+        
+        entry = self._entry(sid)
+        if entry is None:
+            return None
+        
+        entry['last_used'] = time.time()
+        if entry['expires_at'] - time.time() < 30:
+            # Expired (or about to): the background refresh didn't get to it
+            entry = self.refresh(sid)
+            if entry is None:
+                return None
+        
+        return {'access_token': entry['access_token'], 'expires_at': entry['expires_at']}
+    
+    def has_session(self, sid: Optional[str]) -> bool:
+        """Whether a session id is known (without refreshing)."""
+        return bool(sid) and self._entry(sid) is not None
+    
+    def refresh(self, sid: str) -> Optional[Dict[str, Any]]:
+        """
+        Refresh a session's token; concurrent calls share one refresh.
+        
+        Returns:
+            The updated entry, or None if the refresh failed and the token expired
+        """
+        with self._lock:
+            future = self._inflight.get(sid)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[sid] = future
+            else:
+                self.coalesced += 1
+        
+        if not owner:
+            return future.result()
+        
+        try:
+            entry = self._refresh(sid)
+            future.set_result(entry)
+            return entry
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[sid]
+    
+    def delete(self, sid: str):
+        """Forget a session's tokens."""
+        with self._lock:
+            self._tokens.pop(sid, None)
+        if self.db_path:
+            with self._db() as db:
+                db.execute('DELETE FROM tokens WHERE sid = ?', (sid,))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get token counts and refresh counters."""
+        with self._lock:
+            return {
+                'cached_sessions': len(self._tokens),
+                'persistent': bool(self.db_path),
+                'refresh_margin': self.refresh_margin,
+                'refreshes': self.refreshes,
+                'refresh_failures': self.refresh_failures,
+                'coalesced': self.coalesced
+            }
+    
+    def _refresh(self, sid: str) -> Optional[Dict[str, Any]]:
+        """Refresh one session's token (single-flight owner)."""
+        entry = self._entry(sid)
+        if entry is None:
+            return None
+        
+        # Another worker may already have refreshed (and rotated the refresh token)
+        persisted = self._load(sid)
+        if persisted is not None and persisted['expires_at'] > entry['expires_at']:
+            persisted['last_used'] = max(persisted['last_used'], entry['last_used'])
+            entry = persisted
+            with self._lock:
+                self._tokens[sid] = entry
+            if entry['expires_at'] - time.time() > self.refresh_margin:
+                return entry
+        
+        token_info = self.refresh_fn(entry['refresh_token'])
+        if token_info.get('error'):
+            with self._lock:
+                self.refresh_failures += 1
+            if entry['expires_at'] > time.time():
+                logger.warning("Keeping the current session token until it expires")
+                return entry
+            return None
+        
+        entry = {
+            'access_token': token_info['access_token'],
+            # Spotify only sometimes rotates the refresh token
+            'refresh_token': token_info.get('refresh_token') or entry['refresh_token'],
+            'expires_at': float(token_info['expires_at']),
+            'last_used': entry['last_used']
+        }
+        with self._lock:
+            self._tokens[sid] = entry
+            self.refreshes += 1
+        self._save(sid, entry)
+        return entry
+    
+    def _run(self):
+        """Refresher loop: refresh tokens nearing expiry for recently used sessions."""
+        while True:
+            now = time.time()
+            with self._lock:
+                entries = list(self._tokens.items())
+            
+            next_due = now + self.refresh_margin
+            for sid, entry in entries:
+                idle = now - entry['last_used']
+                if idle > self.active_window:
+                    # Inactive: no background refresh. With a database, drop the cached
+                    # copy (the database keeps it); in memory only, keep it for idle_ttl
+                    if self.db_path:
+                        with self._lock:
+                            self._tokens.pop(sid, None)
+                        self._save_last_used(sid, entry['last_used'])
+                    elif idle > self.idle_ttl:
+                        with self._lock:
+                            self._tokens.pop(sid, None)
+                    continue
+                
+                due_at = entry['expires_at'] - self.refresh_margin
+                if due_at <= now:
+                    try:
+                        self.refresh(sid)
+                    except Exception as e:
+                        logger.error(f"Background token refresh failed: {str(e)}")
+                else:
+                    next_due = min(next_due, due_at)
+            
+            self._purge_idle(now)
+            self._wake.wait(timeout=max(1.0, next_due - time.time()))
+            self._wake.clear()
+    
+    def _entry(self, sid: str) -> Optional[Dict[str, Any]]:
+        """Cached entry, loading it from the database on a miss."""
+        with self._lock:
+            entry = self._tokens.get(sid)
+        if entry is not None:
+            return entry
+        
+        entry = self._load(sid)
+        if entry is None:
+            return None
+        if time.time() - entry['last_used'] > self.idle_ttl:
+            self.delete(sid)
+            return None
+        
+        with self._lock:
+            self._tokens[sid] = entry
+        # Wake the refresher so it considers this session's expiry
+        self._wake.set()
+        return entry
+    
+    @contextmanager
+    def _db(self):
+        """Short-lived database connection, committed on success."""
+        if not self._db_ready:
+            self._init_db()
+        db = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+    
+    def _purge_idle(self, now: float):
+        """Delete persisted sessions unused for longer than idle_ttl."""
+        if not self.db_path:
+            return
+        try:
+            with self._db() as db:
+                db.execute('DELETE FROM tokens WHERE last_used < ?', (now - self.idle_ttl,))
+        except sqlite3.Error as e:
+            logger.warning(f"Token store purge failed: {str(e)}")
+    
+    def _init_db(self):
+        """Create the database and token table once (file readable by the owner only)."""
+        with self._db_init_lock:
+            if self._db_ready:
+                return
+            
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            db = sqlite3.connect(self.db_path, timeout=5)
+            try:
+                with db:
+                    db.execute('PRAGMA journal_mode=WAL')
+                    db.execute(
+                        'CREATE TABLE IF NOT EXISTS tokens ('
+                        'sid TEXT PRIMARY KEY, access_token TEXT, refresh_token TEXT, '
+                        'expires_at REAL, last_used REAL)'
+                    )
+            finally:
+                db.close()
+            os.chmod(self.db_path, 0o600)
+            self._db_ready = True
+    
+    def _load(self, sid: str) -> Optional[Dict[str, Any]]:
+        """Read a session's tokens from the database."""
+        if not self.db_path:
+            return None
+        
+        with self._db() as db:
+            row = db.execute(
+                'SELECT access_token, refresh_token, expires_at, last_used FROM tokens WHERE sid = ?',
+                (sid,)
+            ).fetchone()
+        
+        if row is None:
+            return None
+        return {'access_token': row[0], 'refresh_token': row[1], 'expires_at': row[2], 'last_used': row[3]}
+    
+    def _save(self, sid: str, entry: Dict[str, Any]):
+        """Write a session's tokens to the database."""
+        if not self.db_path:
+            return
+        
+        with self._db() as db:
+            db.execute(
+                'INSERT OR REPLACE INTO tokens (sid, access_token, refresh_token, expires_at, last_used) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (sid, entry['access_token'], entry['refresh_token'], entry['expires_at'], entry['last_used'])
+            )
+    
+    def _save_last_used(self, sid: str, last_used: float):
+        """Record the last use of a session whose cached copy is dropped (refreshes save it otherwise)."""
+        try:
+            with self._db() as db:
+                db.execute(
+                    'UPDATE tokens SET last_used = MAX(last_used, ?) WHERE sid = ?',
+                    (last_used, sid)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Token store update failed: {str(e)}")
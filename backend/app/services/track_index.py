@@ -0,0 +1,247 @@
+"""
+Audio-feature index for nearest-neighbour mood matching.
+"""
+import json
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.track_pool import pack_track, unpack_track
+
+logger = logging.getLogger(__name__)
+
+# Spotify audio features used for matching, in vector order
+AUDIO_FEATURES = ('valence', 'energy', 'danceability', 'acousticness',
+                  'instrumentalness', 'loudness', 'tempo')
+
+# Features not already on a 0-1 scale are clipped to these ranges and rescaled
+FEATURE_RANGES = {
+    'loudness': (-60.0, 0.0),
+    'tempo': (50.0, 200.0)
+}
+
+
+def normalize_feature(name: str, value: float) -> float:
+    """Rescale a raw Spotify audio feature to 0-1."""
+    low, high = FEATURE_RANGES.get(name, (0.0, 1.0))
+    return min(1.0, max(0.0, (float(value) - low) / (high - low)))
+
+
+def target_from_mood(audio_features: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build a target vector from a mood's `target_*` audio features.
+    
+    Args:
+        audio_features: e.g. {'target_valence': 0.8, 'target_energy': 0.8}
+        
+    Returns:
+        Tuple of (target vector, weights); features the mood doesn't specify get weight 0
+    """
+    target = np.zeros(len(AUDIO_FEATURES), dtype=np.float32)
+    weights = np.zeros(len(AUDIO_FEATURES), dtype=np.float32)
+    
+    for i, name in enumerate(AUDIO_FEATURES):
+        value = audio_features.get(f'target_{name}')
+        if value is not None:
+            target[i] = normalize_feature(name, value)
+            weights[i] = 1.0
+    
+    return target, weights
+
+
+def blend_targets(targets: Dict[str, Tuple[np.ndarray, np.ndarray]],
+                  emotion_scores: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Blend mood targets by continuous emotion scores.
+    
+    Each feature's target is the score-weighted mean over the moods that
+    specify it, so a face that is 60% happy and 40% neutral gets a target
+    between the two rather than the happy target alone.
+    
+    Args:
+        targets: Per-mood (target vector, weights) from target_from_mood
+        emotion_scores: Mood scores, e.g. the 'emotions' of a detection result
+        
+    Returns:
+        Tuple of (target vector, weights)
+    """
+    total = sum(score for mood, score in emotion_scores.items() if mood in targets and score > 0)
+    if total <= 0:
+        return targets['neutral']
+    
+    weighted_target = np.zeros(len(AUDIO_FEATURES), dtype=np.float32)
+    weights = np.zeros(len(AUDIO_FEATURES), dtype=np.float32)
+    
+    for mood, score in emotion_scores.items():
+        if mood not in targets or score <= 0:
+            continue
+        mood_target, mood_weights = targets[mood]
+        share = score / total
+        weighted_target += share * mood_weights * mood_target
+        weights += share * mood_weights
+    
+    target = np.divide(weighted_target, weights, out=np.zeros_like(weights), where=weights > 0)
+    return target, weights
+
+
+class TrackIndex:
+    """
+    In-memory index of track audio-feature vectors.
+    
+    Vectors live in one (N, len(AUDIO_FEATURES)) float32 array, so ranking
+    every indexed track against a target is a single vectorized distance
+    computation. Track metadata is kept compactly for building responses.
+    """
+    
+    def __init__(self, capacity: int = 1024):
+        """
+        Initialize an empty index.
+        
+        Args:
+            capacity: Initial number of rows (grows as needed)
+        """
+        self._vectors = np.zeros((max(1, capacity), len(AUDIO_FEATURES)), dtype=np.float32)
+        self._ids = []
+        self._rows = {}
+        self._tracks = []
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_fixture(cls, path: str) -> 'TrackIndex':
+        """
+        Create an index from a fixture file (works offline).
+        
+        The file holds Spotify-shaped data: {"audio_features": [...]} as
+        returned by the audio-features endpoint and, optionally,
+        {"tracks": [...]} formatted like SpotifyService._format_tracks.
+        
+        Args:
+            path: JSON fixture file
+        """
+        with open(path) as f:
+            data = json.load(f)
+        
+        index = cls(capacity=len(data.get('audio_features', ())))
+        index.bulk_load(data.get('audio_features', ()), data.get('tracks', ()))
+        logger.info(f"Loaded {len(index)} tracks into the track index from {path}")
+        return index
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+    
+    def __contains__(self, track_id: str) -> bool:
+        return track_id in self._rows
+    
+    def bulk_load(self, audio_features: Iterable[Dict[str, Any]],
+                  tracks: Iterable[Dict[str, Any]] = ()) -> int:
+        """
+        Add or update many tracks at once.
+        
+        Args:
+            audio_features: Spotify audio-feature objects (each with an 'id');
+                None entries (tracks Spotify has no features for) are skipped
+            tracks: Formatted track metadata, matched to features by id
+            
+        Returns:
+            Number of tracks indexed
+        """
+        metadata = {track['id']: track for track in tracks}
+        records = [features for features in audio_features if features and features.get('id')]
+        if not records:
+            return 0
+        
+        vectors = np.array(
+            [[normalize_feature(name, features.get(name, 0.0) or 0.0) for name in AUDIO_FEATURES]
+             for features in records],
+            dtype=np.float32
+        )
+        
+        with self._lock:
+            self._reserve(len(self._ids) + len(records))
+            for vector, features in zip(vectors, records):
+                track_id = features['id']
+                track = metadata.get(track_id)
+                packed = pack_track(track) if track is not None else None
+                
+                row = self._rows.get(track_id)
+                if row is None:
+                    row = len(self._ids)
+                    self._rows[track_id] = row
+                    self._ids.append(track_id)
+                    self._tracks.append(packed)
+                elif packed is not None:
+                    self._tracks[row] = packed
+                self._vectors[row] = vector
+        
+        return len(records)
+    
+    def get_track(self, track_id: str) -> Optional[Dict[str, Any]]:
+        """Get a track's formatted metadata, if it was indexed with any."""
+        row = self._rows.get(track_id)
+        if row is None or self._tracks[row] is None:
+            return None
+        return unpack_track(self._tracks[row])
+    
+    def get_vector(self, track_id: str) -> Optional[np.ndarray]:
+        """Get a track's normalized feature vector."""
+        row = self._rows.get(track_id)
+        return self._vectors[row].copy() if row is not None else None
+    
+    def query(self, target: np.ndarray, weights: np.ndarray, k: int = 20,
+              candidate_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Rank tracks by distance to a target vector.
+        
+        Distance is the weighted RMS difference over the features with
+        non-zero weight, so it stays between 0 and 1.
+        
+        Args:
+            target: Target vector in AUDIO_FEATURES order (normalized)
+            weights: Per-feature weights (0 ignores a feature)
+            k: Number of nearest tracks to return
+            candidate_ids: Restrict ranking to these tracks (unknown ids are ignored)
+            
+        Returns:
+            List of (track_id, distance), nearest first
+        """
+        weights = np.asarray(weights, dtype=np.float32)
+        weight_sum = float(weights.sum())
+        if weight_sum <= 0:
+            raise ValueError('At least one feature weight must be positive')
+        
+        with self._lock:
+            if candidate_ids is None:
+                rows = np.arange(len(self._ids))
+                vectors = self._vectors[:len(self._ids)]
+            else:
+                rows = np.fromiter(
+                    (self._rows[track_id] for track_id in candidate_ids if track_id in self._rows),
+                    dtype=np.int64
+                )
+                vectors = self._vectors[rows]
+            
+            if len(rows) == 0:
+                return []
+            
+            diff = vectors - np.asarray(target, dtype=np.float32)
+            distances = np.sqrt((diff * diff) @ (weights / weight_sum))
+            
+            k = min(k, len(rows))
+            nearest = np.argpartition(distances, k - 1)[:k]
+            nearest = nearest[np.argsort(distances[nearest], kind='stable')]
+            
+            return [(self._ids[rows[i]], float(distances[i])) for i in nearest]
+    
+    def _reserve(self, rows: int):
+        """Grow the vector array to hold at least `rows` rows (lock must be held)."""
+        capacity = self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        
+        while capacity < rows:
+            capacity *= 2
+        grown = np.zeros((capacity, len(AUDIO_FEATURES)), dtype=np.float32)
+        grown[:len(self._ids)] = self._vectors[:len(self._ids)]
+        self._vectors = grown
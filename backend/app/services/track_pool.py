@@ -0,0 +1,349 @@
+"""
+Precomputed per-mood track pools with background refresh.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Field order of the compact per-track tuples; uri and external_urls derive from the id
+TRACK_FIELDS = ('id', 'name', 'artist', 'album', 'duration_ms', 'explicit',
+                'popularity', 'preview_url', 'image_url')
+
+POOL_FILE_VERSION = 1
+
+
+def pack_track(track: Dict[str, Any]) -> tuple:
+    """Compact a formatted track into a tuple in TRACK_FIELDS order."""
+    return tuple(track.get(field) for field in TRACK_FIELDS)
+
+
+def unpack_track(packed) -> Dict[str, Any]:
+    """Rebuild a formatted track (as returned by SpotifyService._format_tracks)."""
+    track = dict(zip(TRACK_FIELDS, packed))
+    track['external_urls'] = {'spotify': f"https://open.spotify.com/track/{track['id']}"}
+    track['uri'] = f"spotify:track:{track['id']}"
+    if track['image_url'] is None:
+        del track['image_url']
+    return track
+
+
+class TrackPool:
+    """
+    Deep pools of candidate tracks per mood, refreshed in the background.
+    
+    For every mood, each genre and keyword query is paged through
+    (`pages` x `page_size` results) and the de-duplicated tracks are kept as
+    compact tuples. Playlists are then sampled from memory without calling
+    Spotify. Each mood is refreshed every `refresh_interval` seconds, jittered
+    so moods (and worker processes) don't refresh in lockstep, and pools are
+    persisted to disk so a restart serves immediately.
+    
+    With several worker processes sharing one pool file, a worker about to
+    refresh first adopts a fresher pool another worker has already saved.
+    """
+    
+    def __init__(self, fetch_page: Callable[[str, int, int], List[Dict]],
+                 queries_by_mood: Dict[str, List[str]], pages: int = 2, page_size: int = 50,
+                 refresh_interval: float = 21600, jitter: float = 0.2,
+                 path: Optional[str] = None,
+                 on_refresh: Optional[Callable[[str, List[Dict]], Any]] = None):
+        """
+        Initialize the pool.
+        
+        Args:
+            fetch_page: fetch_page(query, offset, limit) returning formatted tracks
+            queries_by_mood: Search queries to pool for each mood
+            pages: Result pages fetched per query
+            page_size: Tracks per page (Spotify allows up to 50)
+            refresh_interval: Seconds between refreshes of a mood
+            jitter: Fractional +/- randomization of the refresh interval
+            path: JSON file the pools are persisted to (None disables persistence)
+            on_refresh: on_refresh(mood, tracks) called from the refresher thread with
+                the formatted tracks of each new, adopted or loaded pool
+        """
+        self.fetch_page = fetch_page
+        self.queries_by_mood = queries_by_mood
+        self.pages = max(1, pages)
+        self.page_size = page_size
+        self.refresh_interval = refresh_interval
+        self.jitter = jitter
+        self.path = path
+        self.on_refresh = on_refresh
+        
+        self._pools = {}
+        self._next_refresh = {}
+        self._last_error = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pid = None
+    
+    @classmethod
+    def from_config(cls, fetch_page: Callable[[str, int, int], List[Dict]],
+                    queries_by_mood: Dict[str, List[str]],
+                    on_refresh: Optional[Callable[[str, List[Dict]], Any]] = None) -> 'TrackPool':
+        """Create a pool from the TRACK_POOL_* settings."""
+        return cls(
+            fetch_page,
+            queries_by_mood,
+            pages=Config.TRACK_POOL_PAGES,
+            page_size=Config.TRACK_POOL_PAGE_SIZE,
+            refresh_interval=Config.TRACK_POOL_REFRESH_INTERVAL,
+            jitter=Config.TRACK_POOL_REFRESH_JITTER,
+            path=Config.TRACK_POOL_PATH or None,
+            on_refresh=on_refresh
+        )
+    
+    def start(self):
+        """Load persisted pools and start the refresher thread (once per process)."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Fresh state, also when a forked child inherits a started pool
+            self._pid = os.getpid()
+            self._wake = threading.Event()
+            self._stop = threading.Event()
+        
+        self._load_from_disk()
+        
+        now = time.time()
+        for mood in self.queries_by_mood:
+            pool = self._pools.get(mood)
+            if pool is None:
+                # Stagger the initial fills a little
+                self._next_refresh[mood] = now + random.uniform(0, 1)
+            else:
+                self._next_refresh[mood] = pool['refreshed_at'] + self._jittered_interval()
+        
+        refresher = threading.Thread(target=self._run, name='track-pool-refresher', daemon=True)
+        refresher.start()
+        logger.info(f"Track pool refresher started for {len(self.queries_by_mood)} moods")
+    
+    def stop(self):
+        """Stop the refresher thread."""
+        self._stop.set()
+        self._wake.set()
+    
+    def sample(self, mood: str, count: int = 20) -> Optional[List[Dict]]:
+        """
+        Sample random tracks from a mood's pool.
+        
+        Args:
+            mood: Mood to sample for
+            count: Number of tracks
+            
+        Returns:
+            Formatted tracks, or None if the mood has no pool yet
+        """
+        self.start()
+        
+        pool = self._pools.get(mood)
+        if pool is None or not pool['tracks']:
+            return None
+        
+        tracks = pool['tracks']
+        return [unpack_track(packed) for packed in random.sample(tracks, min(count, len(tracks)))]
+    
+    def refresh(self, mood: str) -> int:
+        """
+        Rebuild one mood's pool from Spotify (blocking).
+        
+        Queries that fail are skipped; if nothing comes back, the old pool is kept.
+        
+        Args:
+            mood: Mood to refresh
+            
+        Returns:
+            Number of tracks in the new pool
+        """
+        started = time.time()
+        seen = set()
+        tracks = []
+        failures = 0
+        
+        for query in self.queries_by_mood[mood]:
+            for page in range(self.pages):
+                try:
+                    page_tracks = self.fetch_page(query, page * self.page_size, self.page_size)
+                except Exception as e:
+                    failures += 1
+                    logger.warning(f"Track pool search failed for {query} (page {page}): {str(e)}")
+                    break
+                
+                for track in page_tracks:
+                    if track['id'] not in seen:
+                        seen.add(track['id'])
+                        tracks.append(pack_track(track))
+                
+                if len(page_tracks) < self.page_size:
+                    break
+        
+        if not tracks:
+            self._last_error[mood] = f'No tracks fetched ({failures} failed searches)'
+            logger.warning(f"Track pool refresh for {mood} returned nothing; keeping the old pool")
+            return len(self._pools.get(mood, {}).get('tracks', ()))
+        
+        self._pools[mood] = {
+            'tracks': tracks,
+            'refreshed_at': time.time(),
+            'failed_searches': failures
+        }
+        self._last_error[mood] = None
+        self._save_to_disk()
+        self._notify(mood)
+        
+        logger.info(f"Track pool for {mood}: {len(tracks)} tracks in {time.time() - started:.1f}s")
+        return len(tracks)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-mood pool size and staleness."""
+        now = time.time()
+        moods = {}
+        
+        for mood in self.queries_by_mood:
+            pool = self._pools.get(mood)
+            next_refresh = self._next_refresh.get(mood)
+            age = now - pool['refreshed_at'] if pool else None
+            moods[mood] = {
+                'size': len(pool['tracks']) if pool else 0,
+                'refreshed_at': pool['refreshed_at'] if pool else None,
+                'age_seconds': age,
+                'stale': age is None or age > self.refresh_interval * (1 + self.jitter),
+                'failed_searches': pool['failed_searches'] if pool else None,
+                'next_refresh_in': max(0.0, next_refresh - now) if next_refresh else None,
+                'last_error': self._last_error.get(mood)
+            }
+        
+        return {
+            'running': self._pid == os.getpid() and not self._stop.is_set(),
+            'refresh_interval': self.refresh_interval,
+            'path': self.path,
+            'moods': moods
+        }
+    
+    def _run(self):
+        """Refresher loop: refresh moods as they come due, then sleep until the next one."""
+        # Pools loaded from disk haven't been announced yet
+        for mood in list(self._pools):
+            self._notify(mood)
+        
+        while not self._stop.is_set():
+            now = time.time()
+            due = [mood for mood, at in self._next_refresh.items() if at <= now]
+            
+            for mood in due:
+                if self._stop.is_set():
+                    return
+                if not self._adopt_fresher_pool(mood):
+                    try:
+                        self.refresh(mood)
+                    except Exception as e:
+                        self._last_error[mood] = str(e)
+                        logger.error(f"Track pool refresh for {mood} failed: {str(e)}")
+                self._next_refresh[mood] = time.time() + self._jittered_interval()
+            
+            wait = min(self._next_refresh.values(), default=now + self.refresh_interval) - time.time()
+            self._wake.wait(timeout=max(0.0, wait))
+            self._wake.clear()
+    
+    def _jittered_interval(self) -> float:
+        return self.refresh_interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+    
+    def _adopt_fresher_pool(self, mood: str) -> bool:
+        """Take a mood's pool from disk if another process refreshed it recently."""
+        if not self.path:
+            return False
+        
+        persisted = self._read_file().get(mood)
+        current = self._pools.get(mood)
+        if persisted is None or (current and persisted['refreshed_at'] <= current['refreshed_at']):
+            return False
+        if time.time() - persisted['refreshed_at'] > self.refresh_interval * (1 - self.jitter):
+            return False
+        
+        self._pools[mood] = persisted
+        logger.info(f"Adopted persisted track pool for {mood} ({len(persisted['tracks'])} tracks)")
+        self._notify(mood)
+        return True
+    
+    def _notify(self, mood: str):
+        """Hand a mood's current tracks to the on_refresh callback."""
+        if self.on_refresh is None:
+            return
+        try:
+            self.on_refresh(mood, [unpack_track(packed) for packed in self._pools[mood]['tracks']])
+        except Exception as e:
+            logger.warning(f"Track pool refresh callback failed for {mood}: {str(e)}")
+    
+    def _load_from_disk(self):
+        """Load persisted pools for the configured moods."""
+        for mood, pool in self._read_file().items():
+            if mood in self.queries_by_mood:
+                self._pools[mood] = pool
+        
+        if self._pools:
+            logger.info(f"Loaded track pools for {len(self._pools)} moods from {self.path}")
+    
+    def _read_file(self) -> Dict[str, Dict[str, Any]]:
+        """Read the pool file; returns {} if it is missing or unreadable."""
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read track pool file {self.path}: {str(e)}")
+            return {}
+        
+        if data.get('version') != POOL_FILE_VERSION or tuple(data.get('fields', ())) != TRACK_FIELDS:
+            return {}
+        
+        return {
+            mood: {
+                'tracks': [tuple(track) for track in pool['tracks']],
+                'refreshed_at': pool['refreshed_at'],
+                'failed_searches': pool.get('failed_searches', 0)
+            }
+            for mood, pool in data.get('moods', {}).items()
+        }
+    
+    def _save_to_disk(self):
+        """
+        Persist all pools atomically (write a temp file, then rename).
+        
+        Moods another process saved more recently are kept rather than
+        overwritten with this process's older copy.
+        """
+        if not self.path:
+            return
+        
+        moods = self._read_file()
+        for mood, pool in list(self._pools.items()):
+            if mood not in moods or pool['refreshed_at'] >= moods[mood]['refreshed_at']:
+                moods[mood] = pool
+        
+        data = {
+            'version': POOL_FILE_VERSION,
+            'fields': TRACK_FIELDS,
+            'moods': moods
+        }
+        
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not persist track pool to {self.path}: {str(e)}")
@@ -0,0 +1,8 @@
+"""
+ASGI application entry point.
+
+Usage: uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+from app.asgi import create_asgi_app
+
+app = create_asgi_app()
@@ -0,0 +1,105 @@
+"""
+Benchmark upload decoding.
+
+Compares the original decode (full-resolution ``Image.open`` + ``np.array``)
+with decode_image(), which decodes JPEGs at reduced scale and caps the working
+resolution. Latency is measured in-process; peak memory is measured in a fresh
+subprocess per variant as the growth of peak RSS across the decode.
+
+Usage: python -m benchmarks.bench_decode [--image PATH] [--runs N]
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from app.services.image_decoder import decode_image
+from benchmarks.fixtures import encode_jpeg, synthetic_frame
+from benchmarks.memory import read_peak_rss_mb, reset_peak_rss
+
+
+def old_decode(data):
+    """The decode path as it was in routes.detect_mood."""
+    image = Image.open(io.BytesIO(data))
+    return np.array(image)
+
+
+VARIANTS = {
+    'old': old_decode,
+    'new': decode_image
+}
+
+
+def load_sample(image_path, width, height):
+    """Read the sample upload, or synthesize a phone-sized JPEG."""
+    if image_path:
+        with open(image_path, 'rb') as f:
+            return f.read()
+    return encode_jpeg(synthetic_frame(width, height), orientation=6)
+
+
+def measure_memory(variant, image_path):
+    """Child-process entry: report peak RSS growth (MB) caused by one decode."""
+    with open(image_path, 'rb') as f:
+        data = f.read()
+    reset_peak_rss()
+    before = read_peak_rss_mb()
+    image_array = VARIANTS[variant](data)
+    after = read_peak_rss_mb()
+    print(json.dumps({
+        'peak_rss_growth_mb': after - before,
+        'shape': list(image_array.shape),
+        'array_mb': image_array.nbytes / (1024.0 * 1024.0)
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', help='JPEG file to decode instead of a synthetic 12MP photo')
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--memory-child', choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.memory_child:
+        measure_memory(args.memory_child, args.image)
+        return
+    
+    data = load_sample(args.image, args.width, args.height)
+    print(f"Upload: {len(data) / 1024.0:.0f} KB")
+    
+    # Memory children read the upload from disk so generating it doesn't inflate their peak RSS
+    with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as sample_file:
+        sample_file.write(data)
+    
+    for variant, decode in VARIANTS.items():
+        decode(data)
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            decode(data)
+            timings.append((time.perf_counter() - start) * 1000)
+        
+        command = [sys.executable, '-m', 'benchmarks.bench_decode', '--memory-child', variant,
+                   '--image', sample_file.name]
+        child = subprocess.run(command, capture_output=True, text=True, check=True)
+        memory = json.loads(child.stdout.strip().splitlines()[-1])
+        
+        print(f"  {variant:<4} mean {statistics.mean(timings):7.1f} ms   p50 {statistics.median(timings):7.1f} ms"
+              f"   output {tuple(memory['shape'])} {memory['array_mb']:.1f} MB"
+              f"   peak RSS +{memory['peak_rss_growth_mb']:.1f} MB")
+    
+    os.unlink(sample_file.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Measure the overhead of the latency metrics.
+
+Times the individual metric operations (single-threaded and with several
+threads contending for the same histogram), then decodes a webcam-sized
+JPEG with metrics enabled and disabled, and estimates the cost per
+/detect-mood request from the number of metric updates it makes.
+
+Usage (from backend/): python -m benchmarks.bench_metrics [--ops 200000] [--threads 4] [--runs 200]
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from app.services.image_decoder import decode_image
+from app.services.metrics import DETECTIONS, STAGE_SECONDS, count, stage_timer
+from benchmarks.fixtures import encode_jpeg, synthetic_frame
+from config.settings import Config
+
+# Metric updates made by one /detect-mood request: upload_read, decode, to_array,
+# color_convert, face_detect, classify, the outcome counter and the request histogram/counter
+UPDATES_PER_DETECT_REQUEST = 9
+
+
+def ns_per_op(fn, ops):
+    start = time.perf_counter()
+    for _ in range(ops):
+        fn()
+    return (time.perf_counter() - start) / ops * 1e9
+
+
+def contended_ns_per_op(fn, ops, threads):
+    """Wall time per operation with `threads` threads each running ops/threads of them."""
+    per_thread = ops // threads
+    
+    def run():
+        for _ in range(per_thread):
+            fn()
+    
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e9
+
+
+def timed_stage():
+    with stage_timer('bench'):
+        pass
+
+
+def decode_p50_ms(data, runs):
+    decode_image(data)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        decode_image(data)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ops', type=int, default=200000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+    
+    Config.METRICS_ENABLED = True
+    observe_ns = ns_per_op(lambda: STAGE_SECONDS.observe(0.0123, 'bench'), args.ops)
+    timer_ns = ns_per_op(timed_stage, args.ops)
+    counter_ns = ns_per_op(lambda: count(DETECTIONS, 'bench'), args.ops)
+    contended_ns = contended_ns_per_op(lambda: STAGE_SECONDS.observe(0.0123, 'bench'), args.ops, args.threads)
+    
+    Config.METRICS_ENABLED = False
+    disabled_ns = ns_per_op(timed_stage, args.ops)
+    
+    print("Metric operations:")
+    print(f"  histogram.observe            {observe_ns:7.0f} ns")
+    print(f"  stage_timer (with-block)     {timer_ns:7.0f} ns")
+    print(f"  counter increment            {counter_ns:7.0f} ns")
+    print(f"  observe, {args.threads} threads contending {contended_ns:7.0f} ns")
+    print(f"  stage_timer, metrics off     {disabled_ns:7.0f} ns")
+    
+    jpeg = encode_jpeg(synthetic_frame(640, 480))
+    Config.METRICS_ENABLED = False
+    off_ms = decode_p50_ms(jpeg, args.runs)
+    Config.METRICS_ENABLED = True
+    on_ms = decode_p50_ms(jpeg, args.runs)
+    print(f"decode_image 640x480 JPEG p50: metrics off {off_ms:.3f} ms, on {on_ms:.3f} ms")
+    
+    per_request_us = UPDATES_PER_DETECT_REQUEST * timer_ns / 1000
+    print(f"Estimated metrics cost per /detect-mood request: {per_request_us:.1f} us "
+          f"({per_request_us / 100:.2f}% of a 10 ms request)")
+
+
+if __name__ == '__main__':
+    main()
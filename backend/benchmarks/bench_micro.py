@@ -0,0 +1,88 @@
+"""
+Microbenchmarks of the detection and track-formatting hot paths.
+
+Runs EmotionDetector.detect_emotion and _fallback_detection on fixed
+synthetic frames (a drawn face and a face-free frame at webcam and HD
+sizes) and SpotifyService._format_tracks on a fixed 50-track search
+response, and prints the latency summary of each as JSON.
+
+detect_emotion needs DeepFace/TensorFlow; without them every call ends in
+the fallback path, which the 'outcomes' field makes visible.
+
+Usage (from backend/): python -m benchmarks.bench_micro [--runs 50] [--output results.json]
+"""
+import argparse
+import time
+from collections import Counter
+
+from app.services.emotion_detector import EmotionDetector
+from app.services.spotify_service import SpotifyService
+from benchmarks.fixtures import search_response, synthetic_face, synthetic_frame
+from benchmarks.memory import read_peak_rss_mb
+from benchmarks.results import summarize, write_results
+
+FRAMES = {
+    'face_640x480': lambda: synthetic_face(640, 480),
+    'face_1280x720': lambda: synthetic_face(1280, 720),
+    'no_face_640x480': lambda: synthetic_frame(640, 480)
+}
+
+
+def outcome(result):
+    if result.get('fallback'):
+        return 'fallback'
+    if result['error']:
+        return 'no_face' if result.get('faces') == [] else 'failed'
+    return 'model'
+
+
+def time_calls(fn, runs):
+    """Latencies (ms) of `runs` calls after one untimed call, plus the results."""
+    fn()
+    timings = []
+    results = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        results.append(fn())
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--format-runs', type=int, default=1000)
+    parser.add_argument('--output', help='Write the JSON results to this file')
+    args = parser.parse_args()
+    
+    detector = EmotionDetector(batching=False)
+    warm_start = time.perf_counter()
+    model_ready = detector.warmup()
+    warmup_s = time.perf_counter() - warm_start
+    
+    results = {'warmup': {'model_ready': model_ready, 'seconds': round(warmup_s, 3)}}
+    
+    for name, make_frame in FRAMES.items():
+        frame = make_frame()
+        
+        timings, detections = time_calls(lambda: detector.detect_emotion(frame), args.runs)
+        results[f'detect_emotion/{name}'] = {
+            **summarize(timings),
+            'outcomes': dict(Counter(outcome(result) for result in detections))
+        }
+        
+        timings, _ = time_calls(lambda: detector._fallback_detection(frame), args.runs)
+        results[f'fallback_detection/{name}'] = summarize(timings)
+    
+    service = SpotifyService()
+    items = search_response(count=50)['tracks']['items']
+    timings, formatted = time_calls(lambda: service._format_tracks(items), args.format_runs)
+    results['format_tracks/50'] = {**summarize(timings), 'tracks': len(formatted[-1])}
+    
+    results['peak_rss_mb'] = round(read_peak_rss_mb(), 1)
+    
+    write_results('micro', {'runs': args.runs, 'format_runs': args.format_runs}, results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark the playlist search fan-out against the local Spotify stub.
+
+Compares the original sequential searches with the concurrent fan-out, both
+at the default width (2 genres + 2 keywords) and widened to every genre and
+keyword configured for the mood, then shows a deadline shorter than the
+injected latency producing a partial result, and finally the same playlist
+served from a warm shared search cache. The stub adds latency plus random
+jitter to every request.
+
+Usage (from backend/): python -m benchmarks.bench_search_fanout [--latency-ms 100] [--jitter-ms 50] [--runs 10]
+"""
+import argparse
+import logging
+import statistics
+import time
+
+from app.services.spotify_service import SpotifyService
+from benchmarks.fake_spotify import FakeSpotify
+from config.settings import Config
+
+
+def old_search_tracks_by_mood(service, sp, mood_config):
+    """The searches as they ran before the fan-out: four sequential round trips."""
+    tracks = {}
+    for genre in mood_config['genres'][:2]:
+        results = sp.search(q=f'genre:"{genre}"', type='track', limit=10)
+        tracks.update((track['id'], track) for track in service._format_tracks(results['tracks']['items']))
+    for keyword in mood_config['keywords'][:2]:
+        results = sp.search(q=f'"{keyword}"', type='track', limit=10)
+        tracks.update((track['id'], track) for track in service._format_tracks(results['tracks']['items']))
+    return list(tracks.values())[:20], 0
+
+
+def time_calls(fn, runs, settle=0.0):
+    """Run fn and return per-call latencies in milliseconds plus the last result."""
+    result = fn()
+    timings = []
+    for _ in range(runs):
+        time.sleep(settle)
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, result
+
+
+def report(label, timings, searches, tracks, missed):
+    print(f"  {label:<26} searches {searches:3d}   mean {statistics.mean(timings):7.1f} ms   "
+          f"p50 {statistics.median(timings):7.1f} ms   tracks {len(tracks):3d}   missed {missed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency-ms', type=float, default=100.0)
+    parser.add_argument('--jitter-ms', type=float, default=50.0)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--mood', default='happy')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.ERROR)
+    stub = FakeSpotify(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms).start()
+    Config.SPOTIFY_API_URL = stub.url
+    
+    # The fan-out rows measure Spotify round trips, so start without the search cache
+    # and don't let the rate limiter space the requests out
+    Config.SEARCH_CACHE_ENABLED = False
+    Config.SPOTIFY_RATE_LIMIT = 10000
+    Config.SPOTIFY_RATE_BURST = 10000
+    
+    try:
+        service = SpotifyService()
+        sp = service.get_client('stub-token', time.time() + 3600)
+        mood_config = service.mood_queries[args.mood]
+        total_searches = len(mood_config['genres']) + len(mood_config['keywords'])
+        
+        print(f"Injected latency {args.latency_ms:.0f} ms + up to {args.jitter_ms:.0f} ms jitter per request")
+        
+        timings, (tracks, missed) = time_calls(lambda: old_search_tracks_by_mood(service, sp, mood_config), args.runs)
+        report('sequential (old)', timings, 4, tracks, missed)
+        
+        timings, (tracks, missed) = time_calls(lambda: service._search_tracks_by_mood(sp, mood_config), args.runs)
+        report('concurrent', timings, 4, tracks, missed)
+        
+        Config.SPOTIFY_SEARCH_GENRES = 0
+        Config.SPOTIFY_SEARCH_KEYWORDS = 0
+        timings, (tracks, missed) = time_calls(lambda: service._search_tracks_by_mood(sp, mood_config), args.runs)
+        report('concurrent, all queries', timings, total_searches, tracks, missed)
+        
+        # Near the top of the jitter window (client overhead eats the rest), so only
+        # some searches make it; let abandoned searches finish between runs
+        deadline = (args.latency_ms + args.jitter_ms) / 1000.0
+        timings, (tracks, missed) = time_calls(
+            lambda: service._search_tracks_by_mood(sp, mood_config, deadline=deadline), args.runs,
+            settle=deadline)
+        report(f'deadline {deadline * 1000:.0f} ms', timings, total_searches, tracks, missed)
+        
+        Config.SEARCH_CACHE_ENABLED = True
+        cached_service = SpotifyService()
+        time.sleep(deadline)  # let abandoned searches from the deadline run finish
+        stub.reset_counters()
+        timings, (tracks, missed) = time_calls(
+            lambda: cached_service._search_tracks_by_mood(sp, mood_config), args.runs)
+        report('search cache (warm)', timings, total_searches, tracks, missed)
+        print(f"  Spotify requests for {args.runs + 1} cached playlists: {stub.get_stats()['requests']}")
+    finally:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark nearest-neighbour ranking in the audio-feature track index.
+
+Loads the offline fixture, shows the top matches for a blended emotion
+vector, then times ranking synthetic indexes of increasing size against a
+per-track Python loop.
+
+Usage (from backend/): python -m benchmarks.bench_track_index [--fixture PATH] [--runs 20]
+"""
+import argparse
+import math
+import os
+import statistics
+import time
+
+import numpy as np
+
+from app.services.track_index import AUDIO_FEATURES, TrackIndex, blend_targets, target_from_mood
+from benchmarks.make_track_fixture import DEFAULT_OUTPUT
+
+MOOD_FEATURES = {
+    'happy': {'target_valence': 0.8, 'target_energy': 0.8, 'target_danceability': 0.7},
+    'neutral': {'target_valence': 0.5, 'target_energy': 0.4, 'target_acousticness': 0.5}
+}
+
+
+def synthetic_features(count, seed=0):
+    """Random audio-feature objects shaped like Spotify's."""
+    rng = np.random.default_rng(seed)
+    values = rng.random((count, len(AUDIO_FEATURES)))
+    return [
+        {
+            'id': f'synthetic{i:08d}',
+            **{name: float(v) for name, v in zip(AUDIO_FEATURES, row)},
+            'loudness': -60.0 + 60.0 * float(row[5]),
+            'tempo': 50.0 + 150.0 * float(row[6])
+        }
+        for i, row in enumerate(values)
+    ]
+
+
+def python_rank(index, target, weights, k):
+    """Rank by looping over tracks one at a time, for comparison."""
+    weight_sum = float(sum(weights))
+    scored = []
+    for track_id in index._ids:
+        vector = index.get_vector(track_id)
+        distance = math.sqrt(sum(w * (v - t) ** 2 for v, t, w in zip(vector, target, weights)) / weight_sum)
+        scored.append((distance, track_id))
+    scored.sort()
+    return scored[:k]
+
+
+def time_calls(fn, runs):
+    fn()
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixture', default=DEFAULT_OUTPUT)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+    
+    targets = {mood: target_from_mood(features) for mood, features in MOOD_FEATURES.items()}
+    target, weights = blend_targets(targets, {'happy': 0.6, 'neutral': 0.4})
+    
+    if os.path.exists(args.fixture):
+        index = TrackIndex.from_fixture(args.fixture)
+        print(f"Fixture: {len(index)} tracks; nearest to 60% happy / 40% neutral:")
+        for track_id, distance in index.query(target, weights, k=5):
+            print(f"  {distance:.3f}  {index.get_track(track_id)['name']}")
+    
+    for size in (1000, 10000, 100000):
+        index = TrackIndex(capacity=size)
+        index.bulk_load(synthetic_features(size))
+        
+        vectorized = time_calls(lambda: index.query(target, weights, k=20), args.runs)
+        line = f"{size:>7} tracks   index.query p50 {statistics.median(vectorized):8.3f} ms"
+        if size <= 10000:
+            loop = time_calls(lambda: python_rank(index, target, weights, 20), max(1, args.runs // 4))
+            line += f"   python loop p50 {statistics.median(loop):8.1f} ms"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Compare connection reuse and timing of per-request and pooled Spotify clients.
+
+Runs the playlist path repeatedly against the local Spotify stub, once with
+a fresh spotipy client per request (the old behaviour) and once through
+SpotifyService's shared session, and reports requests, TCP connections
+opened and elapsed time. tests/test_spotify_session.py asserts the reuse.
+
+Usage (from backend/): python -m benchmarks.check_connection_reuse [--requests 20]
+"""
+import argparse
+import time
+
+import spotipy
+
+from app.services.spotify_service import SpotifyService
+from benchmarks.fake_spotify import FakeSpotify
+from config.settings import Config
+
+
+def run_old(stub, requests_count):
+    for _ in range(requests_count):
+        client = spotipy.Spotify(auth='stub-token')
+        client.prefix = stub.url
+        client.search(q='genre:pop', type='track', limit=10)
+        client.current_user()
+
+
+def run_new(service, requests_count):
+    expires_at = int(time.time()) + 3600
+    for _ in range(requests_count):
+        client = service.get_client('stub-token', expires_at)
+        client.search(q='genre:pop', type='track', limit=10)
+        client.current_user()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args()
+    
+    stub = FakeSpotify().start()
+    Config.SPOTIFY_API_URL = stub.url
+    
+    try:
+        for label, run in (('per-request client', lambda: run_old(stub, args.requests)),
+                           ('pooled client', lambda: run_new(SpotifyService(), args.requests))):
+            stub.reset_counters()
+            started = time.perf_counter()
+            run()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            stats = stub.get_stats()
+            print(f"{label:20s} requests {stats['requests']:4d}   connections {stats['connections']:4d}   "
+                  f"{elapsed_ms:8.1f} ms")
+    finally:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
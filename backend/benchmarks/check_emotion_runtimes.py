@@ -0,0 +1,182 @@
+"""
+Check exported emotion models against the TensorFlow original.
+
+Runs the same face crops through the tensorflow runtime and each exported
+runtime and compares the class probabilities: largest absolute difference,
+mean absolute difference and top-1 agreement (overall, per predicted
+class, and on the faces the original is decisive about, where the top two
+classes are more than `--margin` apart: a near-tie can legitimately flip
+under quantization). Also measures inference latency at batch sizes 1 and
+EMOTION_BATCH_SIZE, and the peak RSS and TensorFlow import of a fresh
+process that loads only that runtime. The report is printed as JSON; the
+script exits non-zero when a runtime is outside the tolerances.
+
+The default tolerances allow for float reordering in ONNX Runtime (every
+probability within 1e-4, the same label for every face) and for int8
+rounding in the quantized TFLite model (probabilities within 0.03 on
+average, the same label for 95% of decisive faces and 90% of all faces).
+A run with no decisive faces fails, since label agreement can't be
+checked on it.
+
+Usage (from backend/): python -m benchmarks.check_emotion_runtimes [--model-dir models/]
+    [--runtimes onnx,tflite] [--images DIR] [--faces 200] [--output results.json]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from app.services.emotion_detector import EMOTION_INPUT_SIZE, EMOTION_LABELS
+from app.services.emotion_runtime import load_emotion_model
+from benchmarks.fixtures import face_tensors
+from benchmarks.results import summarize, write_results
+from config.settings import Config
+
+# Upper bounds on probability differences and lower bounds on agreement, per runtime
+TOLERANCES = {
+    'onnx': {'max_abs_diff': 1e-4, 'top1_agreement': 1.0, 'top1_agreement_decisive': 1.0},
+    'tflite': {'mean_abs_diff': 0.03, 'top1_agreement': 0.9, 'top1_agreement_decisive': 0.95}
+}
+
+CHILD_CODE = '''
+import json, sys
+import numpy as np
+from app.services.emotion_runtime import load_emotion_model
+model = load_emotion_model(sys.argv[1], sys.argv[2] or None)
+model.predict(np.zeros((int(sys.argv[3]), 48, 48, 1), dtype=np.float32))
+from benchmarks.memory import read_peak_rss_mb
+print(json.dumps({
+    "peak_rss_mb": read_peak_rss_mb(),
+    "tensorflow_imported": "tensorflow" in sys.modules
+}))
+'''
+
+
+def predict_all(model, faces, batch_size):
+    return np.concatenate([
+        model.predict(faces[start:start + batch_size]) for start in range(0, len(faces), batch_size)
+    ])
+
+
+def compare(reference, candidate, margin):
+    """Agreement of a runtime's probabilities with the reference's."""
+    difference = np.abs(reference - candidate)
+    reference_top = reference.argmax(axis=1)
+    candidate_top = candidate.argmax(axis=1)
+    top_two = np.sort(reference, axis=1)[:, -2:]
+    decisive = top_two[:, 1] - top_two[:, 0] > margin
+    return {
+        'max_abs_diff': float(difference.max()),
+        'mean_abs_diff': float(difference.mean()),
+        'top1_agreement': float(np.mean(reference_top == candidate_top)),
+        'decisive_faces': int(decisive.sum()),
+        'top1_agreement_decisive': float(np.mean(reference_top[decisive] == candidate_top[decisive]))
+        if decisive.any() else None,
+        'top1_agreement_by_label': {
+            EMOTION_LABELS[label]: round(float(np.mean(candidate_top[reference_top == label] == label)), 4)
+            for label in np.unique(reference_top)
+        }
+    }
+
+
+def check_tolerances(runtime, result, bounds):
+    """Failure messages for the measurements of `result` outside `bounds`."""
+    failures = []
+    for measurement, bound in bounds.items():
+        value = result[measurement]
+        if value is None:
+            failures.append(f"{runtime}: no decisive faces to check {measurement} on")
+        elif measurement.startswith('top1') and value < bound:
+            failures.append(f"{runtime}: {measurement} {value:.4g} < {bound}")
+        elif not measurement.startswith('top1') and value > bound:
+            failures.append(f"{runtime}: {measurement} {value:.4g} > {bound}")
+    return failures
+
+
+def time_batches(model, faces, batch_size, runs):
+    """Latencies (ms) of `runs` predictions on one batch, after an untimed one."""
+    batch = faces[:batch_size]
+    model.predict(batch)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model.predict(batch)
+        timings.append((time.perf_counter() - start) * 1000)
+    return summarize(timings)
+
+
+def measure_process(runtime, model_dir, batch_size):
+    """Load one runtime in a fresh interpreter and report its memory."""
+    child = subprocess.run(
+        [sys.executable, '-c', CHILD_CODE, runtime, model_dir or '', str(batch_size)],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(child.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-dir', default=Config.EMOTION_MODEL_PATH)
+    parser.add_argument('--runtimes', default='onnx,tflite')
+    parser.add_argument('--images', help='Directory of face photos to check on (default: synthetic faces)')
+    parser.add_argument('--faces', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=50, help='Timed predictions per batch size')
+    parser.add_argument('--tolerance', action='append', default=[], metavar='RUNTIME.MEASUREMENT=VALUE',
+                        help='Override a tolerance, e.g. --tolerance tflite.mean_abs_diff=0.05')
+    parser.add_argument('--margin', type=float, default=0.1,
+                        help='Top-two probability gap above which a face counts as decisive')
+    parser.add_argument('--output', help='Write the JSON results to this file')
+    args = parser.parse_args()
+    
+    tolerances = {runtime: dict(bounds) for runtime, bounds in TOLERANCES.items()}
+    for item in args.tolerance:
+        name, _, value = item.partition('=')
+        runtime, _, measurement = name.partition('.')
+        tolerances[runtime][measurement] = float(value)
+    
+    faces = face_tensors(args.faces, image_dir=args.images)
+    batch_sizes = sorted({1, Config.EMOTION_BATCH_SIZE})
+    runtimes = args.runtimes.split(',')
+    
+    reference_model = load_emotion_model('tensorflow')
+    reference = predict_all(reference_model, faces, Config.EMOTION_BATCH_SIZE)
+    
+    results = {'faces': len(faces), 'runtimes': {}}
+    failures = []
+    for runtime in ['tensorflow'] + runtimes:
+        model = reference_model if runtime == 'tensorflow' else load_emotion_model(runtime, args.model_dir)
+        result = {
+            'latency_by_batch': {
+                str(batch_size): time_batches(model, faces, batch_size, args.runs) for batch_size in batch_sizes
+            },
+            'process': measure_process(runtime, args.model_dir, Config.EMOTION_BATCH_SIZE)
+        }
+        
+        if runtime != 'tensorflow':
+            result.update(compare(reference, predict_all(model, faces, Config.EMOTION_BATCH_SIZE), args.margin))
+            failures.extend(check_tolerances(runtime, result, tolerances[runtime]))
+        
+        results['runtimes'][runtime] = result
+    
+    parameters = {
+        'runtimes': runtimes,
+        'faces': args.faces,
+        'images': args.images,
+        'runs': args.runs,
+        'margin': args.margin,
+        'tolerances': tolerances,
+        'threads': Config.EMOTION_RUNTIME_THREADS,
+        'input_size': EMOTION_INPUT_SIZE
+    }
+    write_results('emotion_runtimes', parameters, results, args.output)
+    
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare two benchmark result files.
+
+Prints every numeric measurement present in both runs with its relative
+change, after warning about any parameter that differs between them.
+
+Usage (from backend/): python -m benchmarks.compare BASELINE.json CANDIDATE.json [--filter p95]
+"""
+import argparse
+import json
+
+
+def flatten(value, prefix=''):
+    """{'a': {'b': 1}} -> {'a.b': 1}, keeping numeric leaves only."""
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(flatten(item, f'{prefix}.{key}' if prefix else str(key)))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: value}
+    return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--filter', default='', help='Only show measurements whose name contains this')
+    args = parser.parse_args()
+    
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    
+    if baseline.get('suite') != candidate.get('suite'):
+        print(f"warning: comparing suite {baseline.get('suite')} with {candidate.get('suite')}")
+    for key in sorted(set(baseline.get('parameters', {})) | set(candidate.get('parameters', {}))):
+        old, new = baseline['parameters'].get(key), candidate['parameters'].get(key)
+        if old != new:
+            print(f"warning: parameter {key} differs: {old} -> {new}")
+    
+    old_results = flatten(baseline.get('results', {}))
+    new_results = flatten(candidate.get('results', {}))
+    names = [name for name in old_results if name in new_results and args.filter in name]
+    
+    width = max((len(name) for name in names), default=10)
+    print(f"{'measurement':<{width}}  {'baseline':>12}  {'candidate':>12}  {'change':>8}")
+    for name in names:
+        old, new = old_results[name], new_results[name]
+        change = f'{(new - old) / old:+.1%}' if old else 'n/a'
+        print(f"{name:<{width}}  {old:>12.3f}  {new:>12.3f}  {change:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Export DeepFace's emotion CNN for the ONNX and TFLite runtimes.
+
+Builds the Keras model through DeepFace (as the tensorflow runtime does)
+and writes:
+  
+  emotion.onnx          float32 model for EMOTION_RUNTIME=onnx (via tf2onnx)
+  emotion_int8.tflite   fully int8-quantized model for EMOTION_RUNTIME=tflite
+
+into `--output-dir` (EMOTION_MODEL_PATH by default). Both take a dynamic
+batch of (48, 48, 1) faces. The int8 model is calibrated on `--calibration`
+face crops, from `--images` if given (recommended: a few hundred real face
+photos) or from synthetic faces otherwise. Check the exported models with
+benchmarks.check_emotion_runtimes before deploying them.
+
+Needs TensorFlow, DeepFace and tf2onnx (pip install tf2onnx); run it once
+where those are installed and ship the files to the workers.
+
+Usage (from backend/): python -m benchmarks.convert_emotion_model [--output-dir models/]
+    [--images DIR] [--calibration 200] [--formats onnx,tflite]
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from app.services.emotion_detector import EMOTION_INPUT_SIZE, _deepface
+from app.services.emotion_runtime import DEFAULT_MODEL_FILES
+from benchmarks.fixtures import face_tensors
+from config.settings import Config
+
+ONNX_OPSET = 13
+
+
+def model_function(model):
+    """The Keras model as a tf.function over a dynamic batch of faces."""
+    import tensorflow as tf
+    
+    @tf.function(input_signature=[tf.TensorSpec(
+        (None, EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE, 1), tf.float32, name='faces'
+    )])
+    def predict(faces):
+        return model(faces, training=False)
+    
+    return predict
+
+
+def export_onnx(model, path):
+    import tf2onnx
+    
+    function = model_function(model)
+    tf2onnx.convert.from_function(
+        function, input_signature=function.input_signature, opset=ONNX_OPSET, output_path=path
+    )
+
+
+def export_tflite_int8(model, path, calibration):
+    """Full-integer quantization (int8 weights, activations, input and output)."""
+    import tensorflow as tf
+    
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = lambda: ([face[np.newaxis]] for face in calibration)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    tflite_model = converter.convert()
+    
+    with open(path, 'wb') as f:
+        f.write(tflite_model)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output-dir', default=Config.EMOTION_MODEL_PATH)
+    parser.add_argument('--images', help='Directory of face photos to calibrate the int8 model on')
+    parser.add_argument('--calibration', type=int, default=200, help='Number of calibration faces')
+    parser.add_argument('--formats', default='onnx,tflite')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    model = _deepface().build_model('Emotion')
+    os.makedirs(args.output_dir, exist_ok=True)
+    
+    written = {}
+    for model_format in args.formats.split(','):
+        path = os.path.join(args.output_dir, DEFAULT_MODEL_FILES[model_format])
+        if model_format == 'onnx':
+            export_onnx(model, path)
+        else:
+            calibration = face_tensors(args.calibration, image_dir=args.images, seed=args.seed)
+            export_tflite_int8(model, path, calibration)
+        written[model_format] = {'path': path, 'size_mb': round(os.path.getsize(path) / 1024 / 1024, 2)}
+    
+    print(json.dumps(written, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+Local stub of the Spotify Web API for benchmarks and load tests.
+
+Serves deterministic fake data for the endpoints the backend uses
+(search, current user, audio features, token exchange and refresh) over
+HTTP/1.1 keep-alive, with optional injected latency and, on the Web API
+paths, 429 responses. It counts requests and TCP connections so
+connection reuse can be verified.
+
+Usage: python -m benchmarks.fake_spotify [--port 8765] [--latency-ms 50] [--jitter-ms 50] [--rate-limit 0.05]
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def fake_track(seed):
+    """A deterministic Spotify track object."""
+    digest = hashlib.sha1(seed.encode('utf-8')).hexdigest()
+    track_id = digest[:22]
+    return {
+        'id': track_id,
+        'name': f'Track {digest[:6]}',
+        'artists': [{'name': f'Artist {digest[6:10]}'}],
+        'album': {
+            'name': f'Album {digest[10:14]}',
+            'images': [{'url': f'https://i.scdn.co/image/{digest[:16]}'}]
+        },
+        'duration_ms': 120000 + int(digest[14:18], 16) % 180000,
+        'explicit': int(digest[18], 16) % 5 == 0,
+        'popularity': int(digest[19:21], 16) % 100,
+        'preview_url': None,
+        'external_urls': {'spotify': f'https://open.spotify.com/track/{track_id}'},
+        'uri': f'spotify:track:{track_id}'
+    }
+
+
+def fake_audio_features(track_id):
+    """Deterministic audio features for a track id."""
+    digest = hashlib.sha1(('features:' + track_id).encode('utf-8')).digest()
+    unit = [byte / 255.0 for byte in digest]
+    return {
+        'id': track_id,
+        'valence': unit[0],
+        'energy': unit[1],
+        'danceability': unit[2],
+        'acousticness': unit[3],
+        'instrumentalness': unit[4],
+        'loudness': -30.0 + 30.0 * unit[5],
+        'tempo': 60.0 + 120.0 * unit[6]
+    }
+
+
+class FakeSpotify:
+    """
+    Threaded stub server.
+    
+    Attributes:
+        latency_ms: Delay added to every response
+        jitter_ms: Extra random delay (uniform 0..jitter_ms) per response
+        rate_limit: Fraction of requests answered with 429 + Retry-After
+        retry_after: Retry-After value (seconds) sent with 429s
+    """
+    
+    def __init__(self, port=0, latency_ms=0.0, jitter_ms=0.0, rate_limit=0.0, retry_after=1, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.throttled = 0
+        
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+    
+    @property
+    def port(self):
+        return self._server.server_address[1]
+    
+    @property
+    def url(self):
+        """Base URL to use as SPOTIFY_API_URL."""
+        return f'http://127.0.0.1:{self.port}/v1/'
+    
+    @property
+    def token_url(self):
+        """URL of the stub accounts token endpoint."""
+        return f'http://127.0.0.1:{self.port}/api/token'
+    
+    def start(self):
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-spotify', daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """Stop serving."""
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def reset_counters(self):
+        with self._lock:
+            self.requests = 0
+            self.connections = 0
+            self.throttled = 0
+    
+    def get_stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'connections': self.connections,
+                'throttled': self.throttled
+            }
+    
+    def _delay(self):
+        with self._lock:
+            jitter = self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+        return (self.latency_ms + jitter) / 1000.0
+    
+    def _should_throttle(self, path):
+        with self._lock:
+            self.requests += 1
+            # The accounts service (token endpoint) has separate limits
+            if self.rate_limit and path.startswith('/v1/') and self._random.random() < self.rate_limit:
+                self.throttled += 1
+                return True
+            return False
+    
+    def _handler_class(self):
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls on keep-alive
+            disable_nagle_algorithm = True
+            
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def do_GET(self):
+                self._respond(self._route_get)
+            
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length).decode('utf-8', 'replace')
+                self.form = {key: values[0] for key, values in parse_qs(body).items()}
+                self._respond(self._route_post)
+            
+            def _respond(self, route):
+                delay = stub._delay()
+                if delay:
+                    time.sleep(delay)
+                
+                if stub._should_throttle(self.path):
+                    self._send(429, {'error': {'status': 429, 'message': 'API rate limit exceeded'}},
+                               {'Retry-After': str(stub.retry_after)})
+                    return
+                
+                url = urlparse(self.path)
+                status, body = route(url._replace(path=url.path.rstrip('/')))
+                self._send(status, body)
+            
+            def _route_get(self, url):
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                
+                if url.path == '/v1/search':
+                    limit = int(params.get('limit', 10))
+                    offset = int(params.get('offset', 0))
+                    query = params.get('q', '')
+                    items = [fake_track(f'{query}:{offset + i}') for i in range(limit)]
+                    return 200, {'tracks': {'items': items, 'limit': limit, 'offset': offset, 'total': 1000}}
+                
+                if url.path == '/v1/me':
+                    return 200, {
+                        'id': 'stub-user',
+                        'display_name': 'Stub User',
+                        'email': 'stub@example.com',
+                        'followers': {'total': 0},
+                        'country': 'US',
+                        'product': 'premium'
+                    }
+                
+                if url.path == '/v1/audio-features':
+                    ids = [track_id for track_id in params.get('ids', '').split(',') if track_id]
+                    return 200, {'audio_features': [fake_audio_features(track_id) for track_id in ids]}
+                
+                return 404, {'error': {'status': 404, 'message': 'Not found'}}
+            
+            def _route_post(self, url):
+                if url.path == '/api/token':
+                    token = {
+                        'access_token': 'stub-access-' + hashlib.sha1(str(time.time()).encode()).hexdigest()[:12],
+                        'token_type': 'Bearer',
+                        'expires_in': 3600,
+                        'scope': ''
+                    }
+                    if self.form.get('grant_type') == 'authorization_code':
+                        token['refresh_token'] = 'stub-refresh-' + token['access_token'][-12:]
+                    return 200, token
+                return 404, {'error': {'status': 404, 'message': 'Not found'}}
+            
+            def _send(self, status, body, headers=None):
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+        
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=0.0)
+    args = parser.parse_args()
+    
+    stub = FakeSpotify(port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                       rate_limit=args.rate_limit)
+    print(f"Fake Spotify API at {stub.url} (set SPOTIFY_API_URL to this)")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Synthetic fixtures shared by the benchmarks.
+"""
+import io
+import os
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from benchmarks.fake_spotify import fake_track
+
+
+def synthetic_frame(width, height, seed=0):
+    """A smooth random RGB frame standing in for a camera image."""
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, size=(max(1, height // 8), max(1, width // 8), 3), dtype=np.uint8)
+    return cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+
+
+def encode_jpeg(image_array, quality=90, orientation=None):
+    """Encode an RGB array as JPEG bytes, optionally tagging an EXIF orientation."""
+    image = Image.fromarray(image_array)
+    buffer = io.BytesIO()
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        image.save(buffer, format='JPEG', quality=quality, exif=exif.tobytes())
+    else:
+        image.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def synthetic_face(width, height, scale=0.3):
+    """
+    A frame with a drawn frontal face (hair, eyes, brows, nose, mouth).
+    
+    Crude, but the Haar cascade detects it at any of the usual camera sizes,
+    so the face-found paths run without shipping photos of people.
+    """
+    image = np.full((height, width, 3), 170, dtype=np.uint8)
+    cx, cy = width // 2, height // 2
+    r = int(min(width, height) * scale)
+    
+    cv2.ellipse(image, (cx, cy - int(r * 0.35)), (int(r * 0.85), int(r * 0.8)), 0, 180, 360, (50, 35, 25), -1)
+    cv2.ellipse(image, (cx, cy), (int(r * 0.75), r), 0, 0, 360, (214, 168, 140), -1)
+    for side in (-1, 1):
+        ex, ey = cx + side * int(r * 0.32), cy - int(r * 0.15)
+        cv2.ellipse(image, (ex, ey), (int(r * 0.2), int(r * 0.11)), 0, 0, 360, (100, 80, 70), -1)
+        cv2.ellipse(image, (ex, ey), (int(r * 0.12), int(r * 0.06)), 0, 0, 360, (40, 20, 10), -1)
+        cv2.line(image, (ex - int(r * 0.2), ey - int(r * 0.2)), (ex + int(r * 0.2), ey - int(r * 0.22)),
+                 (60, 40, 30), max(2, r // 12))
+    cv2.ellipse(image, (cx, cy + int(r * 0.18)), (int(r * 0.1), int(r * 0.06)), 0, 0, 360, (150, 110, 95), -1)
+    cv2.ellipse(image, (cx, cy + int(r * 0.5)), (int(r * 0.28), int(r * 0.08)), 0, 0, 360, (140, 70, 70), -1)
+    
+    return cv2.GaussianBlur(image, (0, 0), max(1, r / 40))
+
+
+def face_tensors(count, image_dir=None, seed=0):
+    """
+    A (count, 48, 48, 1) batch of emotion-model inputs.
+    
+    Faces are located and preprocessed as EmotionDetector does, from the
+    images in `image_dir` when given (cycled, with variations once they run
+    out), otherwise from synthetic faces varied in size, lighting, tilt and
+    noise. Synthetic faces only exercise the numerics; calibrate and check a
+    quantized model on real face photos before deploying it.
+    """
+    from app.services.emotion_detector import EmotionDetector
+    
+    detector = EmotionDetector(batching=False)
+    rng = np.random.default_rng(seed)
+    
+    photos = []
+    if image_dir:
+        for name in sorted(os.listdir(image_dir)):
+            image = cv2.imread(os.path.join(image_dir, name))
+            if image is not None:
+                photos.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        if not photos:
+            raise ValueError(f'No readable images in {image_dir}')
+    
+    tensors = []
+    for i in range(count):
+        if photos and i < len(photos):
+            frame = photos[i]
+        else:
+            frame = photos[i % len(photos)] if photos else synthetic_face(320, 240, scale=rng.uniform(0.2, 0.4))
+            frame = _vary(frame, rng)
+        faces = detector.locate_faces(frame)
+        tensors.append(detector._preprocess_faces(frame, faces)[0])
+    return np.stack(tensors)
+
+
+def _vary(image, rng):
+    """Randomly tilt, mirror, relight and add noise to an RGB image."""
+    height, width = image.shape[:2]
+    rotation = cv2.getRotationMatrix2D((width / 2, height / 2), rng.uniform(-15, 15), 1.0)
+    image = cv2.warpAffine(image, rotation, (width, height), borderMode=cv2.BORDER_REPLICATE)
+    if rng.random() < 0.5:
+        image = image[:, ::-1]
+    image = image.astype(np.float32) * rng.uniform(0.6, 1.3) + rng.uniform(-30, 30)
+    image += rng.normal(0, rng.uniform(0, 12), image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def search_response(query='genre:"pop"', count=50):
+    """A Spotify search response body with `count` deterministic tracks."""
+    items = [fake_track(f'{query}:{i}') for i in range(count)]
+    return {'tracks': {'items': items, 'limit': count, 'offset': 0, 'total': 1000}}
@@ -0,0 +1,276 @@
+"""
+Load test of the full backend against the local Spotify stub.
+
+Starts the fake Spotify API (with injected latency, jitter and 429s), runs
+the app in a separate server process pointed at it, logs every client in
+through the OAuth callback, then drives one of the scenarios from
+`--concurrency` client threads for `--duration` seconds:
+  
+  playlist              GET /api/get-playlist/<random mood>
+  detect                POST /api/detect-mood with a synthetic face
+  detect-and-recommend  POST /api/detect-and-recommend with a synthetic face
+  mixed                 70% playlist, 20% detect, 10% detect-and-recommend
+
+Requests made during the first `--warmup` seconds are not counted. The
+results (throughput, p50/p95/p99 latency overall and per request kind,
+status codes, peak RSS of the server processes and Spotify-side counters)
+are printed as JSON; compare runs with benchmarks.compare.
+
+Usage (from backend/): python -m benchmarks.load_test [--scenario playlist] [--concurrency 16]
+    [--duration 30] [--latency-ms 100] [--jitter-ms 50] [--rate-limit 0.02]
+    [--server werkzeug|gunicorn|uvicorn] [--env KEY=VALUE ...] [--output results.json]
+"""
+import argparse
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+
+from benchmarks.fake_spotify import FakeSpotify
+from benchmarks.fixtures import encode_jpeg, synthetic_face
+from benchmarks.memory import process_tree, read_peak_rss_mb
+from benchmarks.results import summarize, write_results
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MOODS = ('happy', 'sad', 'neutral', 'angry', 'surprise', 'fear')
+
+SCENARIOS = {
+    'playlist': (('playlist', 1.0),),
+    'detect': (('detect', 1.0),),
+    'detect-and-recommend': (('detect-and-recommend', 1.0),),
+    'mixed': (('playlist', 0.7), ('detect', 0.2), ('detect-and-recommend', 0.1))
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_env(args, stub, port):
+    """Environment of the server process: Spotify pointed at the stub, nothing persisted."""
+    env = dict(os.environ)
+    env.update({
+        'BACKEND_PORT': str(port),
+        'SPOTIFY_API_URL': stub.url,
+        'SPOTIFY_TOKEN_URL': stub.token_url,
+        'SPOTIFY_CLIENT_ID': 'load-test',
+        'SPOTIFY_CLIENT_SECRET': 'load-test',
+        'SPOTIFY_REDIRECT_URI': 'http://127.0.0.1:3000/callback',
+        'TOKEN_STORE_PATH': '',
+        'TRACK_POOL_PATH': '',
+        # Every upload is the same few images; measure inference, not the result cache
+        'RESULT_CACHE_ENABLED': 'false',
+        'APP_ROLE': 'playlist' if args.scenario == 'playlist' else 'full',
+        'PYTHONPATH': os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get('PYTHONPATH')]))
+    })
+    for item in args.env:
+        key, _, value = item.partition('=')
+        env[key] = value
+    return env
+
+
+def start_server(args, env, port):
+    """Start the app in its own process group."""
+    if args.server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'run:app']
+    elif args.server == 'uvicorn':
+        # The ASGI app: Spotify-bound routes don't hold a thread while they wait
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+                   '--log-level', 'warning']
+    else:
+        command = [sys.executable, '-m', 'benchmarks.load_test', '--serve', str(port)]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env, start_new_session=True,
+                            stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+
+
+def wait_until_healthy(base_url, process, timeout):
+    """Poll /health until the server (and emotion model, if served) is ready."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode} (rerun with --verbose)')
+        try:
+            if requests.get(f'{base_url}/health', timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f'Server not healthy after {timeout:.0f}s')
+
+
+def stop_server(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=15)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def login(session, base_url):
+    """Authenticate a client through the OAuth callback (the stub accepts any code)."""
+    response = session.post(f'{base_url}/api/spotify/callback', json={'code': 'load-test'}, timeout=30)
+    response.raise_for_status()
+
+
+def send(session, base_url, kind, rng, images, timeout):
+    if kind == 'playlist':
+        return session.get(f'{base_url}/api/get-playlist/{rng.choice(MOODS)}', timeout=timeout)
+    
+    path = '/api/detect-mood' if kind == 'detect' else '/api/detect-and-recommend'
+    files = {'image': ('frame.jpg', rng.choice(images), 'image/jpeg')}
+    return session.post(f'{base_url}{path}', files=files, timeout=timeout)
+
+
+def client(index, args, base_url, images, measure_from, stop_at, samples, lock):
+    """One simulated user: log in, then send requests back to back until stop_at."""
+    rng = random.Random(args.seed + index)
+    kinds, weights = zip(*SCENARIOS[args.scenario])
+    
+    session = requests.Session()
+    login(session, base_url)
+    
+    while time.monotonic() < stop_at:
+        kind = rng.choices(kinds, weights)[0]
+        started = time.monotonic()
+        try:
+            status = send(session, base_url, kind, rng, images, args.timeout).status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        finished = time.monotonic()
+        
+        if started >= measure_from and finished <= stop_at:
+            with lock:
+                samples.append((kind, status, (finished - started) * 1000))
+
+
+def run_load(args, base_url):
+    """Drive the server from client threads; returns (samples, measured seconds)."""
+    images = [encode_jpeg(synthetic_face(640, 480, scale=0.26 + 0.02 * i)) for i in range(4)]
+    samples = []
+    lock = threading.Lock()
+    
+    measure_from = time.monotonic() + args.warmup
+    stop_at = measure_from + args.duration
+    clients = [
+        threading.Thread(target=client, args=(i, args, base_url, images, measure_from, stop_at, samples, lock),
+                         daemon=True)
+        for i in range(args.concurrency)
+    ]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join(timeout=args.warmup + args.duration + args.timeout + 30)
+    
+    return samples, args.duration
+
+
+def build_results(samples, seconds, pids, stub, spotify_stats):
+    ok = [latency for _, status, latency in samples if status == 200]
+    per_kind = defaultdict(list)
+    for kind, status, latency in samples:
+        per_kind[kind].append(latency)
+    
+    peaks = {pid: read_peak_rss_mb(pid) for pid in pids}
+    peaks = {pid: round(peak, 1) for pid, peak in peaks.items() if peak is not None}
+    
+    return {
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / seconds, 2),
+        'successful_rps': round(len(ok) / seconds, 2),
+        'latency': summarize([latency for _, _, latency in samples]),
+        'latency_ok': summarize(ok),
+        'by_kind': {kind: summarize(latencies) for kind, latencies in sorted(per_kind.items())},
+        'status_counts': {str(status): count for status, count in sorted(Counter(
+            status for _, status, _ in samples).items(), key=lambda item: str(item[0]))},
+        # Summed over the server's processes; forked workers share pages, so this overstates
+        'peak_rss_mb': round(sum(peaks.values()), 1) if peaks else None,
+        'peak_rss_mb_by_process': {str(pid): peak for pid, peak in peaks.items()},
+        'spotify_stub': stub.get_stats(),
+        'spotify_scheduler': (spotify_stats or {}).get('scheduler')
+    }
+
+
+def serve(port):
+    """Server process for --server werkzeug: the app on a threaded WSGI server."""
+    from werkzeug.serving import make_server
+    from app import create_app
+    
+    make_server('127.0.0.1', port, create_app(), threaded=True).serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='playlist')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30.0, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=5.0, help='Unmeasured seconds before that')
+    parser.add_argument('--latency-ms', type=float, default=100.0, help='Stub latency per Spotify request')
+    parser.add_argument('--jitter-ms', type=float, default=50.0)
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='Fraction of Spotify requests answered 429')
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn', 'uvicorn'), default='werkzeug')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='Extra server setting, e.g. --env SEARCH_CACHE_ENABLED=false')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout')
+    parser.add_argument('--startup-timeout', type=float, default=180.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON results to this file')
+    parser.add_argument('--verbose', action='store_true', help="Show the server's log")
+    parser.add_argument('--serve', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.serve:
+        serve(args.serve)
+        return
+    
+    stub = FakeSpotify(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                       rate_limit=args.rate_limit, retry_after=args.retry_after, seed=args.seed).start()
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    env = server_env(args, stub, port)
+    process = start_server(args, env, port)
+    
+    try:
+        wait_until_healthy(base_url, process, args.startup_timeout)
+        stub.reset_counters()
+        
+        print(f"Load test: {args.scenario}, {args.concurrency} clients, {args.duration:.0f}s "
+              f"(Spotify stub {args.latency_ms:.0f}+{args.jitter_ms:.0f} ms, {args.rate_limit:.0%} 429s)",
+              file=sys.stderr)
+        samples, seconds = run_load(args, base_url)
+        
+        try:
+            spotify_stats = requests.get(f'{base_url}/api/spotify/stats', timeout=5).json()
+        except (requests.RequestException, ValueError):
+            spotify_stats = None
+        results = build_results(samples, seconds, process_tree(process.pid), stub, spotify_stats)
+    finally:
+        stop_server(process)
+        stub.stop()
+    
+    parameters = {
+        'scenario': args.scenario,
+        'concurrency': args.concurrency,
+        'duration_s': args.duration,
+        'warmup_s': args.warmup,
+        'spotify_latency_ms': args.latency_ms,
+        'spotify_jitter_ms': args.jitter_ms,
+        'spotify_rate_limit': args.rate_limit,
+        'server': args.server,
+        'env': dict(item.partition('=')[::2] for item in args.env)
+    }
+    write_results('load', parameters, results, args.output)
+
+
+if __name__ == '__main__':
+    main()
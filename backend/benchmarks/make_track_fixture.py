@@ -0,0 +1,53 @@
+"""
+Generate the offline track-feature fixture.
+
+Writes Spotify-shaped tracks and audio features (deterministic stub data
+from benchmarks.fake_spotify) in the format TrackIndex.from_fixture loads,
+for use with TRACK_INDEX_FIXTURE and the track index benchmark.
+
+Usage (from backend/): python -m benchmarks.make_track_fixture [--tracks 300] [--output PATH]
+"""
+import argparse
+import json
+import os
+
+from app.services.spotify_service import SpotifyService
+from benchmarks.fake_spotify import fake_audio_features, fake_track
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), 'data', 'track_features.json')
+
+
+def build_fixture(track_count):
+    """Tracks spread evenly over the moods' first genre query."""
+    service = SpotifyService()
+    moods = list(service.mood_queries)
+    per_mood = track_count // len(moods)
+    
+    raw_tracks = [
+        fake_track(f"genre:\"{service.mood_queries[mood]['genres'][0]}\":{i}")
+        for mood in moods
+        for i in range(per_mood)
+    ]
+    tracks = service._format_tracks(raw_tracks)
+    return {
+        'tracks': tracks,
+        'audio_features': [fake_audio_features(track['id']) for track in tracks]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tracks', type=int, default=300)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+    
+    fixture = build_fixture(args.tracks)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(fixture, f, separators=(',', ':'))
+    
+    print(f"Wrote {len(fixture['tracks'])} tracks to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
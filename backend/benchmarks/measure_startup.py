@@ -0,0 +1,72 @@
+"""
+Measure backend startup time and memory per app role.
+
+Each role is started in a fresh interpreter that imports the app and calls
+create_app(). The script reports wall time, peak RSS and whether the ML stack
+(TensorFlow/DeepFace) was imported, as JSON. Limits make it usable as a
+regression check: it exits non-zero when the playlist role exceeds them or
+imports the ML stack.
+
+Usage: python -m benchmarks.measure_startup [--roles full,playlist]
+           [--max-playlist-seconds S] [--max-playlist-rss-mb MB]
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+CHILD_CODE = '''
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+app = create_app(role=sys.argv[1])
+elapsed = time.perf_counter() - start
+from benchmarks.memory import read_peak_rss_mb
+print(json.dumps({
+    "role": sys.argv[1],
+    "startup_seconds": elapsed,
+    "peak_rss_mb": read_peak_rss_mb(),
+    "tensorflow_imported": "tensorflow" in sys.modules,
+    "deepface_imported": "deepface" in sys.modules,
+    "modules_loaded": len(sys.modules)
+}))
+'''
+
+
+def measure(role):
+    """Start the app in a fresh interpreter and return its measurements."""
+    child = subprocess.run(
+        [sys.executable, '-c', CHILD_CODE, role],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(child.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--roles', default='playlist,full')
+    parser.add_argument('--max-playlist-seconds', type=float, default=None)
+    parser.add_argument('--max-playlist-rss-mb', type=float, default=None)
+    args = parser.parse_args()
+    
+    results = [measure(role) for role in args.roles.split(',')]
+    print(json.dumps(results, indent=2))
+    
+    failures = []
+    for result in results:
+        if result['role'] != 'playlist':
+            continue
+        if result['tensorflow_imported'] or result['deepface_imported']:
+            failures.append('playlist role imported the ML stack')
+        if args.max_playlist_seconds is not None and result['startup_seconds'] > args.max_playlist_seconds:
+            failures.append(f"playlist startup {result['startup_seconds']:.2f}s > {args.max_playlist_seconds}s")
+        if args.max_playlist_rss_mb is not None and result['peak_rss_mb'] > args.max_playlist_rss_mb:
+            failures.append(f"playlist peak RSS {result['peak_rss_mb']:.0f} MB > {args.max_playlist_rss_mb} MB")
+    
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
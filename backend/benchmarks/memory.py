@@ -0,0 +1,47 @@
+"""
+Process memory helpers for the benchmarks.
+"""
+import os
+import resource
+
+
+def read_peak_rss_mb(pid=None):
+    """
+    Peak resident set size of a process in MB (VmHWM on Linux).
+    
+    Args:
+        pid: Process to inspect (defaults to this one); None is returned for
+            other processes when /proc is unavailable
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    if pid is not None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def process_tree(pid):
+    """A process and all its descendants (e.g. gunicorn workers), Linux only."""
+    pids = [pid]
+    for parent in pids:
+        try:
+            for task in os.listdir(f'/proc/{parent}/task'):
+                with open(f'/proc/{parent}/task/{task}/children') as children:
+                    pids.extend(int(child) for child in children.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def reset_peak_rss():
+    """Reset the peak RSS counter so earlier allocations don't mask what is measured next."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
@@ -0,0 +1,83 @@
+"""
+Machine-readable benchmark results.
+
+Every suite writes one JSON document with the run's environment, its
+parameters and its measurements, so runs can be diffed or compared with
+benchmarks.compare.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+
+def percentile(sorted_values, q):
+    """Linearly interpolated percentile (q in 0-100) of an already sorted list."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(latencies_ms):
+    """Latency summary (ms) of a list of samples."""
+    values = sorted(latencies_ms)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean_ms': round(statistics.mean(values), 3),
+        'p50_ms': round(percentile(values, 50), 3),
+        'p95_ms': round(percentile(values, 95), 3),
+        'p99_ms': round(percentile(values, 99), 3),
+        'max_ms': round(values[-1], 3)
+    }
+
+
+def environment():
+    """Where and on what code the benchmark ran."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def write_results(suite, parameters, results, output=None):
+    """
+    Print the results as JSON and optionally save them.
+    
+    Args:
+        suite: Benchmark name
+        parameters: The run's settings (for like-for-like comparisons)
+        results: Measurements
+        output: File to write the JSON document to ('-' or None prints only)
+    """
+    document = {
+        'suite': suite,
+        'environment': environment(),
+        'parameters': parameters,
+        'results': results
+    }
+    text = json.dumps(document, indent=2, sort_keys=True)
+    if output and output != '-':
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+        print(f"Wrote {output}", file=sys.stderr)
+    print(text)
+    return document
@@ -7,6 +7,9 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+# backend/, so default data paths don't depend on the working directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 class Config:
     """Configuration class for Flask app."""
     
@@ -22,10 +25,154 @@ class Config:
     SPOTIFY_CLIENT_SECRET = os.environ.get('SPOTIFY_CLIENT_SECRET')
     SPOTIFY_REDIRECT_URI = os.environ.get('SPOTIFY_REDIRECT_URI', 'http://localhost:3000/callback')
     
+    # Spotify HTTP client: API base URL (override to point at a stub server),
+    # keep-alive pool sizing, request timeout and per-token client cache size
+    SPOTIFY_API_URL = os.environ.get('SPOTIFY_API_URL', 'https://api.spotify.com/v1/')
+    SPOTIFY_TOKEN_URL = os.environ.get('SPOTIFY_TOKEN_URL', 'https://accounts.spotify.com/api/token')
+    SPOTIFY_POOL_CONNECTIONS = int(os.environ.get('SPOTIFY_POOL_CONNECTIONS', 4))
+    SPOTIFY_POOL_MAXSIZE = int(os.environ.get('SPOTIFY_POOL_MAXSIZE', 32))
+    SPOTIFY_REQUEST_TIMEOUT = float(os.environ.get('SPOTIFY_REQUEST_TIMEOUT', 5))
+    SPOTIFY_CLIENT_CACHE_SIZE = int(os.environ.get('SPOTIFY_CLIENT_CACHE_SIZE', 1024))
+    
+    # Spotify rate limiting (per process: divide the app's quota by the worker count):
+    # calls per second, burst size, seconds an interactive call may wait for a slot
+    # or a 429's Retry-After, and retries after 429s
+    SPOTIFY_RATE_LIMIT = float(os.environ.get('SPOTIFY_RATE_LIMIT', 10))
+    SPOTIFY_RATE_BURST = int(os.environ.get('SPOTIFY_RATE_BURST', 20))
+    SPOTIFY_RATE_MAX_WAIT = float(os.environ.get('SPOTIFY_RATE_MAX_WAIT', 3))
+    SPOTIFY_RATE_MAX_RETRIES = int(os.environ.get('SPOTIFY_RATE_MAX_RETRIES', 2))
+    
+    # Playlist search fan-out: genres/keywords searched per mood (0 = all configured),
+    # threads shared by concurrent searches and the per-playlist deadline in seconds
+    SPOTIFY_SEARCH_GENRES = int(os.environ.get('SPOTIFY_SEARCH_GENRES', 2))
+    SPOTIFY_SEARCH_KEYWORDS = int(os.environ.get('SPOTIFY_SEARCH_KEYWORDS', 2))
+    SPOTIFY_SEARCH_WORKERS = int(os.environ.get('SPOTIFY_SEARCH_WORKERS', 16))
+    SPOTIFY_SEARCH_DEADLINE = float(os.environ.get('SPOTIFY_SEARCH_DEADLINE', 3))
+    
+    # Shared cache of search results (identical for every user): 'memory' (per
+    # process) or 'redis' (shared, needs the redis package); results are fresh for
+    # SEARCH_CACHE_TTL seconds, then served stale while refreshing for SEARCH_CACHE_STALE_TTL
+    SEARCH_CACHE_ENABLED = os.environ.get('SEARCH_CACHE_ENABLED', 'true').lower() == 'true'
+    SEARCH_CACHE_BACKEND = os.environ.get('SEARCH_CACHE_BACKEND', 'memory').lower()
+    SEARCH_CACHE_REDIS_URL = os.environ.get('SEARCH_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    SEARCH_CACHE_MAX_BYTES = int(os.environ.get('SEARCH_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    SEARCH_CACHE_TTL = float(os.environ.get('SEARCH_CACHE_TTL', 3600))
+    SEARCH_CACHE_STALE_TTL = float(os.environ.get('SEARCH_CACHE_STALE_TTL', 86400))
+    SEARCH_CACHE_REFRESH_WORKERS = int(os.environ.get('SEARCH_CACHE_REFRESH_WORKERS', 2))
+    
+    # Per-mood track pools filled in the background with app (client credentials)
+    # searches across every genre/keyword: pages x page size per query, refreshed
+    # every interval +/- jitter and persisted to TRACK_POOL_PATH ('' disables persistence)
+    TRACK_POOL_ENABLED = os.environ.get('TRACK_POOL_ENABLED', 'true').lower() == 'true'
+    TRACK_POOL_PAGES = int(os.environ.get('TRACK_POOL_PAGES', 2))
+    TRACK_POOL_PAGE_SIZE = int(os.environ.get('TRACK_POOL_PAGE_SIZE', 50))
+    TRACK_POOL_REFRESH_INTERVAL = float(os.environ.get('TRACK_POOL_REFRESH_INTERVAL', 6 * 3600))
+    TRACK_POOL_REFRESH_JITTER = float(os.environ.get('TRACK_POOL_REFRESH_JITTER', 0.2))
+    TRACK_POOL_PATH = os.environ.get('TRACK_POOL_PATH', os.path.join(BACKEND_DIR, 'data', 'track_pool.json'))
+    
+    # Audio-feature index of pooled tracks for nearest-neighbour mood matching;
+    # TRACK_INDEX_FIXTURE bulk-loads features from a JSON file (no Spotify calls)
+    TRACK_INDEX_ENABLED = os.environ.get('TRACK_INDEX_ENABLED', 'true').lower() == 'true'
+    TRACK_INDEX_FIXTURE = os.environ.get('TRACK_INDEX_FIXTURE', '')
+    
+    # Server-side Spotify tokens (the session cookie only holds an id): SQLite file
+    # shared by all workers ('' keeps tokens in one process's memory), refresh this
+    # many seconds before expiry for sessions active within the window, forget idle ones
+    TOKEN_STORE_PATH = os.environ.get('TOKEN_STORE_PATH', os.path.join(BACKEND_DIR, 'data', 'tokens.sqlite3'))
+    TOKEN_REFRESH_MARGIN = float(os.environ.get('TOKEN_REFRESH_MARGIN', 300))
+    TOKEN_ACTIVE_WINDOW = float(os.environ.get('TOKEN_ACTIVE_WINDOW', 3600))
+    TOKEN_IDLE_TTL = float(os.environ.get('TOKEN_IDLE_TTL', 30 * 86400))
+    
     # ML Model settings
     EMOTION_MODEL_PATH = os.environ.get('EMOTION_MODEL_PATH', 'models/')
     EMOTION_CONFIDENCE_THRESHOLD = float(os.environ.get('EMOTION_CONFIDENCE_THRESHOLD', 0.6))
     
+    # Emotion classifier runtime: 'tensorflow' (DeepFace's Keras model), 'onnx' or
+    # 'tflite' (int8), the latter two loading an exported model from EMOTION_MODEL_PATH
+    # (a file, or a directory holding emotion.onnx / emotion_int8.tflite); threads
+    # per inference (0 for the runtime's default)
+    EMOTION_RUNTIME = os.environ.get('EMOTION_RUNTIME', 'tensorflow').lower()
+    EMOTION_RUNTIME_THREADS = int(os.environ.get('EMOTION_RUNTIME_THREADS', 0))
+    
+    # Process role: 'full' serves everything, 'playlist' serves only the Spotify,
+    # mood list and health endpoints and never loads the ML stack
+    APP_ROLE = os.environ.get('APP_ROLE', 'full').lower()
+    
+    # ASGI serving (uvicorn asgi:app): threads for emotion inference and for the
+    # routes that still run on the Flask app; Spotify waits hold no thread
+    ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 32))
+    
+    # Emotion model warmup: 'sync' loads the model inside create_app() (needed for
+    # gunicorn preload_app), 'background' loads it in a thread, 'off' loads on first use
+    EMOTION_WARMUP = os.environ.get('EMOTION_WARMUP', 'sync').lower()
+    
+    # Per-stage latency histograms and counters, exposed at /metrics (per process)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    FACE_DETECTOR_BACKEND = os.environ.get('FACE_DETECTOR_BACKEND', 'opencv')
+    
+    # Uploads are decoded at reduced size; longest side of the working image
+    IMAGE_MAX_DIMENSION = int(os.environ.get('IMAGE_MAX_DIMENSION', 1024))
+    
+    # Haar cascade face detection (fallback path): larger scale factor and
+    # smaller working resolution trade accuracy for speed
+    FACE_SCALE_FACTOR = float(os.environ.get('FACE_SCALE_FACTOR', 1.1))
+    FACE_MIN_NEIGHBORS = int(os.environ.get('FACE_MIN_NEIGHBORS', 4))
+    FACE_MIN_SIZE = int(os.environ.get('FACE_MIN_SIZE', 30))
+    FACE_DETECT_MAX_DIMENSION = int(os.environ.get('FACE_DETECT_MAX_DIMENSION', 640))
+    
+    # Micro-batching of concurrent emotion inferences into one forward pass
+    EMOTION_BATCHING = os.environ.get('EMOTION_BATCHING', 'true').lower() == 'true'
+    EMOTION_BATCH_SIZE = int(os.environ.get('EMOTION_BATCH_SIZE', 16))
+    EMOTION_BATCH_WAIT_MS = float(os.environ.get('EMOTION_BATCH_WAIT_MS', 5))
+    
+    # Group frames: up to MAX_FACES_PER_FRAME faces (largest first) are classified in
+    # one forward pass and the frame's mood combines them: 'mean' score vector,
+    # 'confidence' (weighted by each face's top score) or 'largest' face only
+    MAX_FACES_PER_FRAME = int(os.environ.get('MAX_FACES_PER_FRAME', 8))
+    GROUP_MOOD_AGGREGATION = os.environ.get('GROUP_MOOD_AGGREGATION', 'mean').lower()
+    
+    # Detection results cached by upload content hash (optionally perceptual hash)
+    RESULT_CACHE_ENABLED = os.environ.get('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+    RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+    RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', 300))
+    RESULT_CACHE_PERCEPTUAL = os.environ.get('RESULT_CACHE_PERCEPTUAL', 'false').lower() == 'true'
+    
+    # Live-session smoothing: EWMA weight of the newest frame, how far and for how
+    # many frames a new mood must lead before switching (it must also reach
+    # EMOTION_CONFIDENCE_THRESHOLD), and when near-identical frames skip inference
+    MOOD_SMOOTHING_ALPHA = float(os.environ.get('MOOD_SMOOTHING_ALPHA', 0.4))
+    MOOD_SWITCH_MARGIN = float(os.environ.get('MOOD_SWITCH_MARGIN', 0.1))
+    MOOD_SWITCH_FRAMES = int(os.environ.get('MOOD_SWITCH_FRAMES', 2))
+    FRAME_SKIP_THRESHOLD = float(os.environ.get('FRAME_SKIP_THRESHOLD', 3.0))
+    FRAME_SKIP_MAX = int(os.environ.get('FRAME_SKIP_MAX', 10))
+    MOOD_TRACKER_TTL = float(os.environ.get('MOOD_TRACKER_TTL', 600))
+    
+    # WebSocket mood stream (flask-sock server options)
+    STREAM_MAX_FRAME_BYTES = int(os.environ.get('STREAM_MAX_FRAME_BYTES', 2 * 1024 * 1024))
+    SOCK_SERVER_OPTIONS = {'ping_interval': 25, 'max_message_size': STREAM_MAX_FRAME_BYTES}
+    
+    # Inference backend: 'thread' runs inference in the request thread, 'process'
+    # dispatches frames to a pool of worker processes via shared memory
+    INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'thread').lower()
+    INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', os.cpu_count() or 2))
+    INFERENCE_QUEUE_DEPTH = int(os.environ.get('INFERENCE_QUEUE_DEPTH', 32))
+    # What to do when the queue is full: 'reject' (503) or 'block' until a slot frees up
+    INFERENCE_BACKPRESSURE = os.environ.get('INFERENCE_BACKPRESSURE', 'reject').lower()
+    INFERENCE_TIMEOUT = float(os.environ.get('INFERENCE_TIMEOUT', 30))
+    # Set by gunicorn.conf.py under preload_app: create_app() runs in the master, so
+    # the pool is started in each worker by the post_fork hook instead
+    INFERENCE_POOL_POST_FORK = os.environ.get('INFERENCE_POOL_POST_FORK', 'false').lower() == 'true'
+    
+    # Multi-image /detect-mood/batch limits
+    MAX_BATCH_IMAGES = int(os.environ.get('MAX_BATCH_IMAGES', 32))
+    MAX_BATCH_IMAGE_BYTES = int(os.environ.get('MAX_BATCH_IMAGE_BYTES', 10 * 1024 * 1024))
+    
+    # /detect-and-recommend: playlists prefetched for this many likely moods while
+    # inference runs, threads for the prefetches and recent detections used to guess
+    DETECT_PREFETCH_MOODS = int(os.environ.get('DETECT_PREFETCH_MOODS', 2))
+    DETECT_PREFETCH_WORKERS = int(os.environ.get('DETECT_PREFETCH_WORKERS', 8))
+    DETECT_PREFETCH_HISTORY = int(os.environ.get('DETECT_PREFETCH_HISTORY', 200))
+    
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     
@@ -50,7 +197,4 @@ class Config:
             return False
         
         print("✅ Configuration validation passed")
-        return True
-
-# Validate configuration on import
-Config.validate_config()
\ No newline at end of file
+        return True
\ No newline at end of file
@@ -0,0 +1,32 @@
+"""
+Gunicorn configuration for the backend.
+
+Usage: gunicorn -c gunicorn.conf.py run:app
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('BACKEND_PORT', 5000)}"
+# Live /detect-mood requests (live=true) are smoothed per worker: with more than
+# one, route each session to the same worker or use the WebSocket stream
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# Import the app (and warm the emotion model) once in the master process so
+# every worker inherits the loaded weights via copy-on-write after fork.
+# EMOTION_WARMUP must be 'sync' for this: background threads do not survive fork.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+if preload_app:
+    # Read by Config when the master imports the app: leave the process inference
+    # pool (INFERENCE_BACKEND=process) to post_fork rather than start it here
+    os.environ['INFERENCE_POOL_POST_FORK'] = 'true'
+
+
+def post_fork(server, worker):
+    """Start the preloaded app's inference pool, if any, in the new worker."""
+    if preload_app:
+        inference_pool = server.app.wsgi().extensions.get('inference_pool')
+        if inference_pool is not None:
+            inference_pool.start()
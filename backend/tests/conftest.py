@@ -0,0 +1,26 @@
+"""
+Shared fixtures: a local Spotify stub and a SpotifyService pointed at it.
+"""
+import pytest
+
+from benchmarks.fake_spotify import FakeSpotify
+from config.settings import Config
+
+
+@pytest.fixture
+def fake_spotify():
+    """The Spotify stub from the benchmarks, serving in a background thread."""
+    stub = FakeSpotify().start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def spotify_service(fake_spotify, monkeypatch):
+    """A SpotifyService calling the stub, without background track pools."""
+    monkeypatch.setattr(Config, 'SPOTIFY_API_URL', fake_spotify.url)
+    monkeypatch.setattr(Config, 'TRACK_POOL_ENABLED', False)
+    monkeypatch.setattr(Config, 'SEARCH_CACHE_ENABLED', False)
+    
+    from app.services.spotify_service import SpotifyService
+    return SpotifyService()
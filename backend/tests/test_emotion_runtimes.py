@@ -0,0 +1,65 @@
+"""
+Exported emotion runtimes against the TensorFlow original.
+
+The agreement tests need TensorFlow with DeepFace's weights and the models
+written by benchmarks.convert_emotion_model under EMOTION_MODEL_PATH; they
+are skipped where those are missing.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from app.services.emotion_runtime import EmotionModel, TFLiteEmotionModel, load_emotion_model, resolve_model_path
+from config.settings import Config
+
+RUNTIME_PACKAGES = {
+    'onnx': 'onnxruntime',
+    'tflite': None
+}
+
+
+@pytest.fixture(scope='module')
+def reference():
+    """Synthetic face crops and the TensorFlow model's probabilities for them."""
+    pytest.importorskip('tensorflow')
+    pytest.importorskip('deepface')
+    from benchmarks.check_emotion_runtimes import predict_all
+    from benchmarks.fixtures import face_tensors
+    
+    faces = face_tensors(100)
+    return faces, predict_all(load_emotion_model('tensorflow'), faces, Config.EMOTION_BATCH_SIZE)
+
+
+@pytest.mark.parametrize('runtime', sorted(RUNTIME_PACKAGES))
+def test_exported_runtime_agrees_with_tensorflow(runtime, reference):
+    from benchmarks.check_emotion_runtimes import TOLERANCES, check_tolerances, compare, predict_all
+    
+    if RUNTIME_PACKAGES[runtime]:
+        pytest.importorskip(RUNTIME_PACKAGES[runtime])
+    path = resolve_model_path(runtime)
+    if not os.path.isfile(path):
+        pytest.skip(f"No exported {runtime} model at {path}")
+    
+    faces, expected = reference
+    result = compare(expected, predict_all(load_emotion_model(runtime), faces, Config.EMOTION_BATCH_SIZE), 0.1)
+    
+    assert check_tolerances(runtime, result, TOLERANCES[runtime]) == []
+
+
+def test_runtime_must_implement_predict():
+    class Incomplete(EmotionModel):
+        runtime = 'incomplete'
+    
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_tflite_quantization_round_trips():
+    details = {'quantization': (1 / 255, -128), 'dtype': np.int8}
+    values = np.linspace(0, 1, 256, dtype=np.float32)
+    
+    quantized = TFLiteEmotionModel._quantize(values, details)
+    
+    assert quantized.dtype == np.int8
+    np.testing.assert_allclose(TFLiteEmotionModel._dequantize(quantized, details), values, atol=1 / 255)
@@ -0,0 +1,77 @@
+"""
+Connection reuse and retry policy of SpotifyService's shared HTTP session.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+@pytest.fixture
+def failing_server():
+    """A server answering every request with 503, counting requests per method."""
+    hits = {'GET': 0, 'POST': 0}
+    
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        
+        def do_GET(self):
+            self._fail('GET')
+        
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self._fail('POST')
+        
+        def _fail(self, method):
+            hits[method] += 1
+            body = json.dumps({'error': {'status': 503, 'message': 'Service unavailable'}}).encode('utf-8')
+            self.send_response(503)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/', hits
+    server.shutdown()
+    server.server_close()
+
+
+def test_clients_share_one_keep_alive_connection(spotify_service, fake_spotify):
+    expires_at = time.time() + 3600
+    for _ in range(10):
+        client = spotify_service.get_client('stub-token', expires_at)
+        client.search(q='genre:pop', type='track', limit=10)
+        client.current_user()
+    
+    stats = fake_spotify.get_stats()
+    assert stats['requests'] == 20
+    assert stats['connections'] == 1
+
+
+def test_clients_are_cached_per_token(spotify_service):
+    expires_at = time.time() + 3600
+    assert spotify_service.get_client('token-a', expires_at) is spotify_service.get_client('token-a', expires_at)
+    assert spotify_service.get_client('token-a', expires_at) is not spotify_service.get_client('token-b', expires_at)
+
+
+def test_server_errors_are_retried_for_get_only(spotify_service, failing_server):
+    url, hits = failing_server
+    retry = spotify_service.session.get_adapter(url).max_retries
+    retry.backoff_factor = 0
+    
+    response = spotify_service.session.get(url + 'v1/search')
+    assert response.status_code == 503
+    assert hits['GET'] == 1 + retry.status
+    
+    # A retried write (creating a playlist, adding tracks) could be applied twice
+    response = spotify_service.session.post(url + 'v1/users/me/playlists', json={'name': 'Happy'})
+    assert response.status_code == 503
+    assert hits['POST'] == 1
@@ -0,0 +1,61 @@
+"""
+Nearest-neighbour ranking in the audio-feature track index.
+"""
+import numpy as np
+import pytest
+
+from app.services.track_index import TrackIndex, blend_targets, target_from_mood
+from benchmarks.bench_track_index import MOOD_FEATURES, python_rank, synthetic_features
+from benchmarks.make_track_fixture import DEFAULT_OUTPUT
+
+
+@pytest.fixture
+def index():
+    index = TrackIndex(capacity=8)
+    index.bulk_load(synthetic_features(2000))
+    return index
+
+
+def test_query_matches_brute_force_ranking(index):
+    targets = {mood: target_from_mood(features) for mood, features in MOOD_FEATURES.items()}
+    target, weights = blend_targets(targets, {'happy': 0.6, 'neutral': 0.4})
+    
+    ranked = index.query(target, weights, k=20)
+    expected = python_rank(index, target, weights, 20)
+    
+    assert [track_id for track_id, _ in ranked] == [track_id for _, track_id in expected]
+    np.testing.assert_allclose([d for _, d in ranked], [d for d, _ in expected], atol=1e-5)
+
+
+def test_query_ranks_only_candidates(index):
+    target, weights = target_from_mood(MOOD_FEATURES['happy'])
+    candidates = ['synthetic00000003', 'synthetic00000010', 'unknown']
+    
+    ranked = index.query(target, weights, k=20, candidate_ids=candidates)
+    
+    assert sorted(track_id for track_id, _ in ranked) == candidates[:2]
+
+
+def test_bulk_load_updates_existing_tracks(index):
+    features = synthetic_features(1)[0]
+    features['valence'] = 0.0
+    index.bulk_load([features])
+    
+    assert len(index) == 2000
+    assert index.get_vector(features['id'])[0] == 0.0
+
+
+def test_blend_lies_between_mood_targets():
+    targets = {mood: target_from_mood(features) for mood, features in MOOD_FEATURES.items()}
+    target, _ = blend_targets(targets, {'happy': 0.5, 'neutral': 0.5})
+    
+    # Valence: happy 0.8, neutral 0.5
+    assert target[0] == pytest.approx(0.65)
+
+
+def test_fixture_loads_offline():
+    index = TrackIndex.from_fixture(DEFAULT_OUTPUT)
+    
+    assert len(index) > 0
+    track_id, _ = index.query(*target_from_mood(MOOD_FEATURES['neutral']), k=1)[0]
+    assert index.get_track(track_id) is not None
@@ -1,6 +1,6 @@
 import React, { useRef, useState, useCallback } from 'react';
 import Webcam from 'react-webcam';
-import { detectMood } from '../services/api';
+import { detectMood, openMoodStream } from '../services/api';
 
 const WebcamCapture = ({ onMoodDetected, onError }) => {
   const webcamRef = useRef(null);
@@ -8,6 +8,7 @@ const WebcamCapture = ({ onMoodDetected, onError }) => {
   const [lastCaptureTime, setLastCaptureTime] = useState(0);
   const [autoCapture, setAutoCapture] = useState(false);
   const [captureInterval, setCaptureInterval] = useState(null);
+  const streamRef = useRef(null);
 
   // Webcam configuration
   const videoConstraints = {
@@ -61,6 +62,29 @@ const WebcamCapture = ({ onMoodDetected, onError }) => {
     }
   }, [isCapturing, lastCaptureTime, onMoodDetected, onError]);
 
+  // Send the current webcam frame over the mood stream
+  const sendStreamFrame = useCallback(async () => {
+    if (!webcamRef.current || !streamRef.current) {
+      return;
+    }
+
+    const imageSrc = webcamRef.current.getScreenshot();
+    if (!imageSrc) {
+      return;
+    }
+
+    const blob = await fetch(imageSrc).then(r => r.blob());
+    streamRef.current.sendFrame(blob);
+    setLastCaptureTime(Date.now());
+  }, []);
+
+  const stopStream = () => {
+    if (streamRef.current) {
+      streamRef.current.close();
+      streamRef.current = null;
+    }
+  };
+
   const toggleAutoCapture = () => {
     if (autoCapture) {
       // Stop auto capture
@@ -68,11 +92,25 @@ const WebcamCapture = ({ onMoodDetected, onError }) => {
         clearInterval(captureInterval);
         setCaptureInterval(null);
       }
+      stopStream();
       setAutoCapture(false);
     } else {
-      // Start auto capture
+      // Start auto capture over a persistent mood stream
+      streamRef.current = openMoodStream(
+        (moodData) => {
+          if (onMoodDetected && !moodData.error) {
+            onMoodDetected(moodData);
+          }
+        },
+        (error) => {
+          if (onError) {
+            onError(error.message);
+          }
+        }
+      );
+
       const interval = setInterval(() => {
-        capture();
+        sendStreamFrame();
       }, 5000); // Capture every 5 seconds
       
       setCaptureInterval(interval);
@@ -92,6 +130,15 @@ const WebcamCapture = ({ onMoodDetected, onError }) => {
     };
   }, [captureInterval]);
 
+  // Close the mood stream on unmount
+  React.useEffect(() => {
+    return () => {
+      if (streamRef.current) {
+        streamRef.current.close();
+      }
+    };
+  }, []);
+
   const handleWebcamError = (error) => {
     console.error('Webcam error:', error);
     if (onError) {
@@ -60,6 +60,127 @@ export const detectMood = async (imageFile) => {
   }
 };
 
+/**
+ * Open a WebSocket for continuous mood detection
+ * @param {Function} onMood - Called with each mood update from the server
+ * @param {Function} onError - Called when the connection fails
+ * @returns {Object} Stream with sendFrame(blob) and close()
+ */
+export const openMoodStream = (onMood, onError) => {
+  const streamUrl = `${API_BASE_URL.replace(/^http/, 'ws')}/detect-mood/stream`;
+  const socket = new WebSocket(streamUrl);
+  socket.binaryType = 'arraybuffer';
+
+  socket.onmessage = (event) => {
+    try {
+      onMood(JSON.parse(event.data));
+    } catch (error) {
+      console.error('Invalid mood stream message:', error);
+    }
+  };
+
+  socket.onerror = (event) => {
+    console.error('Mood stream error:', event);
+    if (onError) {
+      onError(new Error('Mood stream connection failed'));
+    }
+  };
+
+  return {
+    sendFrame: (blob) => {
+      if (socket.readyState === WebSocket.OPEN) {
+        socket.send(blob);
+      }
+    },
+    close: () => socket.close(),
+  };
+};
+
+/**
+ * Detect mood from several images in one request
+ * @param {File[]} imageFiles - The image files to analyze
+ * @returns {Promise<Object>} Per-image results and aggregated mood
+ */
+export const detectMoodBatch = async (imageFiles) => {
+  try {
+    const formData = new FormData();
+    imageFiles.forEach((file) => formData.append('images', file));
+
+    const response = await apiClient.post('/detect-mood/batch', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+    });
+
+    return response.data;
+  } catch (error) {
+    console.error('Batch mood detection failed:', error);
+    throw error;
+  }
+};
+
+/**
+ * Get tracks ranked against a blend of mood targets
+ * @param {Object} emotions - Mood scores, e.g. the `emotions` of a detection result
+ * @param {number} limit - Number of tracks
+ * @returns {Promise<Object>} Playlist data with the blended audio-feature target
+ */
+export const getRecommendations = async (emotions, limit = 20) => {
+  try {
+    const response = await apiClient.post('/recommend', { emotions, limit });
+    return response.data;
+  } catch (error) {
+    console.error('Failed to get recommendations:', error);
+    throw error;
+  }
+};
+
+/**
+ * Detect mood and get blended recommendations in one request
+ * @param {File} imageFile - The image file to analyze
+ * @returns {Promise<Object>} Playlist data plus the detection result
+ */
+export const recommendFromImage = async (imageFile) => {
+  try {
+    const formData = new FormData();
+    formData.append('image', imageFile);
+
+    const response = await apiClient.post('/recommend', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+    });
+
+    return response.data;
+  } catch (error) {
+    console.error('Failed to get recommendations:', error);
+    throw error;
+  }
+};
+
+/**
+ * Detect mood and get its playlist in one request
+ * @param {File} imageFile - The image file to analyze
+ * @returns {Promise<Object>} Detection result and playlist
+ */
+export const detectAndRecommend = async (imageFile) => {
+  try {
+    const formData = new FormData();
+    formData.append('image', imageFile);
+
+    const response = await apiClient.post('/detect-and-recommend', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+    });
+
+    return response.data;
+  } catch (error) {
+    console.error('Detect and recommend failed:', error);
+    throw error;
+  }
+};
+
 /**
  * Get Spotify playlist for a mood
  * @param {string} mood - The mood to get playlist for